@@ -1,9 +1,6 @@
-import argparse, retro, threading, os, numpy, time, random
+import argparse, os, random
 from collections import deque
 
-from tensorflow.python import keras
-from keras.models import load_model
-
 from DefaultMoveList import Moves
 
 class Agent():
@@ -22,6 +19,9 @@ class Agent():
     NEXT_OBSERVATION_INDEX = 4                                                                     # The current display image of the new state the action led to
     NEXT_STATE_INDEX = 5                                                                           # The next state that the action led to
     DONE_INDEX = 6                                                                                 # A flag signifying if the game is over
+    TRUNCATED_INDEX = 7                                                                            # A flag signifying the Lobby cut the fight short before the game was over
+
+    USES_OBSERVATIONS = True                                                                       # Whether the Agent looks at the screen, a Lobby skipping screens only captures them for Agents that do
 
     MAX_DATA_LENGTH = 50000                                                                        # Max number of decision frames the Agent can remember from a fight, average is about 2000 per fight
 
@@ -32,7 +32,7 @@ class Agent():
 
     ### Object methods
 
-    def __init__(self, load= False, name= None, moveList= Moves):
+    def __init__(self, load= False, name= None, moveList= Moves, modelsDir= DEFAULT_MODELS_DIR_PATH, logsDir= DEFAULT_LOGS_DIR_PATH):
         """Initializes the agent and the underlying neural network
 
         Parameters
@@ -47,18 +47,36 @@ class Agent():
         moveList
             An enum class that contains all of the allowed moves the Agent can perform
 
+        modelsDir
+            The directory the model is saved to and loaded from
+
+        logsDir
+            The directory the training logs are written to
+
         Returns
         -------
         None
         """
         if name is None: self.name = self.__class__.__name__
         else: self.name = name
+        self.modelsDir = modelsDir
+        self.logsDir = logsDir
+        self.telemetry = None                                                                      # Set by the Lobby when it records live metrics
         self.prepareForNextFight()
         self.moveList = moveList
 
-        if self.__class__.__name__ != "Agent":
-            self.model = self.initializeNetwork()    								            # Only invoked in child subclasses, Agent has no network
-            if load: self.loadModel()
+        self._model = None                                                                         # Built on first use so agents that never touch their network never import its framework
+        if self.__class__.__name__ != "Agent" and load: self.loadModel()                           # Only invoked in child subclasses, Agent has no network
+
+    @property
+    def model(self):
+        """The Agent's network, initialized by initializeNetwork the first time it is accessed"""
+        if self._model is None: self._model = self.initializeNetwork()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
 
     def prepareForNextFight(self):
         """Clears the memory of the fighter so it can prepare to record the next fight"""
@@ -167,12 +185,29 @@ class Agent():
             done
                 Whether or not the new state marks the completion of the emulation
 
+            truncated
+                Whether or not a termination policy of the Lobby ended the fight at the new state before the game was over
+
         Returns
         -------
         None
         """
         self.memory.append(step) # Steps are stored as tuples to avoid unintended changes
 
+    def attachLobby(self, lobby):
+        """Called by the Lobby once the environment of a new fight is ready, agents that only look at the observation and info ignore it
+
+        Parameters
+        ----------
+        lobby
+            The Lobby running the fight, its environment holds the emulator the fight is played in
+
+        Returns
+        -------
+        None
+        """
+        pass
+
     def reviewFight(self):
         """The Agent goes over the data collected from it's last fight, prepares it, and then runs through one epoch of training on the data"""
         data = self.prepareMemoryForTraining(self.memory)
@@ -181,7 +216,7 @@ class Agent():
         self.prepareForNextFight()
 
     def loadModel(self):
-        """Loads in pretrained model object ../models/{Instance_Name}Model
+        """Loads in pretrained model object {modelsDir}/{Instance_Name}Model
         Parameters
         ----------
         None
@@ -190,11 +225,11 @@ class Agent():
         -------
         None
         """
-        self.model.load_weights(os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, self.getModelName()))
+        self.model.load_weights(os.path.join(self.modelsDir, self.getModelName()))
         print("Model successfully loaded")
 
     def saveModel(self):
-        """Saves the currently trained model in the default naming convention ../models/{Instance_Name}Model
+        """Saves the currently trained model in the default naming convention {modelsDir}/{Instance_Name}Model
         Parameters
         ----------
         None
@@ -203,10 +238,10 @@ class Agent():
         -------
         None
         """
-        self.model.save_weights(os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, self.getModelName()))
+        self.model.save_weights(os.path.join(self.modelsDir, self.getModelName()), save_format= 'h5')     # Keep the HDF5 format the saved models have always used
         print('Checkpoint established. model successfully saved')
-        with open(os.path.join(Agent.DEFAULT_LOGS_DIR_PATH, self.getLogsName()), 'a+') as file:
-            file.write(str(sum(self.lossHistory.losses) / len(self.lossHistory.losses)))
+        with open(os.path.join(self.logsDir, self.getLogsName()), 'a+') as file:
+            file.write(str(self.lossHistory.getMean()))
             file.write('\n')
 
     def getModelName(self):
@@ -0,0 +1,162 @@
+import argparse, numpy
+from Agent import Agent
+from DeepQAgent import DeepQAgent
+from DefaultMoveList import Moves
+from FrameReplayStore import FrameReplayStore
+from ObservationPipeline import ObservationPipeline
+
+class ConvQAgent(DeepQAgent):
+    """A DeepQ agent that learns from the screen instead of the RAM info.
+       Observations are stacks of cropped, subsampled grayscale frames from an ObservationPipeline and the network is a small
+       convolutional network sized to train at a usable rate on a CPU. Training reuses the DeepQAgent's compiled training step,
+       target network and n-step returns, with the frames kept in a uint8 FrameReplayStore until a minibatch needs them.
+    """
+
+    # Convolutional layers as (filters, kernel size, stride), large strides early keep the network cheap to run on a CPU
+    CONV_LAYERS = [(16, 8, 4), (32, 4, 2), (32, 3, 1)]
+    DENSE_LAYER_SIZE = 256
+    USES_OBSERVATIONS = True
+
+    def __init__(self, load= False, epsilon= 1, name= None, moveList= Moves, stackSize= ObservationPipeline.DEFAULT_STACK_SIZE,
+                 downsample= ObservationPipeline.DEFAULT_DOWNSAMPLE, **kwargs):
+        """Initializes the agent and the underlying neural network
+
+        Parameters
+        ----------
+        load
+            A boolean flag that specifies whether to initialize the model from scratch or load in a pretrained model
+
+        epsilon
+            The initial exploration value to assume when the model is initialized. If a model is loaded this is set
+            to the minimum value
+
+        name
+            A string representing the name of the agent that will be used when saving the model and training logs
+            Defaults to the class name if none is provided
+
+        moveList
+            An enum class that contains all of the allowed moves the Agent can perform
+
+        stackSize
+            The number of latest frames stacked into each observation
+
+        downsample
+            Only every downsample-th row and column of the screen are kept
+
+        kwargs
+            Any of the training settings accepted by DeepQAgent, such as batchSize, targetSyncFrequency, doubleDqn and nSteps
+
+        Returns
+        -------
+        None
+        """
+        self.observationPipeline = ObservationPipeline.fromScenario(downsample= downsample, stackSize= stackSize)
+        self.frameShape = self.observationPipeline.getFrameShape()
+        self.stackSize = stackSize
+        super(ConvQAgent, self).__init__(stateSize= None, load= load, epsilon= epsilon, name= name, moveList= moveList, **kwargs)
+
+    def createObservationPipeline(self):
+        """Returns a new ObservationPipeline producing the observations this agent's network expects, to be handed to the Lobby"""
+        return ObservationPipeline(screenSize= self.observationPipeline.screenSize, downsample= self.observationPipeline.downsample, stackSize= self.stackSize)
+
+    def getNetworkInputs(self, obs, info):
+        """Returns the stacked frames of the observation as a batch of one uint8 stack"""
+        return numpy.asarray(obs)[numpy.newaxis]
+
+    def predictQValues(self, stateData):
+        """Returns the network's predicted rewards for each move, calling the model directly as the NumPy policy only supports dense networks"""
+        return numpy.asarray(self.model(stateData, training= False))
+
+    def compilePolicy(self):
+        """Does nothing, NumpyPolicy only supports dense networks so getMove keeps inferring with the Keras network"""
+        self.policy = None
+
+    def loadPolicy(self, precision= None):
+        """Loads the saved model {modelsDir}/{Instance_Name}Model into the Keras network getMove infers with.
+           NumpyPolicy only supports dense networks so unlike the DeepQAgent this imports TensorFlow
+
+        Parameters
+        ----------
+        precision
+            Must be None, policies are only exported at a lower precision for dense networks
+
+        Returns
+        -------
+        None
+        """
+        if precision is not None: raise ValueError("ConvQAgent can only load the float32 weights of its saved model, not a " + precision + " policy")
+        self.loadModel()
+
+    def initializeNetwork(self):
+        """Initializes a convolutional Neural Net for a Deep-Q learning Model
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        model
+            The initialized neural network model that Agent will interface with to generate game moves
+        """
+        import tensorflow as tf
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Conv2D, Dense, Flatten, InputLayer, Lambda
+        from tensorflow.keras.optimizers import Adam
+
+        model = Sequential()
+        model.add(InputLayer(input_shape= self.frameShape + (self.stackSize,), dtype= 'uint8'))
+        model.add(Lambda(lambda frames: tf.cast(frames, tf.float32) / 255.0))                     # Frames stay uint8 until they are inside the network
+        for filters, kernelSize, stride in ConvQAgent.CONV_LAYERS:
+            model.add(Conv2D(filters, kernelSize, strides= stride, activation= 'relu'))
+        model.add(Flatten())
+        model.add(Dense(ConvQAgent.DENSE_LAYER_SIZE, activation= 'relu'))
+        model.add(Dense(self.actionSize, activation= 'linear'))
+        model.compile(loss= DeepQAgent._huber_loss, optimizer= Adam(learning_rate= self.learningRate))
+
+        print('Successfully initialized model')
+        return model
+
+    def prepareMemoryForTraining(self, memory):
+        """prepares the recorded fight sequences into training data
+
+        Parameters
+        ----------
+        memory
+            A 2D array where each index is a recording of a state, action, new state, and reward sequence
+            See readme for more details
+
+        Returns
+        -------
+        data
+            The same dictionary of arrays as the DeepQAgent prepares, except the states and next states are
+            FrameReplayStores of the observations instead of feature vectors built from the RAM info, or empty uint8 arrays if the memory is empty
+        """
+        if len(memory) == 0:
+            states = nextStates = numpy.zeros((0,) + self.frameShape + (self.stackSize,), dtype= numpy.uint8)    # FrameReplayStore needs at least one frame to stack
+        else:
+            states, nextStates = FrameReplayStore.fromObservations([step[Agent.OBSERVATION_INDEX] for step in memory],
+                                                                   [step[Agent.NEXT_OBSERVATION_INDEX] for step in memory])
+        data = {'states' : states,
+                'actions' : numpy.array([step[Agent.ACTION_INDEX] for step in memory], dtype= numpy.int32),
+                'rewards' : numpy.array([step[Agent.REWARD_INDEX] for step in memory], dtype= numpy.float32),
+                'dones' : numpy.array([step[Agent.DONE_INDEX] for step in memory], dtype= numpy.float32),
+                'truncated' : numpy.array([step[Agent.TRUNCATED_INDEX] for step in memory], dtype= numpy.float32),
+                'nextStates' : nextStates}
+        return self.addNStepReturns(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes agent parameters.')
+    parser.add_argument('-r', '--render', action= 'store_true', help= 'Boolean flag for if the user wants the game environment to render during play')
+    parser.add_argument('-l', '--load', action= 'store_true', help= 'Boolean flag for if the user wants to load pre-existing weights')
+    parser.add_argument('-e', '--episodes', type= int, default= 10, help= 'Intger representing the number of training rounds to go through, checkpoints are made at the end of each episode')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the instance that will be used when saving the model or it\'s training logs')
+    parser.add_argument('-s', '--steps', type= int, default= DeepQAgent.DEFAULT_N_STEPS, help= 'Number of rewards summed into each training target before bootstrapping')
+    args = parser.parse_args()
+    convAgent = ConvQAgent(load= args.load, name= args.name, nSteps= args.steps)
+
+    from Lobby import Lobby
+    testLobby = Lobby(render= args.render, observationPipeline= convAgent.createObservationPipeline())
+    testLobby.addPlayer(convAgent)
+    testLobby.executeTrainingRun(episodes= args.episodes)
@@ -0,0 +1,137 @@
+import random
+from collections import deque
+
+class CurriculumScheduler():
+    """Picks which save states a training run plays next based on how the agent is doing against each opponent.
+       Every fight is scored by whether it was won and by the share of the damage the agent dealt, and the latest scores
+       against each opponent are kept. An opponent's priority is its learning progress, how much its recent scores differ
+       from the ones before them, plus how far it is from being beaten, so rollouts go to the opponents the agent is improving
+       against or still losing to. Opponents the agent has mastered keep a small floor so a regression is still noticed.
+
+       Opponents can also be unlocked in stages, the next stage opens once the agent's win rate against every unlocked
+       opponent reaches the unlock win rate, like training on the first level before lifting the restriction to later ones.
+    """
+
+    ### Static Variables
+
+    HISTORY_LENGTH = 20                                                                            # Number of latest fight scores kept per opponent
+    MIN_FIGHTS = 4                                                                                 # Fights against an opponent before its win rate and progress are trusted
+    DEFAULT_UNLOCK_WIN_RATE = 0.6                                                                  # Win rate against every unlocked opponent that opens the next stage
+    MASTERY_WIN_RATE = 0.9                                                                         # Win rate above which an opponent with no learning progress counts as mastered
+    FAILURE_WEIGHT = 0.5                                                                           # Weight of the distance from winning next to the learning progress
+    PRIORITY_FLOOR = 0.05                                                                          # Smallest priority of an unlocked opponent, mastered opponents sit at it
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def scoreFight(summary):
+        """Static method that scores a fight between 0 and 1, half for winning and half for the share of the damage the agent dealt"""
+        damage = summary['damageDealt'] + summary['damageTaken']
+        damageShare = summary['damageDealt'] / damage if damage > 0 else 0.5
+        return 0.5 * float(summary['won']) + 0.5 * damageShare
+
+    ### End of static methods
+
+    def __init__(self, states= None, stages= None, unlockWinRate= DEFAULT_UNLOCK_WIN_RATE):
+        """Initializes the scheduler
+
+        Parameters
+        ----------
+        states
+            A list of the save states to schedule, defaults to every save state returned by Lobby.getStates
+
+        stages
+            An optional list of lists of save states unlocked one after the other, states not in any stage are unlocked with the last stage.
+            Every state is unlocked from the start if None
+
+        unlockWinRate
+            The win rate against every unlocked opponent that unlocks the next stage
+
+        Returns
+        -------
+        None
+        """
+        if states is None:
+            from Lobby import Lobby
+            states = Lobby.getStates()
+        if stages is None: stages = [states]
+        staged = [state for stage in stages for state in stage]
+        self.stages = [list(stage) for stage in stages]
+        self.stages[-1] += [state for state in states if state not in staged]
+        self.unlockWinRate = unlockWinRate
+        self.unlockedStages = 1
+        self.scores = {state : deque(maxlen= CurriculumScheduler.HISTORY_LENGTH) for stage in self.stages for state in stage}
+        self.wins = {state : deque(maxlen= CurriculumScheduler.HISTORY_LENGTH) for state in self.scores}
+
+    def getUnlockedStates(self):
+        """Returns the save states of every unlocked stage"""
+        return [state for stage in self.stages[:self.unlockedStages] for state in stage]
+
+    def getWinRate(self, state):
+        """Returns the win rate over the latest fights against a save state, 0 if it has not been played"""
+        wins = self.wins[state]
+        return sum(wins) / len(wins) if len(wins) > 0 else 0.0
+
+    def getLearningProgress(self, state):
+        """Returns how much the mean score of the newer half of the latest fights differs from the older half, 0 until there are enough fights"""
+        scores = list(self.scores[state])
+        if len(scores) < CurriculumScheduler.MIN_FIGHTS: return 0.0
+        half = len(scores) // 2
+        return abs(sum(scores[half:]) / (len(scores) - half) - sum(scores[:half]) / half)
+
+    def getPriority(self, state):
+        """Returns how much the scheduler wants to play a save state next, unplayed states get the highest priority of 1 + FAILURE_WEIGHT
+
+        Parameters
+        ----------
+        state
+            The name of the save state
+
+        Returns
+        -------
+        priority
+            The learning progress plus FAILURE_WEIGHT times the loss rate, at least PRIORITY_FLOOR
+        """
+        if len(self.scores[state]) < CurriculumScheduler.MIN_FIGHTS: return 1 + CurriculumScheduler.FAILURE_WEIGHT
+        progress, winRate = self.getLearningProgress(state), self.getWinRate(state)
+        if winRate >= CurriculumScheduler.MASTERY_WIN_RATE and progress < CurriculumScheduler.PRIORITY_FLOOR:
+            return CurriculumScheduler.PRIORITY_FLOOR
+        return max(progress + CurriculumScheduler.FAILURE_WEIGHT * (1 - winRate), CurriculumScheduler.PRIORITY_FLOOR)
+
+    def nextStates(self, count= None):
+        """Returns the save states to play next, drawn at random in proportion to their priorities
+
+        Parameters
+        ----------
+        count
+            The number of fights to schedule, defaults to the number of unlocked states
+
+        Returns
+        -------
+        states
+            A list of save state names, a state can appear more than once
+        """
+        unlocked = self.getUnlockedStates()
+        if count is None: count = len(unlocked)
+        return random.choices(unlocked, weights= [self.getPriority(state) for state in unlocked], k= count)
+
+    def record(self, summary):
+        """Records the outcome of a fight and unlocks the next stage if the agent has beaten every unlocked opponent
+
+        Parameters
+        ----------
+        summary
+            The fight summary from Lobby.play
+
+        Returns
+        -------
+        None
+        """
+        state = summary['state']
+        self.scores[state].append(CurriculumScheduler.scoreFight(summary))
+        self.wins[state].append(int(summary['won']))
+        if self.unlockedStages < len(self.stages) and all(len(self.wins[unlocked]) >= CurriculumScheduler.MIN_FIGHTS and
+                                                          self.getWinRate(unlocked) >= self.unlockWinRate for unlocked in self.getUnlockedStates()):
+            self.unlockedStages += 1
+            print('Unlocked curriculum stage', self.unlockedStages, self.stages[self.unlockedStages - 1])
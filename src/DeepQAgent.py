@@ -1,17 +1,12 @@
-import argparse, retro, threading, os, numpy, random, math
+import argparse, os, numpy, random, time
 from Agent import Agent
 from LossHistory import LossHistory
 from DefaultMoveList import Moves
+from NumpyPolicy import NumpyPolicy
+from NStepReturns import computeNStepReturns
 
-import tensorflow as tf
-from tensorflow.python import keras
-from keras.models import Sequential
-from keras.layers import Dense
-from keras.optimizers import Adam
-from keras.models import load_model
-from keras import backend as K
-import keras.losses
-from collections import deque
+# TensorFlow is imported inside the methods that build, load or train the network so that agents
+# inferring through a NumpyPolicy, like the rollout workers, never pay for importing it
 
 class DeepQAgent(Agent):
     """An agent that implements the Deep Q Neural Network Reinforcement Algorithm to learn street fighter 2"""
@@ -20,6 +15,12 @@ class DeepQAgent(Agent):
     DEFAULT_EPSILON_DECAY = 0.999                             # How fast the exploration rate falls as training persists
     DEFAULT_DISCOUNT_RATE = 0.98                              # How much future rewards influence the current decision of the model
     DEFAULT_LEARNING_RATE = 0.0001
+    DEFAULT_BATCH_SIZE = 32                                   # Number of transitions in each gradient update
+    DEFAULT_TARGET_SYNC_FREQUENCY = 250                       # Number of gradient updates between copies of the online network into the target network
+    DEFAULT_N_STEPS = 1                                       # Number of rewards summed before bootstrapping a training target
+    HIDDEN_LAYER_SIZES = [48, 96, 192, 96, 48]                # Default widths of the relu hidden layers of the network
+    TARGET_CHUNK_SIZE = 1024                                  # Number of next states run through the target network per call when rebuilding its cached Q values
+    USES_OBSERVATIONS = False                                 # DeepQ only looks at the RAM info so a Lobby skipping screens never captures one for it
 
     # Mapping between player state values and their one hot encoding index
     stateIndices = {512 : 0, 514 : 1, 516 : 2, 518 : 3, 520 : 4, 522 : 5, 524 : 6, 526 : 7, 532 : 8} 
@@ -29,6 +30,8 @@ class DeepQAgent(Agent):
 
     def _huber_loss(y_true, y_pred, clip_delta=1.0):
         """Implementation of huber loss to use as the loss function for the model"""
+        import tensorflow as tf
+        from tensorflow.keras import backend as K
         error = y_true - y_pred
         cond  = K.abs(error) <= clip_delta
 
@@ -37,7 +40,10 @@ class DeepQAgent(Agent):
 
         return K.mean(tf.where(cond, squared_loss, quadratic_loss))
 
-    def __init__(self, stateSize= 32, load= False, epsilon= 1, name= None, moveList= Moves):
+    def __init__(self, stateSize= 32, load= False, epsilon= 1, name= None, moveList= Moves, batchSize= DEFAULT_BATCH_SIZE, useXla= False,
+                 targetSyncFrequency= DEFAULT_TARGET_SYNC_FREQUENCY, doubleDqn= False, nSteps= DEFAULT_N_STEPS, learningRate= DEFAULT_LEARNING_RATE,
+                 discountRate= DEFAULT_DISCOUNT_RATE, epsilonDecay= DEFAULT_EPSILON_DECAY, hiddenLayerSizes= HIDDEN_LAYER_SIZES,
+                 modelsDir= Agent.DEFAULT_MODELS_DIR_PATH, logsDir= Agent.DEFAULT_LOGS_DIR_PATH, qValueCache= None):
         """Initializes the agent and the underlying neural network
 
         Parameters
@@ -59,19 +65,67 @@ class DeepQAgent(Agent):
         moveList
             An enum class that contains all of the allowed moves the Agent can perform
 
+        batchSize
+            The number of transitions used in each gradient update during training
+
+        useXla
+            A boolean flag that specifies whether the compiled training step should also be compiled with XLA
+
+        targetSyncFrequency
+            The number of gradient updates between copies of the online network weights into the frozen target network
+
+        doubleDqn
+            A boolean flag that specifies whether the online network should pick the next move when computing targets,
+            with the target network only evaluating it, as in Double DQN
+
+        nSteps
+            The number of discounted rewards summed into each training target before bootstrapping from the target network
+
+        learningRate
+            The learning rate of the network's Adam optimizer
+
+        discountRate
+            How much future rewards influence the current decision of the model
+
+        epsilonDecay
+            The factor the exploration rate is multiplied by after every round of training
+
+        hiddenLayerSizes
+            A list of the widths of the network's relu hidden layers
+
+        modelsDir
+            The directory the model is saved to and loaded from
+
+        logsDir
+            The directory the training logs are written to
+
+        qValueCache
+            An optional QValueCache that predicted Q values of single states are memoized in, it is cleared whenever the weights change
+
         Returns
         -------
         None
         """
         self.stateSize = stateSize
         self.actionSize = len(moveList)
-        self.gamma = DeepQAgent.DEFAULT_DISCOUNT_RATE         # discount rate
+        self.gamma = discountRate                             # discount rate
         if load: self.epsilon = DeepQAgent.EPSILON_MIN        # If the model is already trained lower the exploration rate
         else: self.epsilon = epsilon                          # If the model is not trained set a high initial exploration rate
-        self.epsilonDecay = DeepQAgent.DEFAULT_EPSILON_DECAY  # How fast the exploration rate falls as training persists
-        self.learningRate = DeepQAgent.DEFAULT_LEARNING_RATE 
+        self.epsilonDecay = epsilonDecay                      # How fast the exploration rate falls as training persists
+        self.learningRate = learningRate
+        self.hiddenLayerSizes = list(hiddenLayerSizes)
+        self.batchSize = batchSize
+        self.useXla = useXla
+        self.trainStep, self.trainStepModel = None, None      # Compiled training step and the model it was built for
+        self.targetSyncFrequency = targetSyncFrequency
+        self.doubleDqn = doubleDqn
+        self.nSteps = nSteps
+        self.targetModel = None                               # Frozen copy of the network used to compute training targets
+        self.updateCount = 0                                  # Number of gradient updates run so far, used to schedule target syncs
         self.lossHistory = LossHistory()
-        super(DeepQAgent, self).__init__(load= load, name= name, moveList= moveList) 
+        self.qValueCache = qValueCache
+        self.policy = None                                    # Optional NumPy copy of the network used for fast inference
+        super(DeepQAgent, self).__init__(load= load, name= name, moveList= moveList, modelsDir= modelsDir, logsDir= logsDir)
 
     def getMove(self, obs, info):
         """Returns a set of button inputs generated by the Agent's network after looking at the current observation
@@ -97,12 +151,126 @@ class DeepQAgent(Agent):
             move, frameInputs = self.getRandomMove(info)
             return move, frameInputs
         else:
-            stateData = self.prepareNetworkInputs(info)
-            predictedRewards = self.model.predict(stateData)[0]
+            stateData = self.getNetworkInputs(obs, info)
+            predictedRewards = self.predictQValues(stateData)[0]
             move = numpy.argmax(predictedRewards)
             frameInputs = self.convertMoveToFrameInputs(list(self.moveList)[move], info) 
             return move, frameInputs
 
+    def getNetworkInputs(self, obs, info):
+        """Returns the input batch of a single state the network picks a move from, DeepQ only looks at the RAM info"""
+        return self.prepareNetworkInputs(info)
+
+    def predictQValues(self, stateData):
+        """Returns the network's predicted rewards for each move, using the NumPy policy when one has been compiled
+
+        Parameters
+        ----------
+        stateData
+            A 2D array of feature vectors as generated by prepareNetworkInputs
+
+        Returns
+        -------
+        qValues
+            A 2D array with one row of predicted rewards per feature vector
+        """
+        if self.qValueCache is None or len(stateData) != 1: return self.runNetwork(stateData)
+        startTime = time.perf_counter()
+        key = self.qValueCache.makeKey(stateData[0])
+        qValues = self.qValueCache.get(key)
+        hit = qValues is not None
+        if not hit:
+            qValues = self.runNetwork(stateData)
+            self.qValueCache.put(key, qValues)
+        self.qValueCache.recordLookup(hit, time.perf_counter() - startTime)
+        return qValues
+
+    def runNetwork(self, stateData):
+        """Runs the forward pass of the NumPy policy when one has been compiled and of the Keras network otherwise"""
+        if self.policy is not None: return self.policy.predict(stateData)
+        return self.model.predict(stateData)
+
+    @property
+    def policy(self):
+        """The optional NumpyPolicy getMove infers with, replacing it clears the Q value cache"""
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy):
+        self._policy = policy
+        if self.qValueCache is not None: self.qValueCache.clear()
+
+    def compilePolicy(self):
+        """Copies the current network weights into a NumpyPolicy that getMove will use for inference from now on.
+           The copy is refreshed whenever the network is trained or loaded.
+        """
+        self.policy = NumpyPolicy.fromModel(self.model)
+
+    def loadPolicy(self, precision= None):
+        """Loads the saved model {modelsDir}/{Instance_Name}Model straight into a NumpyPolicy without building the Keras network,
+           so an agent that only plays never imports TensorFlow
+
+        Parameters
+        ----------
+        precision
+            None to load the float32 weights of the saved model, or 'float16' or 'int8' to load the QuantizedPolicy
+            exported by exportPolicy to {modelsDir}/{Instance_Name}Policy.{precision}.npz
+
+        Returns
+        -------
+        None
+        """
+        if precision is None:
+            self.policy = NumpyPolicy.fromWeightsFile(os.path.join(self.modelsDir, self.getModelName()))
+        else:
+            from QuantizedPolicy import QuantizedPolicy
+            self.policy = QuantizedPolicy.load(self.getPolicyPath(precision))
+
+    def getPolicyPath(self, precision):
+        """Returns the path the policy exported at the given precision is saved to"""
+        return os.path.join(self.modelsDir, '{0}Policy.{1}.npz'.format(self.name, precision))
+
+    def loadModel(self):
+        """Loads in pretrained model object {modelsDir}/{Instance_Name}Model and refreshes the NumPy policy if one is in use"""
+        super(DeepQAgent, self).loadModel()
+        if self.qValueCache is not None: self.qValueCache.clear()
+        if self.policy is not None: self.compilePolicy()
+        if self.targetModel is not None: self.syncTargetNetwork(self.model)
+
+    def syncTargetNetwork(self, model):
+        """Copies the weights of the online network into the target network, creating the target network on first use
+
+        Parameters
+        ----------
+        model
+            The online network whose weights are copied
+
+        Returns
+        -------
+        None
+        """
+        import tensorflow as tf
+        if self.targetModel is None: self.targetModel = tf.keras.models.clone_model(model)
+        self.targetModel.set_weights(model.get_weights())
+
+    def computeTargetQValues(self, nextStates):
+        """Runs the target network over every next state in the training data in one batched pass.
+           The target network is frozen between syncs so these values stay valid until the next sync.
+
+        Parameters
+        ----------
+        nextStates
+            An array, or any object supporting len and slicing, with one row per next state of the training data
+
+        Returns
+        -------
+        targetQValues
+            A 2D array with the target network's predicted rewards for each move, one row per next state
+        """
+        chunks = [self.targetModel.predict_on_batch(nextStates[start : start + DeepQAgent.TARGET_CHUNK_SIZE])
+                  for start in range(0, len(nextStates), DeepQAgent.TARGET_CHUNK_SIZE)]
+        return numpy.concatenate([numpy.asarray(chunk) for chunk in chunks]).astype(numpy.float32)
+
     def initializeNetwork(self):
         """Initializes a Neural Net for a Deep-Q learning Model
         
@@ -115,14 +283,18 @@ class DeepQAgent(Agent):
         model
             The initialized neural network model that Agent will interface with to generate game moves
         """
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense
+        from tensorflow.keras.optimizers import Adam
+        from tensorflow.keras.utils import get_custom_objects
+        get_custom_objects().update({"_huber_loss": DeepQAgent._huber_loss})
+
         model = Sequential()
-        model.add(Dense(48, input_dim= self.stateSize, activation='relu'))
-        model.add(Dense(96, activation='relu'))
-        model.add(Dense(192, activation='relu'))
-        model.add(Dense(96, activation='relu'))
-        model.add(Dense(48, activation='relu'))
+        model.add(Dense(self.hiddenLayerSizes[0], input_dim= self.stateSize, activation='relu'))
+        for size in self.hiddenLayerSizes[1:]:
+            model.add(Dense(size, activation='relu'))
         model.add(Dense(self.actionSize, activation='linear'))
-        model.compile(loss=DeepQAgent._huber_loss, optimizer=Adam(lr=self.learningRate))
+        model.compile(loss=DeepQAgent._huber_loss, optimizer=Adam(learning_rate=self.learningRate))
 
         # model = Sequential()
         # model.add(Dense(256, input_dim= self.stateSize, activation='relu'))
@@ -162,18 +334,52 @@ class DeepQAgent(Agent):
         -------
         data
             The prepared training data in whatever from the model needs to train
-            DeepQ needs a state, action, and reward sequence to train on
+            DeepQ needs a state, action, and reward sequence to train on, these are returned as a dictionary of arrays
+            with one row per step under the keys states, actions, rewards, dones, truncated and nextStates along with the
+            n-step returns added by addNStepReturns
             The observation data is thrown out for this model for training
         """
-        data = []
-        for step in self.memory:
-            data.append(
-            [self.prepareNetworkInputs(step[Agent.STATE_INDEX]), 
-            step[Agent.ACTION_INDEX], 
-            step[Agent.REWARD_INDEX],
-            step[Agent.DONE_INDEX],
-            self.prepareNetworkInputs(step[Agent.NEXT_STATE_INDEX])])
+        return self.addNStepReturns(self.prepareTransitions(memory))
+
+    def prepareTransitions(self, memory):
+        """Converts the recorded fight sequences into a dictionary of arrays under the keys states, actions, rewards, dones, truncated and nextStates
+
+        Parameters
+        ----------
+        memory
+            A 2D array where each index is a recording of a state, action, new state, and reward sequence
+
+        Returns
+        -------
+        transitions
+            The dictionary of arrays, with one row per step, empty if the memory is empty
+        """
+        empty = [numpy.zeros((0, self.stateSize), dtype= numpy.float32)]                               # Keeps the concatenations valid for an empty memory
+        return {'states' : numpy.concatenate(empty + [self.prepareNetworkInputs(step[Agent.STATE_INDEX]) for step in memory]).astype(numpy.float32),
+                'actions' : numpy.array([step[Agent.ACTION_INDEX] for step in memory], dtype= numpy.int32),
+                'rewards' : numpy.array([step[Agent.REWARD_INDEX] for step in memory], dtype= numpy.float32),
+                'dones' : numpy.array([step[Agent.DONE_INDEX] for step in memory], dtype= numpy.float32),
+                'truncated' : numpy.array([step[Agent.TRUNCATED_INDEX] for step in memory], dtype= numpy.float32),
+                'nextStates' : numpy.concatenate(empty + [self.prepareNetworkInputs(step[Agent.NEXT_STATE_INDEX]) for step in memory]).astype(numpy.float32)}
+
+    def addNStepReturns(self, data):
+        """Computes the n-step returns of the whole training set at once and adds them to the training data
 
+        Parameters
+        ----------
+        data
+            The training data dictionary from prepareMemoryForTraining, rewards are not summed past the steps
+            flagged under truncated, if present, but unlike done steps their next state is still bootstrapped
+
+        Returns
+        -------
+        data
+            The same dictionary with the keys returns, bootstrapIndices and bootstrapDiscounts added.
+            The training target of a step is its return plus its bootstrap discount times the value of
+            the next state recorded at its bootstrap index
+        """
+        data['returns'], data['bootstrapIndices'], data['bootstrapDiscounts'] = computeNStepReturns(data['rewards'], data['dones'], self.gamma, self.nSteps,
+                                                                                                    episodeEnds= data.get('truncated'))
         return data
 
     def prepareNetworkInputs(self, step):
@@ -206,9 +412,9 @@ class DeepQAgent(Agent):
         if step['enemy_status'] not in DeepQAgent.doneKeys: oneHotEnemyState[DeepQAgent.stateIndices[step["enemy_status"]]] = 1
         feature_vector += oneHotEnemyState
 
-        # one hot encode enemy character
+        # one hot encode enemy character, left empty when the enemy's character is not known
         oneHotEnemyChar = [0] * 8
-        oneHotEnemyChar[step["enemy_character"]] = 1
+        if step["enemy_character"] is not None: oneHotEnemyChar[step["enemy_character"]] = 1
         feature_vector += oneHotEnemyChar
 
         # Player Data
@@ -224,49 +430,145 @@ class DeepQAgent(Agent):
         feature_vector = numpy.reshape(feature_vector, [1, self.stateSize])
         return feature_vector
 
-    def trainNetwork(self, data, model):
+    def buildTrainStep(self, model):
+        """Builds a graph compiled function that runs one full DeepQ update of the model on a minibatch.
+           The target Q values, the huber loss and the gradient update are all computed in a single call,
+           which avoids the Python side overhead model.predict and model.fit pay on every call.
+
+        Parameters
+        ----------
+        model
+            The compiled model the training step will update
+
+        Returns
+        -------
+        trainStep
+            A function taking states, actions, n-step returns, bootstrap discounts, the next states to bootstrap from
+            and the target network's Q values for those next states as tensors and returning the loss of the minibatch before the update
+        """
+        import tensorflow as tf
+        doubleDqn = self.doubleDqn
+        def trainStep(states, actions, returns, bootstrapDiscounts, nextStates, nextTargetQValues):
+            if doubleDqn:
+                # The online network picks the next move and the target network evaluates it
+                nextMoves = tf.one_hot(tf.argmax(model(nextStates, training= False), axis= 1), self.actionSize)
+                nextValues = tf.reduce_sum(nextMoves * nextTargetQValues, axis= 1)
+            else:
+                nextValues = tf.reduce_max(nextTargetQValues, axis= 1)
+            targets = returns + bootstrapDiscounts * nextValues
+            with tf.GradientTape() as tape:
+                predictions = model(states, training= True)
+                # Outputs for moves that were not taken are their own targets so only the taken move contributes to the loss, matching the original fit targets
+                mask = tf.one_hot(actions, self.actionSize)
+                expected = tf.stop_gradient(predictions) * (1 - mask) + mask * tf.expand_dims(targets, 1)
+                loss = DeepQAgent._huber_loss(expected, predictions)
+            gradients = tape.gradient(loss, model.trainable_variables)
+            model.optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            return loss
+
+        stateSpec = tf.TensorSpec(shape= model.input_shape, dtype= model.inputs[0].dtype)
+        signature = [stateSpec, tf.TensorSpec(shape= [None], dtype= tf.int32), tf.TensorSpec(shape= [None], dtype= tf.float32),
+                     tf.TensorSpec(shape= [None], dtype= tf.float32), stateSpec, tf.TensorSpec(shape= [None, self.actionSize], dtype= tf.float32)]
+        return tf.function(trainStep, input_signature= signature, experimental_compile= self.useXla)
+
+    def decayEpsilon(self):
+        """Decays the exploration rate by one step of epsilonDecay, down to EPSILON_MIN"""
+        if self.epsilon > DeepQAgent.EPSILON_MIN: self.epsilon *= self.epsilonDecay
+
+    def trainNetwork(self, data, model, decayEpsilon= True):
         """To be implemented in child class, Runs through a training epoch reviewing the training data
         Parameters
         ----------
         data
-            The training data for the model to train on, a 2D array of state, action, reward, sequence
+            The training data for the model to train on, a dictionary of arrays as returned by prepareMemoryForTraining
 
         model
             The model to train and return the Agent to continue playing with
+
+        decayEpsilon
+            Whether to decay epsilon once for the data, callers that train on samples of a replay decay it with decayEpsilon
+            as transitions arrive instead
         Returns
         -------
         model
-            The input model now updated after this round of training on data
+            The input model now updated after this round of training on data, unchanged if data holds no steps
         """
-        minibatch = random.sample(data, len(data))
+        if len(data['actions']) == 0: return model
+        if self.trainStepModel is not model:
+            self.trainStep, self.trainStepModel = self.buildTrainStep(model), model
+            self.syncTargetNetwork(model)
+        targetQValues = self.computeTargetQValues(data['nextStates'])
+        order = numpy.random.permutation(len(data['actions']))
         self.lossHistory.losses_clear()
-        for state, action, reward, done, next_state in minibatch:     
-            modelOutput = model.predict(state)[0]
-            if not done:
-                reward = (reward + self.gamma * numpy.amax(model.predict(next_state)[0]))
-
-            modelOutput[action] = reward
-            modelOutput = numpy.reshape(modelOutput, [1, self.actionSize])
-            model.fit(state, modelOutput, epochs= 1, verbose= 0, callbacks= [self.lossHistory])
-
-        if self.epsilon > DeepQAgent.EPSILON_MIN: self.epsilon *= self.epsilonDecay
+        for start in range(0, len(order), self.batchSize):
+            batch = order[start : start + self.batchSize]
+            bootstrapBatch = data['bootstrapIndices'][batch]
+            loss = self.trainStep(data['states'][batch], data['actions'][batch], data['returns'][batch], data['bootstrapDiscounts'][batch],
+                                  data['nextStates'][bootstrapBatch], targetQValues[bootstrapBatch])
+            self.lossHistory.record(float(loss))
+            self.updateCount += 1
+            if self.telemetry is not None:
+                self.telemetry.increment('train_updates')
+                self.telemetry.observe('loss', self.lossHistory.losses[-1])
+            if self.updateCount % self.targetSyncFrequency == 0:
+                self.syncTargetNetwork(model)
+                targetQValues = self.computeTargetQValues(data['nextStates'])
+
+        if decayEpsilon: self.decayEpsilon()
+        if self.policy is not None: self.policy = NumpyPolicy.fromModel(model)
+        if self.qValueCache is not None: self.qValueCache.clear()
         return model
 
 
-from keras.utils.generic_utils import get_custom_objects
-loss = DeepQAgent._huber_loss
-get_custom_objects().update({"_huber_loss": loss})
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description= 'Processes agent parameters.')
     parser.add_argument('-r', '--render', action= 'store_true', help= 'Boolean flag for if the user wants the game environment to render during play')
     parser.add_argument('-l', '--load', action= 'store_true', help= 'Boolean flag for if the user wants to load pre-existing weights')
     parser.add_argument('-e', '--episodes', type= int, default= 10, help= 'Intger representing the number of training rounds to go through, checkpoints are made at the end of each episode')
     parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the instance that will be used when saving the model or it\'s training logs')
+    parser.add_argument('-d', '--double', action= 'store_true', help= 'Boolean flag for if the user wants Double DQN targets')
+    parser.add_argument('-s', '--steps', type= int, default= DeepQAgent.DEFAULT_N_STEPS, help= 'Number of rewards summed into each training target before bootstrapping')
+    parser.add_argument('-t', '--targetSync', type= int, default= DeepQAgent.DEFAULT_TARGET_SYNC_FREQUENCY, help= 'Number of gradient updates between target network syncs')
+    parser.add_argument('-c', '--cache', type= int, default= None, help= 'Size of the Q value cache used during play, no cache by default')
+    parser.add_argument('-k', '--curriculum', type= str, nargs= '?', const= '', default= None, help= 'Pick the save states of each episode with a curriculum, optionally unlocked in stages given as ryu,ken;guile;...')
+    parser.add_argument('-m', '--metricsPort', type= int, default= None, help= 'Port to serve live telemetry on at /metrics, no telemetry by default')
+    parser.add_argument('-f', '--frameData', action= 'store_true', help= 'Boolean flag for if the lobby should skip the known dead frames of each move using the cached frame data')
+    parser.add_argument('-o', '--skipScreens', action= 'store_true', help= 'Boolean flag for if the lobby should step the emulator without capturing screens the agent never looks at')
+    parser.add_argument('-a', '--memory', type= int, nargs= '?', const= 0, default= None, help= 'Sample the memory of the run into its metrics log, optionally with the top N tracemalloc allocations every episode')
+    parser.add_argument('-g', '--hold', type= int, default= 0, help= 'Fewest frames each chosen move is held for')
+    parser.add_argument('-i', '--interval', type= int, default= 1, help= 'Number of actionable states each decision covers, the move is repeated in between')
+    parser.add_argument('-x', '--termination', type= str, default= None, help= 'Termination policies that cut training fights short, like frames=6000,deficit=80,firstRound')
     args = parser.parse_args()
-    qAgent = DeepQAgent(load= args.load, name= args.name)
+    qValueCache = None
+    if args.cache is not None:
+        from QValueCache import QValueCache
+        qValueCache = QValueCache(maxSize= args.cache)
+    qAgent = DeepQAgent(load= args.load, name= args.name, targetSyncFrequency= args.targetSync, doubleDqn= args.double, nSteps= args.steps,
+                        qValueCache= qValueCache)
 
     from Lobby import Lobby
-    testLobby = Lobby(render= args.render)
+    frameData = None
+    if args.frameData:
+        from FrameData import FrameData
+        frameData = FrameData.load()
+    telemetry = None
+    if args.metricsPort is not None:
+        from Telemetry import Telemetry
+        telemetry = Telemetry()
+        telemetry.serve(port= args.metricsPort)
+    memoryMonitor = None
+    if args.memory is not None:
+        from MemoryMonitor import MemoryMonitor
+        from MetricsStore import MetricsStore
+        memoryMonitor = MemoryMonitor(metrics= MetricsStore(qAgent.name, logsDir= qAgent.logsDir), tracemallocTop= args.memory)
+    from TerminationPolicy import TerminationPolicy
+    testLobby = Lobby(render= args.render, frameData= frameData, telemetry= telemetry, terminationPolicies= TerminationPolicy.fromSpec(args.termination),
+                      skipScreens= args.skipScreens, memoryMonitor= memoryMonitor, holdFrames= args.hold, decisionInterval= args.interval)
     testLobby.addPlayer(qAgent)
-    testLobby.executeTrainingRun(episodes= args.episodes)
+    scheduler = None
+    if args.curriculum is not None:
+        from CurriculumScheduler import CurriculumScheduler
+        stages = [stage.split(',') for stage in args.curriculum.split(';')] if args.curriculum else None
+        scheduler = CurriculumScheduler(stages= stages)
+    testLobby.executeTrainingRun(episodes= args.episodes, scheduler= scheduler)
+    if qValueCache is not None: print('Q value cache:', qValueCache.getStats())
@@ -5,7 +5,6 @@ All credit too open-ai's examples: https://github.com/openai/retro/blob/master/r
 
 import gym
 import numpy as np
-import retro
 
 class Discretizer(gym.ActionWrapper):
     """
@@ -84,6 +83,7 @@ class StreetFighter2Discretizer(Discretizer):
     The meaning of each selected move in terms of what buttons are being pressed is also displayed.
 """
 def main():
+    import retro
     env = retro.make(game='StreetFighterIISpecialChampionEdition-Genesis')
     env = StreetFighter2Discretizer(env)
     print(env.action_space)
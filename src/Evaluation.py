@@ -0,0 +1,156 @@
+import argparse, time
+from EvaluationCache import EvaluationCache
+from MetricsStore import MetricsStore
+from RolloutPool import RolloutPool
+
+class Evaluation():
+    """Evaluates a saved DeepQAgent checkpoint with exploration disabled against every character in the roster.
+       Each save state is played once per seed, the seed picks how long the agent stands idle at the start of the round
+       so repeated fights against one character play out differently. Fights run in parallel across a RolloutPool
+       and the per character win rate, round length and damage ratio are appended to the agent's MetricsStore,
+       which keeps the win/loss history of the checkpoints over a training run.
+       With an EvaluationCache the fights a checkpoint has already played are read back instead of played again.
+    """
+
+    ### Static Variables
+
+    DEFAULT_SEEDS = 4                                                                              # How many fights to play against each character
+    MAX_START_DELAY = 60                                                                           # Upper bound on the idle frames a seed can add at the start of a fight
+    START_DELAY_STRIDE = 37                                                                        # Coprime with MAX_START_DELAY + 1 so consecutive seeds land on distinct delays
+
+    TABLE_COLUMNS = ['character', 'fights', 'winRate', 'roundFrames', 'damageRatio']
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def getStartDelay(seed):
+        """Static method that maps a seed to the number of idle frames the fight will start with. The fights are deterministic
+           so seeds sharing a delay would replay the same fight, the first MAX_START_DELAY + 1 seeds all get distinct delays"""
+        return seed * Evaluation.START_DELAY_STRIDE % (Evaluation.MAX_START_DELAY + 1)
+
+    def summarizeCharacter(character, results):
+        """Static method that aggregates the fights played against one character
+
+        Parameters
+        ----------
+        character
+            The name of the save state the fights were played on
+
+        results
+            The fight summaries from Lobby.play for that save state
+
+        Returns
+        -------
+        summary
+            A dictionary with the number of fights, the win rate, the mean number of frames per round
+            and the ratio of damage dealt to damage taken
+        """
+        rounds = sum(max(result['roundsWon'] + result['roundsLost'], 1) for result in results)
+        damageTaken = sum(result['damageTaken'] for result in results)
+        return {'character' : character,
+                'fights' : len(results),
+                'winRate' : sum(result['won'] for result in results) / len(results),
+                'roundFrames' : sum(result['frames'] for result in results) / rounds,
+                'damageRatio' : sum(result['damageDealt'] for result in results) / max(damageTaken, 1)}
+
+    ### End of static methods
+
+    def __init__(self, name, seeds= DEFAULT_SEEDS, states= None, processes= None, termination= None, cache= None):
+        """Initializes the evaluation
+
+        Parameters
+        ----------
+        name
+            The name of the saved DeepQAgent model to evaluate
+
+        seeds
+            The number of fights to play against each character
+
+        states
+            A list of the save states to play, defaults to every save state returned by Lobby.getStates
+
+        processes
+            The number of worker processes to play fights in, defaults to the number of cores on the machine
+
+        termination
+            An optional TerminationPolicy spec like "frames=6000,deficit=80" that cuts fights short once their outcome is clear,
+            see TerminationPolicy.fromSpec. Truncated fights are judged on rounds and then health when they stopped
+
+        cache
+            An optional EvaluationCache the fights are looked up in and stored in
+
+        Returns
+        -------
+        None
+        """
+        if states is None:
+            from Lobby import Lobby
+            states = Lobby.getStates()
+        self.name = name
+        self.seeds = seeds
+        self.states = states
+        self.termination = termination
+        self.cache = cache
+        self.pool = RolloutPool(processes= processes)
+        self.metrics = MetricsStore(name)
+
+    def run(self):
+        """Plays the full roster sweep, records it in the metrics store and returns the per character summaries
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        table
+            A list of dictionaries, one per character, with the columns in TABLE_COLUMNS
+        """
+        startTime = time.time()
+        tasks = [{'name' : self.name, 'state' : state, 'seed' : seed, 'startDelay' : Evaluation.getStartDelay(seed), 'termination' : self.termination}
+                 for seed in range(self.seeds) for state in self.states]
+        results = self.pool.run(tasks, cache= self.cache)
+        wallTime = time.time() - startTime
+
+        table = []
+        for state in self.states:
+            summary = Evaluation.summarizeCharacter(state, [result for result in results if result['state'] == state])
+            self.metrics.record('evaluation', checkpoint= self.name, **summary)
+            table.append(summary)
+
+        self.metrics.record('evaluationSweep', checkpoint= self.name, fights= len(results), seconds= wallTime,
+                            winRate= sum(result['won'] for result in results) / len(results),
+                            frames= sum(result['frames'] for result in results), truncated= sum(result['truncated'] for result in results),
+                            cached= sum(result.get('cached', False) for result in results))
+        return table
+
+    def close(self):
+        """Stops the worker processes of the pool the fights are played on"""
+        self.pool.close()
+
+    def formatTable(self, table):
+        """Returns the per character summaries as aligned plain text for printing"""
+        rows = [[row['character'], str(row['fights']), '{0:.2f}'.format(row['winRate']), '{0:.0f}'.format(row['roundFrames']),
+                 '{0:.2f}'.format(row['damageRatio'])] for row in table]
+        widths = [max([len(column)] + [len(row[index]) for row in rows]) for index, column in enumerate(Evaluation.TABLE_COLUMNS)]
+        lines = ['  '.join(column.ljust(width) for column, width in zip(Evaluation.TABLE_COLUMNS, widths))]
+        lines += ['  '.join(value.ljust(width) for value, width in zip(row, widths)) for row in rows]
+        return '\n'.join(lines)
+
+
+"""Evaluates a saved DeepQAgent against the whole roster in parallel and records the results in its metrics log"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes evaluation parameters.')
+    parser.add_argument('-n', '--name', type= str, default= 'DeepQAgent', help= 'Name of the saved model to evaluate')
+    parser.add_argument('-s', '--seeds', type= int, default= Evaluation.DEFAULT_SEEDS, help= 'Number of fights to play against each character')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of worker processes, defaults to the number of cores')
+    parser.add_argument('-x', '--termination', type= str, default= None, help= 'Termination policies that cut fights short, like frames=6000,deficit=80,firstRound')
+    parser.add_argument('-c', '--cache', type= str, nargs= '?', const= EvaluationCache.DEFAULT_CACHE_DIR_PATH, default= None, help= 'Directory to cache evaluation fights in, fights already played by the same weights are not played again')
+    args = parser.parse_args()
+    cache = EvaluationCache(args.cache) if args.cache is not None else None
+    evaluation = Evaluation(args.name, seeds= args.seeds, processes= args.processes, termination= args.termination, cache= cache)
+    try:
+        print(evaluation.formatTable(evaluation.run()))
+    finally:
+        evaluation.close()
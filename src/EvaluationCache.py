@@ -0,0 +1,148 @@
+import hashlib, json, os
+
+class EvaluationCache():
+    """An on disk cache of evaluation fights. With exploration disabled the agent's moves only depend on the game states it sees
+       and the emulator is deterministic, so a fight played with the same weights and move list on the same save state file
+       with the same start delay and Lobby settings always plays out the same way. Each fight is stored as one JSON file named
+       after a hash of all of those, where the weights are hashed straight from the checkpoint file on disk so a retrained
+       checkpoint never matches the fights of the one it replaced, holding its summary, with the outcome, damage and frames, and the log of the moves picked.
+       Evaluating a checkpoint again returns its fights without starting the emulator, only new weights play new fights.
+
+       Fights with exploration enabled must never be cached, the key does not cover the random moves they depend on.
+    """
+
+    ### Static Variables
+
+    DEFAULT_CACHE_DIR_PATH = '../evaluationCache'                                                  # Default path to the dir the cached fights are kept in
+    DEFAULT_STATES_DIR_PATH = '../StreetFighterIISpecialChampionEdition-Genesis'                   # Default path to the dir of the save state files
+    VERSION = 2                                                                                    # Part of every key, bump it when a change to the Lobby or the Agent changes how fights play out
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def hashFile(path):
+        """Static method that returns the SHA-256 hex digest of a file's contents"""
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    ### End of static methods
+
+    def __init__(self, cacheDir= DEFAULT_CACHE_DIR_PATH, statesDir= DEFAULT_STATES_DIR_PATH):
+        """Initializes the cache, creating its directory if needed
+
+        Parameters
+        ----------
+        cacheDir
+            The directory the cached fights are kept in
+
+        statesDir
+            The directory the save state files are read from to hash them
+
+        Returns
+        -------
+        None
+        """
+        self.cacheDir = cacheDir
+        self.statesDir = statesDir
+        self.fileHashes = {}                                                                       # Digests of the files read so far, with the modification time and size they were taken at
+        self.hits, self.misses = 0, 0
+        os.makedirs(cacheDir, exist_ok= True)
+
+    def getFileHash(self, path):
+        """Returns the SHA-256 hex digest of a file, only reading it again once it has been rewritten"""
+        status = os.stat(path)
+        stamp = (status.st_mtime_ns, status.st_size)
+        if path not in self.fileHashes or self.fileHashes[path][0] != stamp:
+            self.fileHashes[path] = (stamp, EvaluationCache.hashFile(path))
+        return self.fileHashes[path][1]
+
+    def makeKey(self, weightsPath, moveList, state, startDelay, settings):
+        """Returns the key of a fight
+
+        Parameters
+        ----------
+        weightsPath
+            The path of the saved model or exported policy file the agent plays with, its contents are part of the key
+
+        moveList
+            The Enum of moves the agent picks from, the inputs of every move are part of the key
+
+        state
+            The name of the save state the fight is played on, the contents of its file are part of the key
+
+        startDelay
+            The idle frames the fight starts with, see Lobby.play
+
+        settings
+            The settings of the Lobby playing the fight as returned by Lobby.getSettings
+
+        Returns
+        -------
+        key
+            The SHA-256 hex digest of everything the fight depends on
+        """
+        fight = {'version' : EvaluationCache.VERSION,
+                 'weights' : self.getFileHash(weightsPath),
+                 'moves' : [[move.name, move.value, moveList.getMoveInputs(move)] for move in moveList],
+                 'state' : state,
+                 'stateFile' : self.getFileHash(os.path.join(self.statesDir, state + '.state')),
+                 'startDelay' : startDelay,
+                 'settings' : settings}
+        return hashlib.sha256(json.dumps(fight, sort_keys= True).encode('utf-8')).hexdigest()
+
+    def getPath(self, key):
+        """Returns the path the fight with the given key is stored at"""
+        return os.path.join(self.cacheDir, key + '.json')
+
+    def get(self, key):
+        """Returns the cached fight of a key
+
+        Parameters
+        ----------
+        key
+            The key returned by makeKey
+
+        Returns
+        -------
+        fight
+            A dictionary with the fight 'summary' from Lobby.play and the 'inputs' the agent picked, or None if the fight is not cached
+        """
+        try:
+            with open(self.getPath(key)) as file:
+                fight = json.load(file)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fight
+
+    def put(self, key, summary, inputs):
+        """Stores a fight that was just played
+
+        Parameters
+        ----------
+        key
+            The key returned by makeKey
+
+        summary
+            The fight summary returned by Lobby.play
+
+        inputs
+            The list of moves the agent picked, the Lobby's inputLog
+
+        Returns
+        -------
+        None
+        """
+        # Written to a temporary file and renamed so that workers storing the same fight at once never leave half a file behind
+        path = self.getPath(key)
+        temporaryPath = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temporaryPath, 'w') as file:
+            json.dump({'summary' : summary, 'inputs' : list(inputs)}, file)
+        os.replace(temporaryPath, path)
+
+    def getStats(self):
+        """Returns the number of lookups that hit and missed and the hit rate"""
+        lookups = self.hits + self.misses
+        return {'hits' : self.hits, 'misses' : self.misses, 'hitRate' : self.hits / lookups if lookups > 0 else 0.0}
@@ -0,0 +1,188 @@
+import argparse, hashlib, json, os
+from DefaultMoveList import Moves
+
+class FrameData():
+    """A table of how many frames each move of a move list takes, measured by playing the moves in the emulator.
+       For every move it holds the startup frames before the attack comes out, the active frames the attack is out for,
+       the recovery frames after it until the player can act again and the dead frames: how many frames after the move's
+       inputs the player is locked out on every reference state. The Lobby can step through the dead frames without
+       checking whether the player is actionable, and agents can use the table as extra features.
+
+       Tables are cached as JSON in ../frameData, keyed by the move list's inputs so editing a move list remeasures it.
+    """
+
+    ### Static Variables
+
+    DEFAULT_FRAME_DATA_DIR_PATH = '../frameData'                                                   # Default path to the dir the measured tables are cached in
+    ATTACK_STATUSES = [522, 524]                                                                   # Player statuses of a normal and a special attack being out
+    MAX_MOVE_FRAMES = 600                                                                          # Frames a move is followed for before it is treated as never recovering
+    FEATURE_NAMES = ['startup', 'active', 'recovery', 'total']
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def getCacheKey(moveList):
+        """Static method that returns a hash of the move list's names and inputs, any edit to the move list changes it"""
+        inputs = {move.name : moveList.getMoveInputs(move) for move in moveList}
+        return hashlib.sha1(json.dumps(inputs, sort_keys= True).encode('utf-8')).hexdigest()
+
+    def getPath(moveList, directory= DEFAULT_FRAME_DATA_DIR_PATH):
+        """Static method that returns the path the table of a move list is cached at"""
+        return os.path.join(directory, '{0}.{1}.json'.format(moveList.__module__, moveList.__name__))
+
+    def load(moveList= Moves, directory= DEFAULT_FRAME_DATA_DIR_PATH, states= None):
+        """Static method that returns the frame data of a move list, measuring and caching it if the cache is missing or out of date.
+           Measuring opens an emulator, so it must not be called while a Lobby in the same process is in the middle of a fight.
+
+        Parameters
+        ----------
+        moveList
+            The enum class of moves to measure
+
+        directory
+            The directory the tables are cached in
+
+        states
+            A list of the reference save states to measure the moves from, defaults to every save state returned by Lobby.getStates
+
+        Returns
+        -------
+        frameData
+            The FrameData of the move list
+        """
+        path = FrameData.getPath(moveList, directory)
+        key = FrameData.getCacheKey(moveList)
+        if os.path.exists(path):
+            with open(path) as file:
+                cached = json.load(file)
+            if cached['key'] == key: return FrameData(cached['moves'])
+
+        frameData = FrameData(FrameData.measure(moveList, states))
+        os.makedirs(directory, exist_ok= True)
+        with open(path, 'w') as file:
+            json.dump({'key' : key, 'moves' : frameData.table}, file, indent= 4)
+        return frameData
+
+    def measure(moveList= Moves, states= None):
+        """Static method that plays every move from the start of each reference state and aggregates the frame counts
+
+        Parameters
+        ----------
+        moveList
+            The enum class of moves to measure
+
+        states
+            A list of the reference save states, defaults to every save state returned by Lobby.getStates
+
+        Returns
+        -------
+        table
+            A dictionary mapping each move name to its startup, active, recovery and total frames, the medians over the reference states
+            with None for a move that never attacks, and its dead frames, the minimum over the reference states
+        """
+        from Agent import Agent
+        from Lobby import Lobby
+        if states is None: states = Lobby.getStates()
+        agent = Agent(moveList= moveList)
+        lobby = Lobby(skipScreens= True)                                                           # Only the RAM info is measured
+        measurements = {move.name : [] for move in moveList}
+        for state in states:
+            lobby.initEnvironment(state)
+            emulatorState = lobby.environment.unwrapped.em.get_state()
+            for move in moveList:
+                lobby.environment.unwrapped.em.set_state(emulatorState)
+                measurements[move.name].append(FrameData.measureMove(lobby, agent.convertMoveToFrameInputs(move, lobby.lastInfo)))
+            lobby.environment.close()
+
+        def median(values):
+            values = sorted(value for value in values if value is not None)
+            return values[len(values) // 2] if len(values) > 0 else None
+
+        return {name : {'startup' : median(entry['startup'] for entry in entries),
+                        'active' : median(entry['active'] for entry in entries),
+                        'recovery' : median(entry['recovery'] for entry in entries),
+                        'total' : median(entry['total'] for entry in entries),
+                        'deadFrames' : min(entry['deadFrames'] for entry in entries)}
+                for name, entries in measurements.items()}
+
+    def measureMove(lobby, frameInputs):
+        """Static method that enters a move's inputs and follows the player status until the Lobby would hand back control
+
+        Parameters
+        ----------
+        lobby
+            A Lobby whose environment has been set to the state to measure from
+
+        frameInputs
+            The frame inputs of the move
+
+        Returns
+        -------
+        measurement
+            A dictionary with the startup, active, recovery and total frames of this one play of the move and its dead frames,
+            the number of idle frames after the inputs that the Lobby could step without checking for an actionable state
+        """
+        from Lobby import Lobby
+        statuses = []
+        for frame in frameInputs:
+            _, _, done, info = lobby.stepFrame(frame)
+            statuses.append(info['status'])
+
+        # Dead frames are counted with the same checks waitForNextActionableState runs, stopping at the first frame the check could
+        # return True on or that changes the jump lag bookkeeping, so skipping them never changes what the Lobby does
+        deadFrames, counting = 0, True
+        lobby.currentJumpFrame = 0
+        while not done and not lobby.isActionableState(info, action= frameInputs[-1]) and len(statuses) < FrameData.MAX_MOVE_FRAMES:
+            if counting and (info['round_timer'] == Lobby.ROUND_TIMER_NOT_STARTED or info['status'] not in Lobby.ACTIONABLE_STATUSES): deadFrames += 1
+            else: counting = False
+            _, _, done, info = lobby.stepFrame(Lobby.NO_ACTION)
+            statuses.append(info['status'])
+
+        attackFrames = [index for index, status in enumerate(statuses) if status in FrameData.ATTACK_STATUSES]
+        if len(attackFrames) == 0:
+            startup, active, recovery = None, None, None
+        else:
+            startup, active, recovery = attackFrames[0], len(attackFrames), len(statuses) - attackFrames[-1] - 1
+        return {'startup' : startup, 'active' : active, 'recovery' : recovery, 'total' : len(statuses), 'deadFrames' : deadFrames}
+
+    ### End of static methods
+
+    def __init__(self, table):
+        """Initializes the frame data from a measured table
+
+        Parameters
+        ----------
+        table
+            A dictionary mapping move names to their frame counts as returned by measure
+
+        Returns
+        -------
+        None
+        """
+        self.table = table
+
+    def getDeadFrames(self, move):
+        """Returns the number of frames after the move's inputs the player is always locked out for, 0 for moves missing from the table"""
+        return self.table.get(move.name, {}).get('deadFrames', 0)
+
+    def getFeatures(self, move):
+        """Returns the startup, active, recovery and total frames of a move as a list of numbers for an agent's feature vector, 0 where unknown"""
+        entry = self.table.get(move.name, {})
+        return [entry.get(name) or 0 for name in FrameData.FEATURE_NAMES]
+
+    def formatTable(self):
+        """Returns the table as aligned plain text for printing"""
+        columns = FrameData.FEATURE_NAMES + ['deadFrames']
+        lines = ['move'.ljust(24) + ''.join(column.rjust(12) for column in columns)]
+        for name, entry in self.table.items():
+            lines.append(name.ljust(24) + ''.join(str(entry[column] if entry[column] is not None else '-').rjust(12) for column in columns))
+        return '\n'.join(lines)
+
+
+"""Measures the frame data of the default move list, or loads it from the cache, and prints it"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes frame data parameters.')
+    parser.add_argument('-s', '--states', type= str, nargs= '+', default= None, help= 'Reference save states to measure from, defaults to all of them')
+    args = parser.parse_args()
+    print(FrameData.load(states= args.states).formatTable())
@@ -0,0 +1,65 @@
+import numpy
+
+class FrameReplayStore():
+    """A uint8 replay store of stacked screen observations.
+       Every distinct frame is kept once in a single uint8 array and each stacked observation is stored as the indices of its frames,
+       so the full stacks are only assembled for the minibatch being trained on. It supports len and indexing with
+       an index array or a slice like the NumPy arrays DeepQAgent trains on, so it can stand in for them in the training data.
+    """
+
+    ### Static Methods
+
+    def fromObservations(*observationLists):
+        """Static method that builds stores from lists of LazyFrames observations, sharing the frames between all of them
+
+        Parameters
+        ----------
+        observationLists
+            Any number of lists of LazyFrames, for example the observations and the next observations of a memory
+
+        Returns
+        -------
+        stores
+            A list with one FrameReplayStore per observation list, all backed by the same frame array
+        """
+        frameIndices, frames, indexLists = {}, [], []
+        for observations in observationLists:
+            rows = []
+            for observation in observations:
+                row = []
+                for frame in observation.frames:
+                    if id(frame) not in frameIndices:                                              # LazyFrames share frame objects so identity finds repeats without comparing pixels
+                        frameIndices[id(frame)] = len(frames)
+                        frames.append(frame)
+                    row.append(frameIndices[id(frame)])
+                rows.append(row)
+            indexLists.append(numpy.array(rows, dtype= numpy.int32))
+        frames = numpy.stack(frames).astype(numpy.uint8)
+        return [FrameReplayStore(frames, indices) for indices in indexLists]
+
+    ### End of static methods
+
+    def __init__(self, frames, indices):
+        """Initializes the store
+
+        Parameters
+        ----------
+        frames
+            A 3D uint8 array of distinct frames
+
+        indices
+            A 2D array with one row per stacked observation holding the index of each of its frames, oldest first
+
+        Returns
+        -------
+        None
+        """
+        self.frames = frames
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        """Returns the stacked observations at the given indices as a uint8 array of shape (batch, height, width, stack)"""
+        return numpy.moveaxis(self.frames[self.indices[key]], -3, -1)
@@ -0,0 +1,333 @@
+import argparse, threading, time, numpy
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Lobby import Lobby, Lobby_Modes
+
+class KeyboardInput():
+    """Latest state buffer of the game buttons a human is holding down on the keyboard.
+       Key events are handled on a tkinter thread which keeps the held buttons to itself and publishes every change
+       as a new array in a single assignment. The frame loop only ever reads the latest array, so neither side takes
+       a lock or waits on the other and a frame always sees a complete set of buttons.
+    """
+
+    ### Static Variables
+
+    # Maps tkinter key names to the names of the buttons they press, the same layout as examples/humanVsComputerExample.py
+    DEFAULT_KEYS = {'Up' : 'UP', 'Down' : 'DOWN', 'Left' : 'LEFT', 'Right' : 'RIGHT',
+                    'z' : 'A', 'x' : 'B', 'c' : 'C', 'a' : 'X', 's' : 'Y', 'd' : 'Z', 'Return' : 'START'}
+
+    ### End of static variables
+
+    def __init__(self, buttons, keys= DEFAULT_KEYS):
+        """Initializes the buffer with nothing held
+
+        Parameters
+        ----------
+        buttons
+            The list of the names of one player's buttons in the order the emulator takes them
+
+        keys
+            A dictionary mapping tkinter key names to button names
+
+        Returns
+        -------
+        None
+        """
+        self.buttons = buttons
+        self.keys = keys
+        self.held = set()                                                                          # Only touched on the keyboard thread
+        self.latest = numpy.zeros(len(buttons), dtype= bool)                                       # Replaced as a whole and never written in place
+        self.thread = None
+
+    def read(self):
+        """Returns the buttons held as of the latest key event, one boolean per button"""
+        return self.latest
+
+    def updateButton(self, event, pressed):
+        """Adds or removes the button of a key event and publishes the new set of held buttons"""
+        button = self.keys.get(event.keysym)
+        if button is None or button not in self.buttons: return                                    # Not a game input, just ignore
+        if pressed: self.held.add(button)
+        else: self.held.discard(button)
+        latest = numpy.zeros(len(self.buttons), dtype= bool)
+        for held in self.held: latest[self.buttons.index(held)] = True
+        self.latest = latest
+
+    def monitor(self):
+        """Runs the tkinter window that receives the key events, it has to keep focus for the keys to be seen"""
+        import tkinter as tk
+        root = tk.Tk()
+        root.title('Street Fighter controls')
+        frame = tk.Frame(root, width= 200, height= 50)
+        frame.bind('<KeyPress>', lambda event: self.updateButton(event, True))
+        frame.bind('<KeyRelease>', lambda event: self.updateButton(event, False))
+        frame.pack()
+        frame.focus_set()
+        root.mainloop()
+
+    def start(self):
+        """Starts listening to the keyboard on a background thread if it is not already"""
+        if self.thread is None:
+            self.thread = threading.Thread(target= self.monitor, daemon= True)
+            self.thread.start()
+
+class FrameClock():
+    """Paces a loop to a fixed timestep. Each tick sleeps until the deadline of the next frame, deadlines are
+       kept on a fixed grid from the start so small delays do not add up, and when the loop falls more than
+       a frame behind the grid is restarted from now instead of rushing frames to catch up.
+    """
+
+    def __init__(self, frameTime):
+        """Starts the clock with the first frame due one frame time from now"""
+        self.frameTime = frameTime
+        self.nextFrame = time.perf_counter() + frameTime
+        self.droppedFrames = 0
+
+    def tick(self):
+        """Waits for the deadline of the next frame and returns the seconds the loop was late for it, 0 if it was on time"""
+        now = time.perf_counter()
+        lateness = now - self.nextFrame
+        if lateness < 0:
+            time.sleep(-lateness)
+            self.nextFrame += self.frameTime
+            return 0.0
+        if lateness > self.frameTime:
+            self.droppedFrames += int(lateness / self.frameTime)
+            self.nextFrame = now
+        self.nextFrame += self.frameTime
+        return lateness
+
+class HumanVsAgentLobby(Lobby):
+    """A Lobby where a human on the keyboard plays player one against a trained Agent playing player two in real time.
+       The emulator runs on a fixed timestep frame clock, the human's buttons are read from a KeyboardInput every frame
+       and the Agent decides on a background thread so the frame loop never waits on inference. When the Agent can act
+       it is asked for a move, and if the move is not ready within the decision deadline the Agent keeps holding the
+       last input of its previous move while the late decision is thrown away, so a slow decision costs the Agent
+       its reaction time but never stalls the game.
+
+       The Agent sees the game through mirrored RAM info where its own fighter is the player and the human's is the enemy,
+       the same view it was trained on. Player one's character is not declared in data.json as its address has not been
+       verified in the emulator RAM, so the mirrored enemy_character is the human's character when it is given to the lobby
+       and None otherwise, which the DeepQAgent encodes as no character rather than feeding it its own. The Agent is only given the observation and info, its attachLobby hook is not called as the emulator keeps running
+       while it decides, and nothing is recorded for training.
+    """
+
+    ### Static Variables
+
+    DEFAULT_DEADLINE_FRAMES = 2                                                                    # Frames a decision has to arrive in before the Agent holds its last move
+    FRAME_RATE = 1 / 60                                                                            # The Genesis runs at 60 frames per second
+
+    # Pairs of RAM info entries that swap places when the game is seen from player two's side
+    MIRRORED_INFO = [('health', 'enemy_health'), ('x_position', 'enemy_x_position'), ('y_position', 'enemy_y_position'),
+                     ('status', 'enemy_status'), ('matches_won', 'enemy_matches_won')]
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def mirrorInfo(info, enemyCharacter= None):
+        """Static method that returns the RAM info as player two sees it, with every player entry swapped with its enemy entry
+
+        Parameters
+        ----------
+        info
+            The RAM info dictionary returned by the emulator
+
+        enemyCharacter
+            The index of player one's character, or None if it is not known. The RAM info only holds player two's character
+
+        Returns
+        -------
+        mirrored
+            A new dictionary where the player entries describe player two and the enemy entries player one
+        """
+        mirrored = dict(info)
+        for player, enemy in HumanVsAgentLobby.MIRRORED_INFO:
+            if player in info and enemy in info: mirrored[player], mirrored[enemy] = info[enemy], info[player]
+        mirrored['enemy_character'] = enemyCharacter
+        return mirrored
+
+    ### End of static methods
+
+    def __init__(self, game= 'StreetFighterIISpecialChampionEdition-Genesis', frameRate= FRAME_RATE, deadlineFrames= DEFAULT_DEADLINE_FRAMES, keys= KeyboardInput.DEFAULT_KEYS,
+                 telemetry= None, humanCharacter= None):
+        """Initializes the lobby, add the Agent with addPlayer
+
+        Parameters
+        ----------
+        game
+            A String of the game the lobby will be making an environment of
+
+        frameRate
+            The seconds between frames of the frame clock
+
+        deadlineFrames
+            The number of frames a decision has to arrive in after the Agent is asked for a move, a late move is not played
+
+        keys
+            A dictionary mapping tkinter key names to the names of the buttons they press
+
+        telemetry
+            An optional Telemetry the lobby records the frames, decision latency and missed deadlines in
+
+        humanCharacter
+            The index of the character the human plays, in the same encoding as enemy_character, or None to hide it from the Agent
+
+        Returns
+        -------
+        None
+        """
+        super().__init__(game= game, render= True, mode= Lobby_Modes.TWO_PLAYER, telemetry= telemetry)
+        self.frameRate = frameRate
+        self.deadlineFrames = deadlineFrames
+        self.keys = keys
+        self.humanCharacter = humanCharacter
+        self.keyboard = None
+        self.decider = ThreadPoolExecutor(max_workers= 1)                                          # One decision in flight at a time, in order
+
+    def clearLobby(self):
+        """Clears the Agent from the lobby, the human's seat is the keyboard"""
+        self.players = [None]
+
+    def initEnvironment(self, state, startDelay= 0):
+        """Initializes a two player game environment and waits for the round to start
+
+        Parameters
+        ----------
+        state
+            A string of the name of the save state to load into the environment
+
+        startDelay
+            Unused, a human never plays the same fight twice
+
+        Returns
+        -------
+        None
+        """
+        import retro
+        from Discretizer import StreetFighter2Discretizer
+        self.environment = StreetFighter2Discretizer(retro.make(game= self.game, state= state, players= self.mode.value))
+        self.environment.reset()
+        if self.keyboard is None: self.keyboard = KeyboardInput(self.environment.unwrapped.buttons, keys= self.keys)
+        self.keyboard.start()
+        self.lastObservation, _, self.done, self.lastInfo = self.stepFrame(Lobby.NO_ACTION)
+        self.lastInfo = HumanVsAgentLobby.mirrorInfo(self.lastInfo, self.humanCharacter)
+        self.lastAction, self.frameInputs = 0, deque()
+        self.heldInput = Lobby.NO_ACTION
+        self.currentJumpFrame = 0
+        self.truncated = False
+        self.frameCount, self.decisionCount = 1, 0
+        self.damageDealt, self.damageTaken = 0, 0
+        self.decision, self.decisionFrame, self.decisionStale = None, 0, False
+        self.missedDeadlines = 0
+
+    def stepFrame(self, agentInput):
+        """Emulates one frame with the human's held buttons as player one and a frame input of the Agent's move as player two
+
+        Parameters
+        ----------
+        agentInput
+            The index of the button combination in the discretized action space the Agent presses this frame
+
+        Returns
+        -------
+        observation, reward, done, info
+            What the two player environment returns for the frame
+        """
+        agentButtons = self.environment.action(agentInput)[:len(self.keyboard.buttons)]             # The discretizer lays the combination out on player one's buttons
+        return self.environment.env.step(numpy.concatenate([self.keyboard.read(), agentButtons]))
+
+    def decide(self, observation, info):
+        """Asks the Agent for its move on the decider thread, returns the move, its frame inputs and the seconds it took"""
+        startTime = time.perf_counter()
+        move, frameInputs = self.players[0].getMove(observation, info)
+        return move, frameInputs, time.perf_counter() - startTime
+
+    def updateDecision(self):
+        """Collects a finished decision, marks a late one as missed and asks for a new one once the Agent can act
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        agentInput
+            The frame input the Agent presses on the coming frame
+        """
+        if self.decision is not None and not self.decisionStale and self.frameCount - self.decisionFrame > self.deadlineFrames and not self.decision.done():
+            self.decisionStale = True                                                              # Too late to react to the state it was asked about
+            self.missedDeadlines += 1
+            if self.telemetry is not None: self.telemetry.increment('missed_deadlines')
+        if self.decision is not None and self.decision.done():
+            self.lastAction, frameInputs, decisionTime = self.decision.result()
+            if self.telemetry is not None: self.telemetry.observe('inference_seconds', decisionTime)
+            if not self.decisionStale:
+                self.frameInputs = deque(frameInputs)
+                self.heldInput = frameInputs[-1]
+                self.decisionCount += 1
+            self.decision, self.decisionStale = None, False
+
+        if len(self.frameInputs) > 0: return self.frameInputs.popleft()
+        if self.decision is None and self.isActionableState(self.lastInfo, action= self.heldInput):
+            self.decision = self.decider.submit(self.decide, self.lastObservation, self.lastInfo)
+            self.decisionFrame = self.frameCount
+        if self.decision is not None: return self.heldInput                                       # Keep holding the last move while the next one is decided
+        return Lobby.NO_ACTION
+
+    def play(self, state, startDelay= 0):
+        """Plays the save state with the human against the Agent in real time until the fight is over
+
+        Parameters
+        ----------
+        state
+            A string of the name of the save state to play, the human plays its player one character
+
+        startDelay
+            Unused, see initEnvironment
+
+        Returns
+        -------
+        summary
+            The fight summary of summarizeFight from the Agent's side with the number of missed decision deadlines
+            and of frames the clock dropped because the emulator could not keep up
+        """
+        startTime = time.time()
+        self.initEnvironment(state)
+        clock = FrameClock(self.frameRate)
+        while not self.done:
+            observation, _, self.done, info = self.stepFrame(self.updateDecision())
+            info = HumanVsAgentLobby.mirrorInfo(info, self.humanCharacter)
+            self.recordDamage(self.lastInfo, info)
+            self.lastObservation, self.lastInfo = observation, info
+            self.frameCount += 1
+            if self.telemetry is not None: self.telemetry.increment('frames')
+            self.environment.render()
+            clock.tick()
+
+        if self.decision is not None: self.decision.result()                                      # Let the Agent finish before the emulator goes away
+        self.environment.close()
+        self.environment.viewer.close()
+        summary = self.summarizeFight(state, time.time() - startTime)
+        summary.update({'missedDeadlines' : self.missedDeadlines, 'droppedFrames' : clock.droppedFrames})
+        return summary
+
+
+"""Plays a human on the keyboard against a trained DeepQAgent in real time"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes human vs agent parameters.')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the saved model to play against')
+    parser.add_argument('-s', '--state', type= str, default= 'chunli', help= 'Save state to play, the human plays its player one character')
+    parser.add_argument('-d', '--deadline', type= int, default= HumanVsAgentLobby.DEFAULT_DEADLINE_FRAMES, help= 'Frames a decision has to arrive in before the agent holds its last move')
+    parser.add_argument('-p', '--precision', type= str, default= None, help= 'Play with a policy exported by exportPolicy at this precision instead of the Keras model')
+    parser.add_argument('-f', '--fights', type= int, default= 1, help= 'Number of fights to play')
+    parser.add_argument('-c', '--character', type= int, default= None, help= 'Index of the character the human plays as the agent would see it in enemy_character, hidden from the agent if not given')
+    args = parser.parse_args()
+
+    from DeepQAgent import DeepQAgent
+    agent = DeepQAgent(load= args.precision is None, epsilon= 0, name= args.name)
+    if args.precision is not None: agent.loadPolicy(precision= args.precision)
+    lobby = HumanVsAgentLobby(deadlineFrames= args.deadline, humanCharacter= args.character)
+    lobby.addPlayer(agent)
+    for _ in range(args.fights):
+        print(lobby.play(args.state))
@@ -1,6 +1,5 @@
-import argparse, retro, os, time
+import argparse, os, time
 from enum import Enum
-from Discretizer import StreetFighter2Discretizer
 
 # Used incase too many players are added to the lobby
 class Lobby_Full_Exception(Exception):
@@ -57,7 +56,8 @@ class Lobby():
 
     ### End of static methods
 
-    def __init__(self, game= 'StreetFighterIISpecialChampionEdition-Genesis', render= False, mode= Lobby_Modes.SINGLE_PLAYER):
+    def __init__(self, game= 'StreetFighterIISpecialChampionEdition-Genesis', render= False, mode= Lobby_Modes.SINGLE_PLAYER, observationPipeline= None, frameData= None, telemetry= None,
+                 terminationPolicies= None, skipScreens= False, memoryMonitor= None, holdFrames= 0, decisionInterval= 1):
         """Initializes the agent and the underlying neural network
 
         Parameters
@@ -71,6 +71,36 @@ class Lobby():
         mode
             An enum type that describes whether this lobby is for single player or two player matches
 
+        observationPipeline
+            An optional ObservationPipeline the screens are passed through before the players see or record them
+
+        frameData
+            An optional FrameData table of the players' move list, the frames after a move that the player is known to be
+            locked out for are then stepped through without checking for an actionable state
+
+        telemetry
+            An optional Telemetry the lobby and its players record their live metrics in
+
+        terminationPolicies
+            An optional list of TerminationPolicy objects that can cut a fight short before the game ends it,
+            the fight stops after the first decision any of them asks to truncate at
+
+        skipScreens
+            A boolean flag that steps the emulator without capturing the screen on every frame, the screen is only captured
+            at the states the player decides in and never if the player does not use observations. Ignored while rendering
+
+        memoryMonitor
+            An optional MemoryMonitor that samples the memory of the player and the emulator at the end of every fight
+            and of every episode, after the player has reviewed it
+
+        holdFrames
+            The fewest frames a chosen move is held for, shorter moves like a step to the side keep pressing their last input
+            until this many frames have passed. 0 plays every move for exactly its own inputs
+
+        decisionInterval
+            The number of actionable states each decision covers, the chosen move is entered again at the actionable states
+            in between and the transition recorded for the decision sums the rewards of every repeat
+
         Returns
         -------
         None
@@ -78,9 +108,17 @@ class Lobby():
         self.game = game
         self.render = render
         self.mode = mode
+        self.observationPipeline = observationPipeline
+        self.frameData = frameData
+        self.telemetry = telemetry
+        self.terminationPolicies = terminationPolicies or []
+        self.skipScreens = skipScreens
+        self.memoryMonitor = memoryMonitor
+        self.holdFrames = holdFrames
+        self.decisionInterval = decisionInterval
         self.clearLobby()
 
-    def initEnvironment(self, state):
+    def initEnvironment(self, state, startDelay= 0):
         """Initializes a game environment that the Agent can play a save state in
 
         Parameters
@@ -88,19 +126,49 @@ class Lobby():
         state
             A string of the name of the save state to load into the environment
 
+        startDelay
+            The number of frames to stand idle once the round has started before handing control to the Agent.
+            The emulator is deterministic so varying this is how repeated fights on one save state are made to differ.
+            Damage taken while standing idle counts towards the fight's damage totals
+
         Returns
         -------
         None
         """
+        import retro                                                                                       # Imported here so listing save states or importing the Lobby does not load the emulator
+        from Discretizer import StreetFighter2Discretizer
         self.environment = retro.make(game= self.game, state= state, players= self.mode.value)
         self.environment = StreetFighter2Discretizer(self.environment)
         self.environment.reset()                                                               
-        self.lastObservation, _, _, self.lastInfo = self.environment.step(Lobby.NO_ACTION)                   # The initial observation and state info are gathered by doing nothing the first frame and viewing the return data
+        self.skippingScreens = self.skipScreens and not self.render                                          # Rendering draws the screen of every frame
+        self.needsScreens = self.observationPipeline is not None or any(player.USES_OBSERVATIONS for player in self.players if player is not None)
+        self.lastObservation, _, _, self.lastInfo = self.stepFrame(Lobby.NO_ACTION)                          # The initial observation and state info are gathered by doing nothing the first frame and viewing the return data
         self.lastAction, self.frameInputs = 0, [Lobby.NO_ACTION]
+        self.heldFrames = 0
         self.currentJumpFrame = 0
-        self.done = False
+        self.done, self.truncated = False, False
+        self.frameCount, self.decisionCount = 1, 0
+        self.inputLog = []                                                                                   # The move picked at each decision, enough to replay the fight as the emulator is deterministic
+        self.damageDealt, self.damageTaken = 0, 0
         while not self.isActionableState(self.lastInfo, Lobby.NO_ACTION):
-            self.lastObservation, _, _, self.lastInfo = self.environment.step(Lobby.NO_ACTION)
+            self.lastObservation, _, _, self.lastInfo = self.stepFrame(Lobby.NO_ACTION)
+            self.frameCount += 1
+        if startDelay > 0:
+            delayInfo = self.lastInfo
+            for _ in range(startDelay):
+                self.lastObservation, _, _, self.lastInfo = self.stepFrame(Lobby.NO_ACTION)
+            self.frameCount += startDelay
+            while not self.isActionableState(self.lastInfo, Lobby.NO_ACTION):
+                self.lastObservation, _, _, self.lastInfo = self.stepFrame(Lobby.NO_ACTION)
+                self.frameCount += 1
+            self.recordDamage(delayInfo, self.lastInfo)                                                       # The opponent can already attack while the Agent stands idle
+        self.lastObservation = self.captureScreen(self.lastObservation)
+        if self.observationPipeline is not None:
+            self.observationPipeline.reset()
+            self.lastObservation = self.observationPipeline.observe(self.lastObservation)
+        for player in self.players:
+            if player is not None: player.attachLobby(self)
+        for policy in self.terminationPolicies: policy.reset()
 
     def addPlayer(self, newPlayer):
         """Adds a new player to the player list of active players in this lobby
@@ -118,6 +186,7 @@ class Lobby():
         for playerNum, player in enumerate(self.players):
             if player is None:
                 self.players[playerNum] = newPlayer
+                if self.telemetry is not None: newPlayer.telemetry = self.telemetry
                 return
 
         raise Lobby_Full_Exception("Lobby has already reached the maximum number of players")
@@ -135,6 +204,49 @@ class Lobby():
         """
         self.players = [None] * self.mode.value
 
+    def stepFrame(self, frameInput):
+        """Emulates a single frame, skipping the screen capture if the lobby is skipping screens
+
+        Parameters
+        ----------
+        frameInput
+            The index of the button combination in the discretized action space to press this frame
+
+        Returns
+        -------
+        obs
+            The image buffer of the frame, None if the screen was skipped
+
+        reward, done, info
+            The reward, done flag and ram info of the frame as returned by the environment's step
+        """
+        if not self.skippingScreens: return self.environment.step(frameInput)
+
+        # The same steps gym retro's RetroEnv.step takes apart from copying the screen out of the emulator
+        retroEnvironment = self.environment.unwrapped
+        for player, buttons in enumerate(retroEnvironment.action_to_array(self.environment.action(frameInput))):
+            retroEnvironment.em.set_button_mask(buttons, player)
+        retroEnvironment.em.step()
+        retroEnvironment.data.update_ram()
+        reward, done, info = retroEnvironment.compute_step()
+        return None, reward, bool(done), dict(info)
+
+    def captureScreen(self, obs):
+        """Returns the screen of the current frame at a decision point, capturing it from the emulator if it was skipped and is needed
+
+        Parameters
+        ----------
+        obs
+            The image buffer returned by the last stepFrame
+
+        Returns
+        -------
+        obs
+            The image buffer of the current frame, None if the screen was skipped and neither the player nor the observation pipeline looks at it
+        """
+        if obs is None and self.needsScreens: obs = self.environment.unwrapped.get_screen()                   # Applies the scenario crop like step does
+        return obs
+
     def isActionableState(self, info, action = 0):
         """Determines if the Agent has control over the game in it's current state(the Agent is in hit stun, ending lag, etc.)
 
@@ -165,7 +277,7 @@ class Lobby():
             if info['status'] != Lobby.JUMPING_STATUS and self.currentJumpFrame > 0: self.currentJumpFrame = 0 
             return True
 
-    def play(self, state):
+    def play(self, state, startDelay= 0):
         """The Agent will load the specified save state and play through it until finished, recording the fight for training
 
         Parameters
@@ -173,28 +285,180 @@ class Lobby():
         state
             A string of the name of the save state the Agent will be playing
 
+        startDelay
+            The number of idle frames to wait once the round starts before the Agent takes control, see initEnvironment
+
         Returns
         -------
-        None
+        summary
+            A dictionary describing the outcome of the fight, see summarizeFight
         """
-        self.initEnvironment(state)
-        while not self.done:
+        startTime = time.time()
+        self.initEnvironment(state, startDelay= startDelay)
+        while not self.done and not self.truncated:
 
             # action is an iterable object that contains an input buffer representing frame by frame inputs
             # the lobby will run through these inputs and enter each one on the appropriate frames
+            decisionTime = time.perf_counter()
             self.lastAction, self.frameInputs = self.players[0].getMove(self.lastObservation, self.lastInfo)
+            decisionTime = time.perf_counter() - decisionTime
+            framesBefore = self.frameCount
+            self.decisionCount += 1
+            self.inputLog.append(int(self.lastAction))
 
-            # Fully execute frame object and then wait for next actionable state
+            # Fully execute frame object and then wait for next actionable state, as many times as the decision covers
             self.lastReward = 0
-            info, obs = self.enterFrameInputs()
-            info, obs = self.waitForNextActionableState(info, obs)
-
-            # Record Results
-            self.players[0].recordStep((self.lastObservation, self.lastInfo, self.lastAction, self.lastReward, obs, info, self.done))
+            info = self.lastInfo
+            for repeat in range(self.decisionInterval):
+                if repeat > 0: self.frameInputs = self.players[0].convertMoveToFrameInputs(self.players[0].moveList(self.lastAction), info)   # Facing may have changed
+                self.frameInputs = self.holdMove(self.frameInputs)
+                stepInfo, obs = self.enterFrameInputs()
+                stepInfo, obs = self.waitForNextActionableState(stepInfo, obs)
+                self.recordDamage(info, stepInfo)                                                  # Per repeat so no damage is missed when health refills for a new round
+                info = stepInfo
+                self.truncated = not self.done and self.shouldTruncate(info)
+                if self.done or self.truncated: break
+            obs = self.captureScreen(obs)
+            if self.observationPipeline is not None: obs = self.observationPipeline.observe(obs)       # The stacked frames are shared with the next step's observation
+
+            # Record Results, a truncated step is not done so the value of the state the fight was cut short in is still learned from
+            self.players[0].recordStep((self.lastObservation, self.lastInfo, self.lastAction, self.lastReward, obs, info, self.done, self.truncated))
             self.lastObservation, self.lastInfo = [obs, info]                   # Overwrite after recording step so Agent remembers the previous state that led to this one
+            if self.telemetry is not None: self.recordTelemetry(self.frameCount - framesBefore, decisionTime)
         
+        if self.memoryMonitor is not None: self.memoryMonitor.sample('fight', agent= self.players[0], lobby= self)       # Sampled while the emulator is still running
         self.environment.close()
         if self.render: self.environment.viewer.close()
+        return self.summarizeFight(state, time.time() - startTime)
+
+    def getSettings(self):
+        """Returns the lobby settings that change how a fight plays out as a dictionary of plain values, see EvaluationCache
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        settings
+            A dictionary with the game, the number of players, the move holding and decision interval, whether screens are skipped,
+            whether frame data or an observation pipeline is in use and the class and parameters of every termination policy
+        """
+        return {'game' : self.game,
+                'players' : self.mode.value,
+                'holdFrames' : self.holdFrames,
+                'decisionInterval' : self.decisionInterval,
+                'skipScreens' : self.skipScreens,
+                'frameData' : self.frameData is not None,
+                'observationPipeline' : self.observationPipeline is not None,
+                'terminationPolicies' : [[type(policy).__name__, sorted(vars(policy).items())] for policy in self.terminationPolicies]}
+
+    def holdMove(self, frameInputs):
+        """Pads a move's frame inputs with its last input until they last at least holdFrames frames
+
+        Parameters
+        ----------
+        frameInputs
+            The frame inputs of the chosen move
+
+        Returns
+        -------
+        frameInputs
+            The frame inputs to enter, unchanged if the move is already long enough
+        """
+        self.heldFrames = max(0, self.holdFrames - len(frameInputs))
+        if self.heldFrames == 0: return frameInputs
+        return list(frameInputs) + [frameInputs[-1]] * self.heldFrames
+
+    def shouldTruncate(self, info):
+        """Asks each termination policy whether the fight should stop after the decision that was just played
+
+        Parameters
+        ----------
+        info
+            The RAM info of the game state the decision led to
+
+        Returns
+        -------
+        truncate
+            True if any of the lobby's termination policies wants to end the fight here
+        """
+        return any([policy.shouldTruncate(self, info) for policy in self.terminationPolicies])
+
+    def recordTelemetry(self, frames, decisionTime):
+        """Records the metrics of the decision that was just played in the lobby's Telemetry
+
+        Parameters
+        ----------
+        frames
+            The number of frames emulated for the decision
+
+        decisionTime
+            The seconds the player took to pick its move
+
+        Returns
+        -------
+        None
+        """
+        player = self.players[0]
+        self.telemetry.increment('frames', frames)
+        self.telemetry.increment('decisions')
+        self.telemetry.observe('inference_seconds', decisionTime)
+        self.telemetry.observe('reward', self.lastReward)
+        self.telemetry.setGauge('memory_size', len(player.memory))
+        if hasattr(player, 'epsilon'): self.telemetry.setGauge('epsilon', player.epsilon)
+
+    def recordDamage(self, lastInfo, info):
+        """Adds the health each fighter lost between two decision points to the running damage totals of the fight
+
+        Parameters
+        ----------
+        lastInfo
+            The RAM info of the game state the last move was picked in
+
+        info
+            The RAM info of the game state the last move led to
+
+        Returns
+        -------
+        None
+        """
+        # Health is refilled at the start of every round so only drops count as damage, KO'd fighters can read below zero
+        self.damageDealt += max(0, max(lastInfo['enemy_health'], 0) - max(info['enemy_health'], 0))
+        self.damageTaken += max(0, max(lastInfo['health'], 0) - max(info['health'], 0))
+
+    def summarizeFight(self, state, seconds):
+        """Collects the bookkeeping from the fight that just finished into a summary
+
+        Parameters
+        ----------
+        state
+            A string of the name of the save state that was played
+
+        seconds
+            The wall clock time the fight took
+
+        Returns
+        -------
+        summary
+            A dictionary with the save state, whether the fight was won, the rounds won and lost,
+            the damage dealt and taken, the number of emulated frames and decisions, the wall time
+            and whether a termination policy cut the fight short. A truncated fight with the rounds tied
+            counts as won if the Agent was ahead on health when it stopped
+        """
+        won = self.lastInfo['matches_won'] > self.lastInfo['enemy_matches_won']
+        if self.truncated and self.lastInfo['matches_won'] == self.lastInfo['enemy_matches_won']:
+            won = max(self.lastInfo['health'], 0) > max(self.lastInfo['enemy_health'], 0)
+        return {'state' : state,
+                'won' : bool(won),
+                'roundsWon' : int(self.lastInfo['matches_won']),
+                'roundsLost' : int(self.lastInfo['enemy_matches_won']),
+                'damageDealt' : int(self.damageDealt),
+                'damageTaken' : int(self.damageTaken),
+                'frames' : self.frameCount,
+                'decisions' : self.decisionCount,
+                'seconds' : seconds,
+                'truncated' : self.truncated}
 
     def enterFrameInputs(self):
         """Enter each of the frame inputs in the input buffer inside the last action object supplied by the Agent
@@ -212,7 +476,8 @@ class Lobby():
             The image buffer data received from the emulator after entering all input frames
         """
         for frame in self.frameInputs:
-            obs, tempReward, self.done, info = self.environment.step(frame)
+            obs, tempReward, self.done, info = self.stepFrame(frame)
+            self.frameCount += 1
             if self.done: return info, obs
             if self.render: 
                 self.environment.render()
@@ -240,8 +505,13 @@ class Lobby():
             The image buffer data received from the emulator after finally getting to an actionable state
 
         """
-        while not self.isActionableState(info, action= self.frameInputs[-1]):
-            obs, tempReward, self.done, info = self.environment.step(Lobby.NO_ACTION)
+        deadFrames = 0
+        if self.frameData is not None and not self.done:
+            deadFrames = self.frameData.getDeadFrames(self.players[0].moveList(self.lastAction)) - self.heldFrames        # Holding the move used up some of them
+        while deadFrames > 0 or not self.isActionableState(info, action= self.frameInputs[-1]):                # Known dead frames skip the check
+            deadFrames -= 1
+            obs, tempReward, self.done, info = self.stepFrame(Lobby.NO_ACTION)
+            self.frameCount += 1
             if self.done: return info, obs
             if self.render: self.environment.render()
             if self.render:
@@ -250,7 +520,7 @@ class Lobby():
             self.lastReward += tempReward
         return info, obs
 
-    def executeTrainingRun(self, review= True, episodes= 1):
+    def executeTrainingRun(self, review= True, episodes= 1, scheduler= None):
         """The lobby will load each of the saved states to generate data for the agent to train on
             Note: This will only work for single player mode
 
@@ -262,17 +532,27 @@ class Lobby():
         episodes
             An integer that represents the number of game play episodes to go through before training, once through the roster is one episode
 
+        scheduler
+            An optional CurriculumScheduler that picks the save states of each episode and is told the outcome of every fight,
+            by default every save state is played once per episode
+
         Returns
         -------
-        None
+        summaries
+            A list of the fight summaries from play, in the order the fights were played
         """
+        summaries = []
         for episodeNumber in range(episodes):
             print('Starting episode', episodeNumber)
-            for state in Lobby.getStates():
-                self.play(state= state)
+            states = Lobby.getStates() if scheduler is None else scheduler.nextStates()
+            for state in states:
+                summaries.append(self.play(state= state))
+                if scheduler is not None: scheduler.record(summaries[-1])
             
             if self.players[0].__class__.__name__ != "Agent" and review == True: 
                 self.players[0].reviewFight()
+            if self.memoryMonitor is not None: print(self.memoryMonitor.formatSample(self.memoryMonitor.sample('episode', agent= self.players[0])))
+        return summaries
 
 
 # Makes an example lobby and has a random agent play through an example training run
@@ -0,0 +1,252 @@
+import argparse, multiprocessing, os, time, numpy
+from DeepQAgent import DeepQAgent
+from DefaultMoveList import Moves
+
+# Each planner process keeps one lobby whose emulator is rewound to the decision being planned for every branch
+_plannerLobby = None
+
+def _initializePlanner(state):
+    """Creates the planner process's lobby, gym retro only allows one emulator per process so each branch worker owns one"""
+    global _plannerLobby
+    for variable in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']:
+        os.environ[variable] = '1'
+    from Lobby import Lobby
+    _plannerLobby = Lobby(skipScreens= True)                                                       # Branches only read the RAM info
+    _plannerLobby.initEnvironment(state)
+
+def _simulateBranch(task):
+    """Plays one candidate move from a saved emulator state through to the next actionable state
+
+    Parameters
+    ----------
+    task
+        A dictionary with the 'move' index, its 'frameInputs', the 'emulatorState' to start from, the lobby's 'jumpFrame' counter,
+        the starting 'health' and 'enemyHealth' and the wall clock 'deadline' after which the branch is abandoned
+
+    Returns
+    -------
+    outcome
+        A dictionary with the move, whether the branch 'finished' before the deadline, the 'damageDealt' and 'damageTaken'
+        along the branch, the scenario 'reward', whether the fight was 'done' and the number of 'frames' simulated
+    """
+    from Lobby import Lobby
+    lobby = _plannerLobby
+    lobby.environment.unwrapped.em.set_state(task['emulatorState'])
+    lobby.currentJumpFrame, lobby.frameInputs = task['jumpFrame'], task['frameInputs']
+    lobby.lastReward, lobby.done, lobby.frameCount = 0, False, 0
+    outcome = {'move' : task['move'], 'finished' : False}
+
+    info = None
+    for frame in lobby.frameInputs:
+        if time.time() > task['deadline']: return outcome                                          # Abandoned branches free the worker for the next decision
+        _, reward, lobby.done, info = lobby.stepFrame(frame)
+        lobby.frameCount += 1
+        lobby.lastReward += reward
+        if lobby.done: break
+    while not lobby.done and not lobby.isActionableState(info, action= lobby.frameInputs[-1]):
+        if time.time() > task['deadline']: return outcome                                          # Abandoned branches free the worker for the next decision
+        _, reward, lobby.done, info = lobby.stepFrame(Lobby.NO_ACTION)
+        lobby.frameCount += 1
+        lobby.lastReward += reward
+
+    outcome.update({'finished' : True,
+                    'damageDealt' : max(0, max(task['enemyHealth'], 0) - max(info['enemy_health'], 0)),
+                    'damageTaken' : max(0, max(task['health'], 0) - max(info['health'], 0)),
+                    'reward' : float(lobby.lastReward),
+                    'done' : bool(lobby.done),
+                    'frames' : lobby.frameCount})
+    return outcome
+
+class LookaheadAgent(DeepQAgent):
+    """A DeepQ agent that plans every move by branching the emulator.
+       At each actionable state the emulator state is saved and every candidate move is played out from it, across a pool of
+       worker emulators, until the player can act again. The move whose branch deals the most damage for the least taken wins,
+       optionally blended with the network's Q values, with ties going to the branch that collected the most scenario reward
+       and then to a random one of them. Each decision has a wall clock budget, branches that have not finished by then are
+       abandoned and left out of the choice, so a decision never waits much longer than the budget. When no branch finishes
+       in time the move with the highest Q value is played, or a random move when the network is not used.
+
+       The planner processes are stopped by closePlanner, which also runs when the agent is used as a context manager or collected.
+    """
+
+    ### Static Variables
+
+    DEFAULT_DECISION_TIME = 0.1                                                                    # Seconds each decision may spend waiting on its branches
+    DEFAULT_Q_WEIGHT = 0                                                                           # Weight of the Q values next to the planned outcome, 0 plans without the network
+
+    ### End of static variables
+
+    def __init__(self, load= False, epsilon= 0, name= None, moveList= Moves, processes= None, decisionTime= DEFAULT_DECISION_TIME,
+                 qWeight= DEFAULT_Q_WEIGHT, candidates= None, **kwargs):
+        """Initializes the agent, the planner processes are only started when the first move is planned
+
+        Parameters
+        ----------
+        load
+            A boolean flag that specifies whether to initialize the model from scratch or load in a pretrained model
+
+        epsilon
+            The exploration value, moves are picked at random instead of planned at this rate
+
+        name
+            A string representing the name of the agent that will be used when saving the model and training logs
+            Defaults to the class name if none is provided
+
+        moveList
+            An enum class that contains all of the allowed moves the Agent can perform
+
+        processes
+            The number of worker emulators branches are simulated on, defaults to the number of cores on the machine
+
+        decisionTime
+            The wall clock budget of a single decision in seconds
+
+        qWeight
+            How much the network's Q values count next to the planned outcome, 0 plans without ever running the network
+
+        candidates
+            When blending with Q values, only the moves with the highest Q values up to this number are simulated. Defaults to every move
+
+        kwargs
+            Any of the other settings accepted by DeepQAgent
+
+        Returns
+        -------
+        None
+        """
+        self.processes = processes or os.cpu_count()
+        self.decisionTime = decisionTime
+        self.qWeight = qWeight
+        self.candidates = candidates
+        self.lobby = None
+        self.planner = None
+        super(LookaheadAgent, self).__init__(load= load, epsilon= epsilon, name= name, moveList= moveList, **kwargs)
+
+    def attachLobby(self, lobby):
+        """Keeps the lobby of the fight so its emulator state can be branched from"""
+        self.lobby = lobby
+
+    def startPlanner(self):
+        """Starts the pool of worker emulators"""
+        from Lobby import Lobby
+        context = multiprocessing.get_context('spawn')                                            # Forking a process that already holds an emulator is unsafe
+        self.planner = context.Pool(processes= self.processes, initializer= _initializePlanner, initargs= (sorted(Lobby.getStates())[0],))
+
+    def closePlanner(self):
+        """Stops the worker emulators"""
+        if self.planner is not None:
+            self.planner.terminate()
+            self.planner = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.closePlanner()
+
+    def __del__(self):
+        self.closePlanner()
+
+    def getMove(self, obs, info):
+        """Returns the move with the best planned outcome, see the class description
+
+        Parameters
+        ----------
+        obs
+            The observation of the current environment, 2D numpy array of pixel values
+
+        info
+            An array of information about the current environment, like player health, enemy health, matches won, and matches lost, etc.
+
+        Returns
+        -------
+        move
+            An integer representing the move selected from the move list
+
+        frameInputs
+            A set of frame inputs where each number corresponds to a set of button inputs in the action space.
+        """
+        if numpy.random.rand() < self.epsilon or self.lobby is None:
+            return self.getRandomMove(info)
+        moves = list(self.moveList)
+        qValues, candidates = self.rankCandidates(obs, info)
+        scores, rewards = self.planMoves(info, candidates)
+        if scores is None:
+            if qValues is None: return self.getRandomMove(info)                                    # No branch finished in time and there is nothing else to go on
+            move = int(numpy.argmax(qValues))
+        else:
+            if qValues is not None: scores = scores + self.qWeight * qValues
+            best = numpy.flatnonzero(scores == scores.max())
+            best = best[rewards[best] == rewards[best].max()]                                     # Most one move branches deal no damage either way, the reward separates them
+            move = int(numpy.random.choice(best))
+        return move, self.convertMoveToFrameInputs(moves[move], info)
+
+    def rankCandidates(self, obs, info):
+        """Returns the Q values of every move, or None when the network is not used, and the indices of the moves to simulate"""
+        if self.qWeight == 0: return None, range(len(self.moveList))
+        qValues = self.predictQValues(self.getNetworkInputs(obs, info))[0]
+        order = numpy.argsort(-qValues)
+        if self.candidates is not None: order = order[:self.candidates]
+        return qValues, order
+
+    def planMoves(self, info, candidates):
+        """Simulates the candidate moves from the current emulator state and scores them
+
+        Parameters
+        ----------
+        info
+            The RAM info of the current state
+
+        candidates
+            The indices of the moves to simulate as returned by rankCandidates
+
+        Returns
+        -------
+        scores
+            An array with one score per move, the damage dealt minus the damage taken along its branch.
+            Moves that were not simulated or did not finish in time score -inf, None if no branch finished
+
+        rewards
+            An array with the scenario reward collected along each move's branch, -inf where the score is, None if no branch finished
+        """
+        if self.planner is None: self.startPlanner()
+        deadline = time.time() + self.decisionTime
+        moves = list(self.moveList)
+        emulatorState = self.lobby.environment.unwrapped.em.get_state()
+        branches = [self.planner.apply_async(_simulateBranch, ({'move' : move, 'frameInputs' : self.convertMoveToFrameInputs(moves[move], info),
+                                                                 'emulatorState' : emulatorState, 'jumpFrame' : self.lobby.currentJumpFrame,
+                                                                 'health' : info['health'], 'enemyHealth' : info['enemy_health'], 'deadline' : deadline},))
+                    for move in candidates]
+
+        scores, rewards = numpy.full(len(moves), -numpy.inf), numpy.full(len(moves), -numpy.inf)
+        for branch in branches:
+            branch.wait(max(deadline - time.time(), 0))
+            if not branch.ready(): continue                                                        # Left running, the worker abandons it at the deadline
+            outcome = branch.get()
+            if outcome['finished']:
+                scores[outcome['move']] = outcome['damageDealt'] - outcome['damageTaken']
+                rewards[outcome['move']] = outcome['reward']
+
+        if numpy.all(numpy.isinf(scores)): return None, None
+        return scores, rewards
+
+
+"""Plays a training run with every move planned by branching the emulator"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes lookahead agent parameters.')
+    parser.add_argument('-r', '--render', action= 'store_true', help= 'Boolean flag for if the user wants the game environment to render during play')
+    parser.add_argument('-l', '--load', action= 'store_true', help= 'Boolean flag for if the user wants to load pre-existing weights')
+    parser.add_argument('-e', '--episodes', type= int, default= 1, help= 'Intger representing the number of training rounds to go through, checkpoints are made at the end of each episode')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the instance that will be used when saving the model or it\'s training logs')
+    parser.add_argument('-t', '--time', type= float, default= LookaheadAgent.DEFAULT_DECISION_TIME, help= 'Wall clock budget of each decision in seconds')
+    parser.add_argument('-q', '--qWeight', type= float, default= LookaheadAgent.DEFAULT_Q_WEIGHT, help= 'Weight of the Q values next to the planned outcome')
+    parser.add_argument('-c', '--candidates', type= int, default= None, help= 'Number of highest Q value moves simulated when blending with Q values')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of worker emulators, defaults to the number of cores')
+    args = parser.parse_args()
+    agent = LookaheadAgent(load= args.load, name= args.name, processes= args.processes, decisionTime= args.time, qWeight= args.qWeight, candidates= args.candidates)
+
+    from Lobby import Lobby
+    lobby = Lobby(render= args.render)
+    lobby.addPlayer(agent)
+    with agent:
+        lobby.executeTrainingRun(episodes= args.episodes)
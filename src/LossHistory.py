@@ -1,18 +1,27 @@
-from tensorflow.python import keras
+from collections import deque
 
-class LossHistory(keras.callbacks.Callback):
-    """A class for keras to use to store training losses for the model to use:
+class LossHistory():
+    """A class to store the training losses of a model for the agent to use:
        1. initialize a LossHistory object inside your agent
-       2. and put callbacks= [self.lossHistory] in the model.fit() call
+       2. call record with the loss of each training batch
+       Only the latest MAX_LOSSES losses are kept so a long training round cannot grow it without bound,
+       while getMean still averages every loss recorded since the last clear.
     """
+
+    MAX_LOSSES = 10000                                        # Number of latest losses kept
+
     def __init__(self):
-        self.losses = []
+        self.losses_clear()
 
-    def on_train_begin(self, logs={}):
-        pass
+    def record(self, loss):
+        self.losses.append(loss)
+        self.total += loss
+        self.count += 1
 
-    def on_batch_end(self, batch, logs={}):
-        self.losses.append(logs.get('loss'))
+    def getMean(self):
+        """Returns the mean of every loss recorded since the last clear, 0 if there are none"""
+        return self.total / self.count if self.count > 0 else 0.0
 
     def losses_clear(self):
-        self.losses = []
\ No newline at end of file
+        self.losses = deque(maxlen= LossHistory.MAX_LOSSES)
+        self.total, self.count = 0.0, 0
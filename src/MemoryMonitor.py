@@ -0,0 +1,226 @@
+import os, sys, tracemalloc, numpy
+from collections import deque
+
+class MemoryMonitor():
+    """Accounts for the memory of a training run at the boundaries between its phases, like the end of each fight and of each episode.
+       Every sample records the resident set size of the process next to byte estimates of the structures known to hold the most,
+       the Agent's memory of recorded steps with its screens and info dictionaries, the LossHistory, the Keras weights and optimizer
+       slots along with the number of times the training step was traced, the Q value cache and the emulator's save state and screen.
+
+       The episode samples are kept to follow the growth of the run. Once the resident set size has grown across most of the latest
+       episodes by more than the tracked structures account for, the growth is reported as a possible leak, as a healthy run
+       levels off once its memory and caches are full. With tracemalloc enabled each episode also records the source lines whose
+       allocations grew the most since the last one, which points at the Python side of a leak at some cost in speed.
+    """
+
+    ### Static Variables
+
+    LEAK_WINDOW = 8                                                                                # Number of latest episode samples the growth is judged over
+    LEAK_MIN_GROWTH = 64 * 2 ** 20                                                                 # Bytes of untracked growth across the window reported as a possible leak
+    LEAK_RISING_FRACTION = 0.75                                                                    # Share of the episodes in the window whose resident set size has to grow
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def getRss():
+        """Static method that returns the current resident set size of the process in bytes,
+           the peak is returned instead on systems without /proc as it is the only figure the standard library offers"""
+        try:
+            with open('/proc/self/status') as file:
+                for line in file:
+                    if line.startswith('VmRSS:'): return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024                                   # macOS reports bytes, Linux kilobytes
+
+    def estimateMemoryBytes(memory):
+        """Static method that estimates the bytes held by an Agent's memory of recorded steps
+
+        Parameters
+        ----------
+        memory
+            The Agent's deque of step tuples, see Agent.recordStep
+
+        Returns
+        -------
+        estimates
+            A dictionary with the bytes of the step tuples, of the screens and of the info dictionaries. A screen or info dictionary
+            shared by consecutive steps, like the next observation of one step and the observation of the next, is counted once
+            and the frames of stacked observations are counted once however many stacks hold them
+        """
+        from Agent import Agent
+        screens, infos = {}, {}
+        for step in memory:
+            for index in (Agent.OBSERVATION_INDEX, Agent.NEXT_OBSERVATION_INDEX):
+                observation = step[index]
+                for frame in getattr(observation, 'frames', (observation,)):                      # LazyFrames hold references to shared frames
+                    if isinstance(frame, numpy.ndarray): screens[id(frame)] = frame.nbytes
+            infos[id(step[Agent.STATE_INDEX])] = step[Agent.STATE_INDEX]
+            infos[id(step[Agent.NEXT_STATE_INDEX])] = step[Agent.NEXT_STATE_INDEX]
+
+        # Every info dictionary has the same entries so one is measured and the rest are assumed to match
+        infoBytes = 0
+        if len(infos) > 0:
+            info = next(iter(infos.values()))
+            infoBytes = len(infos) * (sys.getsizeof(info) + sum(sys.getsizeof(value) for value in info.values()))
+        stepBytes = sys.getsizeof(memory) + sum(sys.getsizeof(step) for step in memory)
+        return {'memorySteps' : stepBytes, 'memoryScreens' : sum(screens.values()), 'memoryInfos' : infoBytes}
+
+    def estimateModelBytes(agent):
+        """Static method that estimates the bytes held by an Agent's Keras networks without building a network that was never used
+
+        Parameters
+        ----------
+        agent
+            The Agent to measure
+
+        Returns
+        -------
+        estimates
+            A dictionary with the bytes of the network and target network weights, the bytes of the optimizer's slots
+            and the number of times the compiled training step has been traced, which should stay at one per input shape
+        """
+        def variableBytes(variables):
+            return int(sum(numpy.prod(variable.shape) * variable.dtype.size for variable in variables))
+
+        model = getattr(agent, '_model', None)
+        estimates = {'modelWeights' : 0, 'modelOptimizer' : 0, 'trainStepTraces' : 0}
+        if model is None: return estimates
+        estimates['modelWeights'] = variableBytes(model.weights)
+        targetModel = getattr(agent, 'targetModel', None)
+        if targetModel is not None: estimates['modelWeights'] += variableBytes(targetModel.weights)
+        optimizer = getattr(model, 'optimizer', None)
+        if optimizer is not None:
+            variables = optimizer.variables
+            estimates['modelOptimizer'] = variableBytes(variables() if callable(variables) else variables)      # A method before TensorFlow 2.11
+        trainStep = getattr(agent, 'trainStep', None)
+        if trainStep is not None: estimates['trainStepTraces'] = int(trainStep.experimental_get_tracing_count())
+        return estimates
+
+    def estimateEmulatorBytes(lobby):
+        """Static method that returns the bytes of the save state and the last screen of a Lobby's running emulator, 0 if none is running"""
+        environment = getattr(lobby, 'environment', None)
+        if environment is None or not hasattr(environment.unwrapped, 'em'): return 0               # Closing the environment deletes its emulator
+        retroEnvironment = environment.unwrapped
+        screen = getattr(retroEnvironment, 'img', None)
+        return len(retroEnvironment.em.get_state()) + (screen.nbytes if screen is not None else 0)
+
+    ### End of static methods
+
+    def __init__(self, metrics= None, tracemallocTop= 0):
+        """Initializes the monitor
+
+        Parameters
+        ----------
+        metrics
+            An optional MetricsStore the samples, leak warnings and allocation snapshots are recorded in
+
+        tracemallocTop
+            The number of source lines with the most allocation growth to record every episode, 0 leaves tracemalloc off
+
+        Returns
+        -------
+        None
+        """
+        self.metrics = metrics
+        self.tracemallocTop = tracemallocTop
+        self.episodes = deque(maxlen= MemoryMonitor.LEAK_WINDOW)                                   # The latest episode samples
+        self.snapshot = None
+        if tracemallocTop > 0 and not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def sample(self, phase, agent= None, lobby= None):
+        """Measures the process and the tracked structures and records the sample
+
+        Parameters
+        ----------
+        phase
+            The name of the boundary the sample is taken at, 'episode' samples are also checked for leaks and should be
+            taken at the same point of every episode, after the Agent has reviewed its fights and cleared its memory
+
+        agent
+            The Agent whose memory, losses, networks and cache are measured
+
+        lobby
+            The Lobby whose emulator is measured, if it is still running
+
+        Returns
+        -------
+        sample
+            A dictionary with the phase, the resident set size 'rss' and the byte estimates, the untracked bytes are the rss minus them
+        """
+        sample = {'phase' : phase, 'rss' : MemoryMonitor.getRss()}
+        if agent is not None:
+            sample.update(MemoryMonitor.estimateMemoryBytes(agent.memory))
+            lossHistory = getattr(agent, 'lossHistory', None)
+            if lossHistory is not None: sample['lossHistory'] = sys.getsizeof(lossHistory.losses) + len(lossHistory.losses) * sys.getsizeof(0.0)
+            sample.update(MemoryMonitor.estimateModelBytes(agent))
+            qValueCache = getattr(agent, 'qValueCache', None)
+            if qValueCache is not None: sample['qValueCache'] = sum(sys.getsizeof(key) + value.nbytes for key, value in qValueCache.entries.items())
+        if lobby is not None: sample['emulator'] = MemoryMonitor.estimateEmulatorBytes(lobby)
+        sample['tracked'] = sum(value for name, value in sample.items() if name not in ['phase', 'rss', 'trainStepTraces'])
+        sample['untracked'] = sample['rss'] - sample['tracked']
+
+        if self.metrics is not None: self.metrics.record('memory', **sample)
+        if phase == 'episode':
+            self.episodes.append(sample)
+            self.checkForLeak()
+            if self.tracemallocTop > 0: self.recordAllocations()
+        return sample
+
+    def checkForLeak(self):
+        """Reports a possible leak if the resident set size grew across most of the latest episodes by more than the tracked structures did
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        growth
+            The untracked bytes gained across the window if it looks like a leak, otherwise None
+        """
+        if len(self.episodes) < MemoryMonitor.LEAK_WINDOW: return None
+        rss = [episode['rss'] for episode in self.episodes]
+        rising = sum(later > earlier for earlier, later in zip(rss, rss[1:])) / (len(rss) - 1)
+        growth = self.episodes[-1]['untracked'] - self.episodes[0]['untracked']
+        if rising < MemoryMonitor.LEAK_RISING_FRACTION or growth < MemoryMonitor.LEAK_MIN_GROWTH: return None
+
+        print('Possible memory leak: {0:.1f} MB of untracked growth over the last {1} episodes, rss is {2:.1f} MB'.format(
+              growth / 2 ** 20, len(self.episodes), rss[-1] / 2 ** 20))
+        if self.metrics is not None: self.metrics.record('memoryLeakWarning', growth= growth, episodes= len(self.episodes), rss= rss[-1])
+        self.episodes.clear()                                                                      # Wait for a full window of new episodes before warning again
+        return growth
+
+    def recordAllocations(self):
+        """Takes a tracemalloc snapshot and records the source lines whose allocations grew the most since the last snapshot
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        allocations
+            A list of dictionaries with the 'location', the bytes 'size' allocated there, its 'sizeDiff' since the last snapshot
+            and the 'count' of live blocks, an empty list for the first snapshot
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        allocations = []
+        if self.snapshot is not None:
+            growth = sorted([statistic for statistic in snapshot.compare_to(self.snapshot, 'lineno') if statistic.size_diff > 0],
+                            key= lambda statistic: statistic.size_diff, reverse= True)
+            for statistic in growth[:self.tracemallocTop]:
+                frame = statistic.traceback[0]
+                allocations.append({'location' : '{0}:{1}'.format(os.path.basename(frame.filename), frame.lineno),
+                                    'size' : statistic.size, 'sizeDiff' : statistic.size_diff, 'count' : statistic.count})
+            if self.metrics is not None: self.metrics.record('memoryAllocations', allocations= allocations)
+        self.snapshot = snapshot
+        return allocations
+
+    def formatSample(self, sample):
+        """Returns a sample as one line of megabytes for printing"""
+        return sample['phase'] + '  ' + '  '.join('{0} {1:.1f} MB'.format(name, value / 2 ** 20) for name, value in sample.items()
+                                                  if name not in ['phase', 'trainStepTraces'] and value > 0)
@@ -0,0 +1,68 @@
+import json, os, time
+
+class MetricsStore():
+    """A structured log of metrics for a named run stored as one JSON record per line in ../logs/{name}Metrics.
+       Each record has a kind, describing what was measured, a timestamp and any number of named values.
+       Unlike the plain loss logs this can hold evaluation results, telemetry and anything else a run wants to keep.
+    """
+
+    DEFAULT_LOGS_DIR_PATH = '../logs'                                                              # Default path to the dir where training logs are saved for user review
+
+    def __init__(self, name, logsDir= DEFAULT_LOGS_DIR_PATH):
+        """Initializes the store
+
+        Parameters
+        ----------
+        name
+            The name of the run the metrics belong to, normally the name of the Agent
+
+        logsDir
+            The directory the metrics file is kept in
+
+        Returns
+        -------
+        None
+        """
+        self.name = name
+        self.path = os.path.join(logsDir, name + "Metrics")
+
+    def record(self, kind, **values):
+        """Appends a record to the store
+
+        Parameters
+        ----------
+        kind
+            A string naming what the record describes, for example 'evaluation'
+
+        values
+            The named values to store, they must be serializable to JSON
+
+        Returns
+        -------
+        record
+            The dictionary that was written
+        """
+        record = {'kind' : kind, 'time' : time.time()}
+        record.update(values)
+        with open(self.path, 'a+') as file:
+            file.write(json.dumps(record))
+            file.write('\n')
+        return record
+
+    def read(self, kind= None):
+        """Returns every record in the store, oldest first
+
+        Parameters
+        ----------
+        kind
+            If given only the records of this kind are returned
+
+        Returns
+        -------
+        records
+            A list of record dictionaries
+        """
+        if not os.path.exists(self.path): return []
+        with open(self.path) as file:
+            records = [json.loads(line) for line in file if line.strip()]
+        return [record for record in records if kind is None or record['kind'] == kind]
@@ -0,0 +1,56 @@
+import numpy
+
+def computeNStepReturns(rewards, dones, gamma, steps, episodeEnds= None):
+    """Computes the discounted n-step returns of every transition in a recorded sequence of fights at once.
+       The work is one pass of NumPy array operations per step of look ahead, so the cost grows with
+       the number of transitions times steps and stays in the milliseconds even for a full 50000 step memory.
+
+    Parameters
+    ----------
+    rewards
+        A 1D array of the reward received for each transition
+
+    dones
+        A 1D array flagging the transitions that ended a fight, no rewards are summed past them and nothing is bootstrapped from them
+
+    gamma
+        The discount rate applied to each step of look ahead
+
+    steps
+        The maximum number of rewards to sum before bootstrapping, 1 gives the usual one step DeepQ targets
+
+    episodeEnds
+        An optional 1D array flagging transitions where a fight was cut short without finishing,
+        no rewards are summed past them but the value of their next state is still bootstrapped
+
+    Returns
+    -------
+    returns
+        A 1D array with the discounted sum of up to steps rewards starting at each transition
+
+    bootstrapIndices
+        A 1D array with the index of the transition whose next state should be used to bootstrap each return
+
+    bootstrapDiscounts
+        A 1D array with the discount to apply to the bootstrapped value of each return, zero when the fight finished inside the window
+    """
+    count = len(rewards)
+    rewards = numpy.asarray(rewards, dtype= numpy.float32)
+    dones = numpy.asarray(dones, dtype= bool)
+    ends = dones if episodeEnds is None else dones | numpy.asarray(episodeEnds, dtype= bool)
+
+    indices = numpy.arange(count)
+    returns = numpy.zeros(count, dtype= numpy.float32)
+    discounts = numpy.ones(count, dtype= numpy.float32)
+    bootstrapIndices = indices.copy()
+    active = numpy.ones(count, dtype= bool)                                                        # Whether the window starting at each transition is still summing rewards
+    for offset in range(steps):
+        stepIndices = numpy.minimum(indices + offset, count - 1)
+        active &= indices + offset < count                                                         # Windows running off the end of memory bootstrap from the last transition
+        returns += numpy.where(active, discounts * rewards[stepIndices], 0)
+        bootstrapIndices = numpy.where(active, stepIndices, bootstrapIndices)
+        discounts = numpy.where(active, discounts * gamma, discounts)
+        active &= ~ends[stepIndices]
+
+    bootstrapDiscounts = numpy.where(dones[bootstrapIndices], 0, discounts).astype(numpy.float32)
+    return returns, bootstrapIndices, bootstrapDiscounts
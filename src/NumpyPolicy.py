@@ -0,0 +1,163 @@
+import numpy
+
+class NumpyPolicy():
+    """A copy of a dense Keras network that runs its forward pass with NumPy alone.
+       Calling into Keras for a single feature vector pays for the framework's dispatch on every decision,
+       for networks as small as the DeepQAgent's a plain NumPy forward pass is much faster and gives the same Q values.
+    """
+
+    # Activation functions that can appear on the Dense layers of a supported model
+    ACTIVATIONS = {'relu' : lambda x: numpy.maximum(x, 0),
+                   'linear' : lambda x: x}
+
+    ### Static Methods
+
+    def fromModel(model):
+        """Static method that copies the weights of a Keras model made of Dense layers into a new policy
+
+        Parameters
+        ----------
+        model
+            A Keras Sequential model made only of Dense layers
+
+        Returns
+        -------
+        policy
+            A NumpyPolicy producing the same outputs as the model
+        """
+        kernels, biases, activations = [], [], []
+        for layer in model.layers:
+            kernel, bias = layer.get_weights()
+            kernels.append(kernel.astype(numpy.float32))
+            biases.append(bias.astype(numpy.float32))
+            activations.append(layer.get_config()['activation'])
+        return NumpyPolicy(kernels, biases, activations)
+
+    def fromWeightsFile(path, activations= None):
+        """Static method that reads the weights of a Dense network straight from a Keras HDF5 weights file.
+           Only h5py is needed, so a policy can be loaded in a process that never imports TensorFlow.
+
+        Parameters
+        ----------
+        path
+            Path to a weights file written by Keras save_weights in HDF5 format
+
+        activations
+            A list of the activation function names of the network's layers, the file only holds the weights.
+            Defaults to relu on every layer except a linear output layer, as in the DeepQAgent
+
+        Returns
+        -------
+        policy
+            A NumpyPolicy producing the same outputs as the saved network
+        """
+        import h5py
+        kernels, biases = [], []
+        with h5py.File(path, 'r') as file:
+            for layerName in file.attrs['layer_names']:
+                layer = file[layerName]
+                weights = [layer[weightName][()] for weightName in layer.attrs['weight_names']]
+                if len(weights) == 0: continue                                                     # Layers without weights such as inputs or dropout
+                kernels.append(weights[0].astype(numpy.float32))
+                biases.append(weights[1].astype(numpy.float32))
+        if activations is None: activations = ['relu'] * (len(kernels) - 1) + ['linear']
+        return NumpyPolicy(kernels, biases, activations)
+
+    def load(path):
+        """Static method that loads a policy previously written with save
+
+        Parameters
+        ----------
+        path
+            Path to the .npz file the policy was saved to
+
+        Returns
+        -------
+        policy
+            The loaded NumpyPolicy
+        """
+        with numpy.load(path, allow_pickle= False) as archive:
+            return NumpyPolicy.fromArrays(archive)
+
+    def fromArrays(arrays):
+        """Static method that builds a policy from the named arrays returned by toArrays
+
+        Parameters
+        ----------
+        arrays
+            A mapping from array names to arrays as returned by toArrays, or a loaded .npz archive
+
+        Returns
+        -------
+        policy
+            The rebuilt NumpyPolicy
+        """
+        activations = [str(activation) for activation in arrays['activations']]
+        kernels = [arrays['kernel{0}'.format(index)] for index in range(len(activations))]
+        biases = [arrays['bias{0}'.format(index)] for index in range(len(activations))]
+        return NumpyPolicy(kernels, biases, activations)
+
+    ### End of static methods
+
+    def __init__(self, kernels, biases, activations):
+        """Initializes the policy from the raw layer weights
+
+        Parameters
+        ----------
+        kernels
+            A list of 2D weight matrices, one for each layer
+
+        biases
+            A list of bias vectors, one for each layer
+
+        activations
+            A list of activation function names, one for each layer
+
+        Returns
+        -------
+        None
+        """
+        self.kernels = kernels
+        self.biases = biases
+        self.activations = activations
+        self.activationFunctions = [NumpyPolicy.ACTIVATIONS[activation] for activation in activations]
+
+    def predict(self, stateData):
+        """Runs the forward pass of the network
+
+        Parameters
+        ----------
+        stateData
+            A 2D array of feature vectors, one row per state
+
+        Returns
+        -------
+        outputs
+            A 2D array of the network outputs, one row per state
+        """
+        outputs = numpy.asarray(stateData, dtype= numpy.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activationFunctions):
+            outputs = activation(numpy.dot(outputs, kernel) + bias)
+        return outputs
+
+    def save(self, path):
+        """Writes the policy weights to a .npz file that can be read back without TensorFlow
+
+        Parameters
+        ----------
+        path
+            Path of the file to write
+
+        Returns
+        -------
+        None
+        """
+        numpy.savez(path, **self.toArrays())
+
+    def toArrays(self):
+        """Returns the policy as a dictionary of named NumPy arrays, the form it is saved and sent between processes in"""
+        arrays = {'activations' : numpy.array(self.activations)}
+        for index, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays['kernel{0}'.format(index)] = kernel
+            arrays['bias{0}'.format(index)] = bias
+        return arrays
@@ -0,0 +1,163 @@
+import json, numpy
+from collections import deque
+
+class LazyFrames():
+    """A stack of preprocessed frames that only holds references to the frames it is made of.
+       Consecutive stacks share all but one of their frames, and a transition's next observation is the same
+       object as the following transition's observation, so each frame is stored once no matter how many
+       transitions refer to it. The stacked array is only built when it is converted with numpy.asarray.
+    """
+
+    def __init__(self, frames):
+        """Initializes the stack
+
+        Parameters
+        ----------
+        frames
+            A tuple of 2D uint8 frames, oldest first
+
+        Returns
+        -------
+        None
+        """
+        self.frames = frames
+
+    def __array__(self, dtype= None, copy= None):
+        stack = numpy.stack(self.frames, axis= -1)
+        if dtype is not None: stack = stack.astype(dtype)
+        return stack
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def shape(self):
+        return self.frames[0].shape + (len(self.frames),)
+
+class ObservationPipeline():
+    """Preprocesses the screens coming out of the emulator into small grayscale frames and stacks the latest ones together.
+       The environment already crops the screen to the play area declared in scenario.json, the pipeline subsamples it,
+       converts it to grayscale and stores it as uint8, cutting the memory of a frame from a full RGB screen to a few kilobytes.
+    """
+
+    ### Static Variables
+
+    DEFAULT_SCENARIO_PATH = '../StreetFighterIISpecialChampionEdition-Genesis/scenario.json'       # The scenario declaring the crop of the play area
+    DEFAULT_DOWNSAMPLE = 2                                                                         # Only every n-th row and column of the screen are kept
+    DEFAULT_STACK_SIZE = 4                                                                         # How many of the latest frames make up an observation
+    FULL_SCREEN_SIZE = (224, 256)                                                                  # Height and width of a Genesis screen in Street Fighter
+    SCREEN_SIZE = (200, 256)                                                                       # Height and width of the screens the environment returns once the scenario crop is applied
+
+    GRAYSCALE_WEIGHTS = numpy.array([77, 150, 29], dtype= numpy.uint16)                            # Integer luma weights for red, green and blue that sum to 256
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def fromScenario(path= DEFAULT_SCENARIO_PATH, downsample= DEFAULT_DOWNSAMPLE, stackSize= DEFAULT_STACK_SIZE):
+        """Static method that creates a pipeline for the screens the environment returns with the crop declared in a scenario.json file
+
+        Parameters
+        ----------
+        path
+            Path to the scenario.json file, the full screen is expected if it declares no crop
+
+        downsample
+            Only every downsample-th row and column of the screen are kept
+
+        stackSize
+            The number of latest frames stacked into each observation
+
+        Returns
+        -------
+        pipeline
+            The new ObservationPipeline
+        """
+        with open(path) as file:
+            crop = json.load(file).get('crop')
+        screenSize = (crop[3], crop[2]) if crop is not None else ObservationPipeline.FULL_SCREEN_SIZE
+        return ObservationPipeline(screenSize= screenSize, downsample= downsample, stackSize= stackSize)
+
+    ### End of static methods
+
+    def __init__(self, screenSize= SCREEN_SIZE, downsample= DEFAULT_DOWNSAMPLE, stackSize= DEFAULT_STACK_SIZE):
+        """Initializes the pipeline
+
+        Parameters
+        ----------
+        screenSize
+            The (height, width) of the screens the environment returns, after any crop of the scenario
+
+        downsample
+            Only every downsample-th row and column of the screen are kept
+
+        stackSize
+            The number of latest frames stacked into each observation
+
+        Returns
+        -------
+        None
+        """
+        self.screenSize = tuple(screenSize)
+        self.downsample = downsample
+        self.stackSize = stackSize
+        self.frameShape = self.getFrameShape()
+        self.reset()
+
+    def getFrameShape(self):
+        """Returns the (height, width) of the frames the pipeline produces"""
+        height, width = self.screenSize
+        return (-(-height // self.downsample), -(-width // self.downsample))
+
+    def reset(self):
+        """Forgets the stacked frames, to be called at the start of every fight"""
+        self.frames = deque(maxlen= self.stackSize)
+
+    def preprocess(self, obs):
+        """Converts a screen from the environment into a subsampled grayscale uint8 frame
+
+        Parameters
+        ----------
+        obs
+            The RGB screen from the environment as a height x width x 3 uint8 array, already cropped by the scenario
+
+        Returns
+        -------
+        frame
+            A 2D uint8 array of the shape getFrameShape returns
+        """
+        frame = (numpy.dot(obs[::self.downsample, ::self.downsample], ObservationPipeline.GRAYSCALE_WEIGHTS) >> 8).astype(numpy.uint8)     # Subsampling first means the grayscale conversion only touches the pixels that are kept
+        if frame.shape != self.frameShape:                                                         # The network's input layer is sized from getFrameShape, so a mismatch would only surface there
+            raise ValueError("Expected {0} screens producing {1} frames, got a {2} screen producing {3} frames".format(self.screenSize, self.frameShape, obs.shape[:2], frame.shape))
+        return frame
+
+    def observe(self, obs):
+        """Preprocesses a new screen and returns it stacked with the frames before it
+
+        Parameters
+        ----------
+        obs
+            The RGB screen from the emulator
+
+        Returns
+        -------
+        observation
+            A LazyFrames stack of the latest stackSize frames, at the start of a fight the first frame is repeated to fill the stack
+        """
+        frame = self.preprocess(obs)
+        if len(self.frames) == 0:
+            self.frames.extend([frame] * self.stackSize)
+        else:
+            self.frames.append(frame)
+        return LazyFrames(tuple(self.frames))
+
+
+"""Compares the memory a transition takes with raw screens against preprocessed and lazily stacked frames"""
+if __name__ == "__main__":
+    pipeline = ObservationPipeline.fromScenario()
+    screen = numpy.random.randint(0, 256, size= pipeline.screenSize + (3,), dtype= numpy.uint8)
+    rawBytes = 2 * screen.nbytes                                                                   # recordStep stores both the observation and the next observation
+    frameBytes = pipeline.preprocess(screen).nbytes                                                # Stacks share frames so each transition adds one new frame
+    print('raw screens per transition:         {0:8d} bytes'.format(rawBytes))
+    print('preprocessed frames per transition: {0:8d} bytes'.format(frameBytes))
+    print('reduction: {0:.1f}x'.format(rawBytes / frameBytes))
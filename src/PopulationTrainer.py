@@ -0,0 +1,287 @@
+import argparse, math, random, time, numpy
+from MetricsStore import MetricsStore
+from RolloutPool import RolloutPool
+
+class PopulationTrainer():
+    """Trains a population of DeepQAgents with different hyperparameters side by side using population based training.
+       Every generation each member plays a few training fights on a shared RolloutPool, with its network copied into a NumpyPolicy
+       so the workers never import TensorFlow, and then trains on what it recorded. Every few generations the members are evaluated
+       with exploration turned off, the worst members are replaced by copies of the best ones and the copied hyperparameters are perturbed,
+       so the training time moves to the configurations that are working instead of being split evenly over all of them.
+
+       The layer widths are only sampled when the population is created, a trained network cannot be resized,
+       they spread through the population when a member copies the network of a better one.
+    """
+
+    ### Static Variables
+
+    DEFAULT_POPULATION_SIZE = 4                                                                    # Number of agents trained side by side
+    DEFAULT_FIGHTS_PER_MEMBER = 2                                                                  # Number of training fights each member plays per generation
+    DEFAULT_EVALUATION_INTERVAL = 5                                                                # Number of generations between evaluations of the population
+    EVALUATION_FIGHTS = 4                                                                          # Number of fights each member plays without exploration when it is evaluated
+    TRUNCATION_FRACTION = 0.25                                                                     # Fraction of the population replaced by copies of the best members after each evaluation
+    PERTURB_FACTORS = [0.8, 1.25]                                                                  # Factors a copied hyperparameter is multiplied by, one is picked at random
+    DAMAGE_WEIGHT = 0.1                                                                            # Weight of the damage margin next to the win rate in a member's fitness
+
+    # Ranges the continuous hyperparameters are sampled from and kept within, the discount rate and the epsilon decay
+    # are sampled and perturbed through their horizons 1 - value since that is the scale they act on
+    LEARNING_RATE_RANGE = (1e-5, 1e-3)
+    DISCOUNT_RATE_RANGE = (0.9, 0.995)
+    EPSILON_DECAY_RANGE = (0.99, 0.9995)
+    HIDDEN_LAYER_CHOICES = [[48, 96, 192, 96, 48], [64, 128, 64], [128, 128], [256, 256, 128]]
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def sampleLogUniform(low, high):
+        """Static method that samples a value whose logarithm is uniform between the logarithms of low and high"""
+        return math.exp(random.uniform(math.log(low), math.log(high)))
+
+    def sampleHyperparameters():
+        """Static method that samples a random starting configuration for a member
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        hyperparameters
+            A dictionary of DeepQAgent constructor arguments
+        """
+        discountLow, discountHigh = PopulationTrainer.DISCOUNT_RATE_RANGE
+        decayLow, decayHigh = PopulationTrainer.EPSILON_DECAY_RANGE
+        return {'learningRate' : PopulationTrainer.sampleLogUniform(*PopulationTrainer.LEARNING_RATE_RANGE),
+                'discountRate' : 1 - PopulationTrainer.sampleLogUniform(1 - discountHigh, 1 - discountLow),
+                'epsilonDecay' : 1 - PopulationTrainer.sampleLogUniform(1 - decayHigh, 1 - decayLow),
+                'hiddenLayerSizes' : list(random.choice(PopulationTrainer.HIDDEN_LAYER_CHOICES))}
+
+    def perturbHyperparameters(hyperparameters):
+        """Static method that returns a copy of the hyperparameters with each continuous value scaled by a random perturb factor
+
+        Parameters
+        ----------
+        hyperparameters
+            A dictionary as returned by sampleHyperparameters
+
+        Returns
+        -------
+        hyperparameters
+            The perturbed copy, kept within the sampling ranges
+        """
+        def perturb(value, low, high):
+            return min(max(value * random.choice(PopulationTrainer.PERTURB_FACTORS), low), high)
+
+        discountLow, discountHigh = PopulationTrainer.DISCOUNT_RATE_RANGE
+        decayLow, decayHigh = PopulationTrainer.EPSILON_DECAY_RANGE
+        return {'learningRate' : perturb(hyperparameters['learningRate'], *PopulationTrainer.LEARNING_RATE_RANGE),
+                'discountRate' : 1 - perturb(1 - hyperparameters['discountRate'], 1 - discountHigh, 1 - discountLow),
+                'epsilonDecay' : 1 - perturb(1 - hyperparameters['epsilonDecay'], 1 - decayHigh, 1 - decayLow),
+                'hiddenLayerSizes' : list(hyperparameters['hiddenLayerSizes'])}
+
+    def computeFitness(summaries):
+        """Static method that scores a member from its evaluation fights
+
+        Parameters
+        ----------
+        summaries
+            The fight summaries from Lobby.play
+
+        Returns
+        -------
+        fitness
+            The win rate plus DAMAGE_WEIGHT times the mean damage margin, which lies between -1 and 1,
+            so the damage margin separates members that win equally often
+        """
+        winRate = sum(summary['won'] for summary in summaries) / len(summaries)
+        margins = [(summary['damageDealt'] - summary['damageTaken']) / max(summary['damageDealt'] + summary['damageTaken'], 1) for summary in summaries]
+        return winRate + PopulationTrainer.DAMAGE_WEIGHT * sum(margins) / len(margins)
+
+    ### End of static methods
+
+    def __init__(self, name= 'Population', size= DEFAULT_POPULATION_SIZE, fightsPerMember= DEFAULT_FIGHTS_PER_MEMBER,
+                 evaluationInterval= DEFAULT_EVALUATION_INTERVAL, states= None, processes= None):
+        """Initializes the population with randomly sampled hyperparameters
+
+        Parameters
+        ----------
+        name
+            The prefix of the member names, member i saves its model and logs as {name}{i}
+
+        size
+            The number of agents in the population
+
+        fightsPerMember
+            The number of training fights each member plays per generation
+
+        evaluationInterval
+            The number of generations between evaluations, each evaluation is followed by an exploit and explore step
+
+        states
+            A list of the save states to play, defaults to every save state returned by Lobby.getStates
+
+        processes
+            The number of worker processes to play fights in, defaults to the number of cores on the machine
+
+        Returns
+        -------
+        None
+        """
+        if states is None:
+            from Lobby import Lobby
+            states = Lobby.getStates()
+        self.name = name
+        self.fightsPerMember = fightsPerMember
+        self.evaluationInterval = evaluationInterval
+        self.states = states
+        self.pool = RolloutPool(processes= processes)
+        self.members = [self.createMember(index, PopulationTrainer.sampleHyperparameters()) for index in range(size)]
+        self.generation = 0
+
+    def createMember(self, index, hyperparameters, epsilon= 1):
+        """Builds the member at the given index of the population
+
+        Parameters
+        ----------
+        index
+            The position of the member in the population
+
+        hyperparameters
+            A dictionary of DeepQAgent constructor arguments
+
+        epsilon
+            The exploration rate the member starts with
+
+        Returns
+        -------
+        member
+            A dictionary holding the member's DeepQAgent, its hyperparameters, its last fitness and its MetricsStore
+        """
+        from DeepQAgent import DeepQAgent
+        name = self.name + str(index)
+        return {'agent' : DeepQAgent(name= name, epsilon= epsilon, **hyperparameters),
+                'hyperparameters' : hyperparameters,
+                'fitness' : None,
+                'metrics' : MetricsStore(name)}
+
+    def getPolicyWeights(self, member):
+        """Returns the NumPy copy of a member's network as the arrays sent to the workers"""
+        from NumpyPolicy import NumpyPolicy
+        return NumpyPolicy.fromModel(member['agent'].model).toArrays()
+
+    def playFights(self, fightsPerMember, explore):
+        """Plays fights for every member across the pool
+
+        Parameters
+        ----------
+        fightsPerMember
+            The number of fights each member plays
+
+        explore
+            A boolean flag for whether the members explore at their current epsilon or play greedily
+
+        Returns
+        -------
+        results
+            A list with one list of (summary, transitions) pairs per member
+        """
+        # Every member plays the same opponents so their results differ by how they play rather than by who they drew
+        states = [random.choice(self.states) for _ in range(fightsPerMember)]
+        tasks = []
+        for index, member in enumerate(self.members):
+            weights = self.getPolicyWeights(member)
+            epsilon = member['agent'].epsilon if explore else 0
+            tasks += [{'member' : index, 'weights' : weights, 'epsilon' : epsilon, 'state' : state} for state in states]
+        results = self.pool.collect(tasks)
+        return [[result for result in results if result[0]['member'] == index] for index in range(len(self.members))]
+
+    def trainMembers(self, results):
+        """Trains every member on the transitions it recorded this generation and logs its progress, members without any fights are skipped
+
+        Parameters
+        ----------
+        results
+            The output of playFights
+
+        Returns
+        -------
+        None
+        """
+        for member, memberResults in zip(self.members, results):
+            if len(memberResults) == 0: continue
+            agent = member['agent']
+            transitions = [fightTransitions for _, fightTransitions in memberResults]
+            data = {key : numpy.concatenate([fight[key] for fight in transitions]) for key in transitions[0]}
+            agent.model = agent.trainNetwork(agent.addNStepReturns(data), agent.model)
+            agent.saveModel()
+            summaries = [summary for summary, _ in memberResults]
+            member['metrics'].record('populationTraining', generation= self.generation, transitions= len(data['actions']),
+                                     wins= sum(summary['won'] for summary in summaries), fights= len(summaries),
+                                     loss= agent.lossHistory.getMean(), epsilon= agent.epsilon, **member['hyperparameters'])
+
+    def evaluate(self):
+        """Plays every member without exploration and records their fitness"""
+        for member, memberResults in zip(self.members, self.playFights(PopulationTrainer.EVALUATION_FIGHTS, explore= False)):
+            member['fitness'] = PopulationTrainer.computeFitness([summary for summary, _ in memberResults])
+            member['metrics'].record('populationEvaluation', generation= self.generation, fitness= member['fitness'], **member['hyperparameters'])
+
+    def exploitAndExplore(self):
+        """Replaces the worst members with copies of the best ones, carrying over their weights and exploration rate and perturbing their hyperparameters"""
+        ranking = sorted(range(len(self.members)), key= lambda index: self.members[index]['fitness'], reverse= True)
+        replaced = max(1, int(len(self.members) * PopulationTrainer.TRUNCATION_FRACTION))
+        if replaced * 2 > len(self.members): return                                                # Too few members to split into a top and a bottom
+        for loser in ranking[-replaced:]:
+            winner = self.members[random.choice(ranking[:replaced])]
+            hyperparameters = PopulationTrainer.perturbHyperparameters(winner['hyperparameters'])
+            member = self.createMember(loser, hyperparameters, epsilon= winner['agent'].epsilon)
+            member['agent'].model.set_weights(winner['agent'].model.get_weights())
+            member['metrics'].record('populationExploit', generation= self.generation, source= winner['agent'].name,
+                                     replacedFitness= self.members[loser]['fitness'], sourceFitness= winner['fitness'], **hyperparameters)
+            self.members[loser] = member
+
+    def run(self, generations):
+        """Trains the population for the given number of generations
+
+        Parameters
+        ----------
+        generations
+            The number of generations to train for, each member plays fightsPerMember fights and trains once per generation
+
+        Returns
+        -------
+        members
+            The members of the final population, best first by their last fitness
+        """
+        for _ in range(generations):
+            startTime = time.time()
+            self.trainMembers(self.playFights(self.fightsPerMember, explore= True))
+            self.generation += 1
+            if self.generation % self.evaluationInterval == 0:
+                self.evaluate()
+                self.exploitAndExplore()
+            print('Generation', self.generation, 'finished in {0:.1f} seconds'.format(time.time() - startTime))
+        if self.members[0]['fitness'] is None: self.evaluate()
+        return sorted(self.members, key= lambda member: member['fitness'], reverse= True)
+
+    def close(self):
+        """Stops the worker processes of the pool the fights are played on"""
+        self.pool.close()
+
+
+"""Trains a population of DeepQAgents with population based training and prints the final ranking"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes population training parameters.')
+    parser.add_argument('-n', '--name', type= str, default= 'Population', help= 'Prefix of the member names used when saving their models and logs')
+    parser.add_argument('-k', '--size', type= int, default= PopulationTrainer.DEFAULT_POPULATION_SIZE, help= 'Number of agents in the population')
+    parser.add_argument('-g', '--generations', type= int, default= 20, help= 'Number of generations to train for')
+    parser.add_argument('-f', '--fights', type= int, default= PopulationTrainer.DEFAULT_FIGHTS_PER_MEMBER, help= 'Number of training fights per member per generation')
+    parser.add_argument('-i', '--interval', type= int, default= PopulationTrainer.DEFAULT_EVALUATION_INTERVAL, help= 'Number of generations between evaluations')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of worker processes, defaults to the number of cores')
+    args = parser.parse_args()
+    trainer = PopulationTrainer(name= args.name, size= args.size, fightsPerMember= args.fights, evaluationInterval= args.interval, processes= args.processes)
+    try:
+        for member in trainer.run(args.generations):
+            print(member['agent'].name, '{0:.3f}'.format(member['fitness']), member['hyperparameters'])
+    finally:
+        trainer.close()
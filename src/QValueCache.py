@@ -0,0 +1,79 @@
+from collections import OrderedDict
+import numpy
+
+class QValueCache():
+    """A bounded least recently used cache of predicted Q values keyed on the network's feature vector.
+       Many decisions are made in states with identical features, both fighters standing at the start of a round or
+       getting up after a knockdown, so looking their Q values up skips the forward pass. Features can optionally be
+       quantized before they are used as a key so near identical states share an entry.
+
+       The cached values are only valid for the weights they were computed with, the owner must call clear whenever they change.
+    """
+
+    DEFAULT_MAX_SIZE = 4096                                                                        # Number of feature vectors kept before the least recently used is dropped
+
+    def __init__(self, maxSize= DEFAULT_MAX_SIZE, quantization= None):
+        """Initializes an empty cache
+
+        Parameters
+        ----------
+        maxSize
+            The maximum number of entries
+
+        quantization
+            The step features are rounded to before being used as a key, None keys on the exact features
+
+        Returns
+        -------
+        None
+        """
+        self.maxSize = maxSize
+        self.quantization = quantization
+        self.entries = OrderedDict()
+        self.resetCounters()
+
+    def resetCounters(self):
+        """Zeroes the hit and miss counters and their accumulated latencies"""
+        self.hits, self.misses = 0, 0
+        self.hitSeconds, self.missSeconds = 0.0, 0.0
+
+    def makeKey(self, features):
+        """Returns the hashable key of a single feature vector"""
+        features = numpy.asarray(features)
+        if self.quantization is not None: features = numpy.round(features / self.quantization).astype(numpy.int64)
+        return features.tobytes()
+
+    def get(self, key):
+        """Returns the cached Q values of a key, marking it as recently used, or None if it is not cached"""
+        qValues = self.entries.get(key)
+        if qValues is not None: self.entries.move_to_end(key)
+        return qValues
+
+    def put(self, key, qValues):
+        """Caches the Q values of a key, dropping the least recently used entry if the cache is full"""
+        self.entries[key] = qValues
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxSize: self.entries.popitem(last= False)
+
+    def recordLookup(self, hit, seconds):
+        """Counts a lookup made by the owner along with how long the whole prediction took"""
+        if hit:
+            self.hits += 1
+            self.hitSeconds += seconds
+        else:
+            self.misses += 1
+            self.missSeconds += seconds
+
+    def clear(self):
+        """Drops every entry, to be called whenever the weights the values were computed with change"""
+        self.entries.clear()
+
+    def getStats(self):
+        """Returns the number of entries, hits and misses, the hit rate and the mean latency of a hit and a miss in seconds"""
+        lookups = self.hits + self.misses
+        return {'entries' : len(self.entries),
+                'hits' : self.hits,
+                'misses' : self.misses,
+                'hitRate' : self.hits / lookups if lookups > 0 else 0.0,
+                'hitLatency' : self.hitSeconds / self.hits if self.hits > 0 else 0.0,
+                'missLatency' : self.missSeconds / self.misses if self.misses > 0 else 0.0}
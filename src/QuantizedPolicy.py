@@ -0,0 +1,132 @@
+import numpy
+from NumpyPolicy import NumpyPolicy
+
+class QuantizedPolicy(NumpyPolicy):
+    """A NumpyPolicy whose weights are saved at a lower precision to shrink the file every rollout worker loads.
+       float16 halves the size of the kernels. int8 quarters it, each kernel column is scaled so its largest weight maps to 127,
+       which keeps the error of every output proportional to its own weights. Biases stay float32 as they are a tiny part of the network.
+
+       NumPy has no fast float16 or int8 matrix products, so the kernels are dequantized to float32 once when the policy is built
+       and decisions run the plain NumpyPolicy forward pass at the same speed. Only the dequantized kernels are kept, the quantized
+       ones are rebuilt from them exactly when the policy is saved, so a worker holds as much weight memory as with a NumpyPolicy.
+       Only the saved file and the arrays sent between processes shrink.
+    """
+
+    ### Static Variables
+
+    PRECISIONS = ['float16', 'int8']
+    INT8_LIMIT = 127                                                                               # Largest magnitude of a symmetric int8 weight
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def fromPolicy(policy, precision):
+        """Static method that quantizes the weights of a float32 NumpyPolicy
+
+        Parameters
+        ----------
+        policy
+            The NumpyPolicy to quantize
+
+        precision
+            Either 'float16' or 'int8'
+
+        Returns
+        -------
+        policy
+            The QuantizedPolicy
+        """
+        if precision not in QuantizedPolicy.PRECISIONS: raise ValueError("Unsupported precision " + precision)
+        kernels, scales = [], []
+        for kernel in policy.kernels:
+            if precision == 'float16':
+                kernels.append(kernel.astype(numpy.float16))
+                scales.append(None)
+            else:
+                scale = numpy.abs(kernel).max(axis= 0) / QuantizedPolicy.INT8_LIMIT
+                scale[scale == 0] = 1                                                              # Columns of zeros stay zeros
+                kernels.append(numpy.round(kernel / scale).astype(numpy.int8))
+                scales.append(scale.astype(numpy.float32))
+        return QuantizedPolicy(kernels, scales, [bias.astype(numpy.float32) for bias in policy.biases], list(policy.activations), precision)
+
+    def load(path):
+        """Static method that loads a policy previously written with save
+
+        Parameters
+        ----------
+        path
+            Path to the .npz file the policy was saved to
+
+        Returns
+        -------
+        policy
+            The loaded QuantizedPolicy
+        """
+        with numpy.load(path, allow_pickle= False) as archive:
+            activations = [str(activation) for activation in archive['activations']]
+            precision = str(archive['precision'])
+            layers = range(len(activations))
+            kernels = [archive['kernel{0}'.format(index)] for index in layers]
+            scales = [archive['scale{0}'.format(index)] if 'scale{0}'.format(index) in archive.files else None for index in layers]
+            biases = [archive['bias{0}'.format(index)] for index in layers]
+        return QuantizedPolicy(kernels, scales, biases, activations, precision)
+
+    ### End of static methods
+
+    def __init__(self, kernels, scales, biases, activations, precision):
+        """Initializes the policy from quantized layer weights, dequantizing the kernels the forward pass runs on
+
+        Parameters
+        ----------
+        kernels
+            A list of 2D weight matrices stored at the given precision, one for each layer
+
+        scales
+            A list with the float32 scale of every kernel column for int8 kernels and None for float16 kernels
+
+        biases
+            A list of float32 bias vectors, one for each layer
+
+        activations
+            A list of activation function names, one for each layer
+
+        precision
+            Either 'float16' or 'int8'
+
+        Returns
+        -------
+        None
+        """
+        dequantized = [kernel.astype(numpy.float32) * (scale if scale is not None else 1) for kernel, scale in zip(kernels, scales)]
+        super(QuantizedPolicy, self).__init__(dequantized, biases, activations)
+        self.scales = scales
+        self.precision = precision
+
+    def getQuantizedKernels(self):
+        """Returns the kernels at the policy's precision, the values the float32 kernels were dequantized from"""
+        if self.precision == 'float16': return [kernel.astype(numpy.float16) for kernel in self.kernels]
+        return [numpy.round(kernel / scale).astype(numpy.int8) for kernel, scale in zip(self.kernels, self.scales)]
+
+    def save(self, path):
+        """Writes the quantized weights to a .npz file that can be read back without TensorFlow
+
+        Parameters
+        ----------
+        path
+            Path of the file to write
+
+        Returns
+        -------
+        None
+        """
+        numpy.savez_compressed(path, **self.toArrays())
+
+    def toArrays(self):
+        """Returns the quantized policy as a dictionary of named NumPy arrays, the form it is saved in"""
+        arrays = {'activations' : numpy.array(self.activations), 'precision' : numpy.array(self.precision)}
+        for index, (kernel, scale, bias) in enumerate(zip(self.getQuantizedKernels(), self.scales, self.biases)):
+            arrays['kernel{0}'.format(index)] = kernel
+            arrays['bias{0}'.format(index)] = bias
+            if scale is not None: arrays['scale{0}'.format(index)] = scale
+        return arrays
@@ -0,0 +1,176 @@
+import time, numpy
+
+class ReplayRatioController():
+    """Keeps the learner of a RolloutLearner at a target ratio of gradient updates to environment steps.
+       Incoming transitions go into a bounded replay of the latest transitions and every learner cycle trains on minibatches
+       sampled from it, as many as it takes to bring the updates run so far up to the target ratio of the steps collected so far.
+
+       The minibatch size is the knob that keeps both sides busy. The controller measures the rate the actors deliver steps at
+       and the seconds an update takes at each minibatch size, and picks the largest size whose updates the learner can keep
+       up with at the target ratio. A learner that would otherwise wait for data spends the spare time on larger minibatches,
+       while a learner falling behind, which would make the actors wait for their batches to be taken, moves to smaller ones.
+    """
+
+    ### Static Variables
+
+    DEFAULT_TARGET_RATIO = 1 / 32                                                                  # One update per 32 steps, the single pass over each fight reviewFight makes
+    DEFAULT_REPLAY_SIZE = 100000                                                                   # Number of latest transitions minibatches are sampled from
+    DEFAULT_BATCH_SIZE = 32
+    MIN_BATCH_SIZE = 16
+    MAX_BATCH_SIZE = 512
+    MAX_UPDATES_PER_CYCLE = 64                                                                     # Updates trained between checks for new batches, so the actors are never held up long
+    TARGET_LEARNER_UTILIZATION = 0.9                                                               # Share of the learner's time the chosen minibatch size should fill
+    SMOOTHING = 0.2                                                                                # Weight of the newest measurement in the running averages
+
+    ### End of static variables
+
+    def __init__(self, targetRatio= DEFAULT_TARGET_RATIO, replaySize= DEFAULT_REPLAY_SIZE, batchSize= DEFAULT_BATCH_SIZE,
+                 minBatchSize= MIN_BATCH_SIZE, maxBatchSize= MAX_BATCH_SIZE):
+        """Initializes the controller with an empty replay
+
+        Parameters
+        ----------
+        targetRatio
+            The number of gradient updates to run per environment step collected
+
+        replaySize
+            The number of latest transitions kept to sample minibatches from
+
+        batchSize
+            The minibatch size to start with
+
+        minBatchSize, maxBatchSize
+            The bounds of the minibatch size, the sizes tried are the powers of two between them
+
+        Returns
+        -------
+        None
+        """
+        self.targetRatio = targetRatio
+        self.replaySize = replaySize
+        self.batchSizes = [2 ** power for power in range(int(numpy.log2(minBatchSize)), int(numpy.log2(maxBatchSize)) + 1)]
+        self.batchSize = min(self.batchSizes, key= lambda size: abs(size - batchSize))
+        self.replay = None                                                                         # Allocated from the shapes of the first transitions
+        self.replayCount, self.replayIndex = 0, 0
+        self.environmentSteps, self.updates = 0, 0
+        self.secondsPerUpdate = {}                                                                 # Running average of the seconds an update takes at each minibatch size
+        self.startTime = time.time()
+        self.trainSeconds, self.idleSeconds, self.actorWaitSeconds = 0.0, 0.0, 0.0
+
+    def addTransitions(self, data):
+        """Adds transitions to the replay, overwriting the oldest once it is full
+
+        Parameters
+        ----------
+        data
+            A dictionary of arrays with the n-step returns added by DeepQAgent.addNStepReturns
+
+        Returns
+        -------
+        None
+        """
+        # The state each return bootstraps from is stored with it, so sampled transitions no longer depend on their neighbours
+        rows = {'states' : data['states'], 'actions' : data['actions'], 'returns' : data['returns'],
+                'bootstrapDiscounts' : data['bootstrapDiscounts'], 'nextStates' : data['nextStates'][data['bootstrapIndices']]}
+        if self.replay is None:
+            self.replay = {key : numpy.zeros((self.replaySize,) + values.shape[1:], dtype= values.dtype) for key, values in rows.items()}
+        count = len(rows['actions'])
+        indices = (self.replayIndex + numpy.arange(count)) % self.replaySize
+        for key, values in rows.items():
+            self.replay[key][indices] = values
+        self.replayIndex = (self.replayIndex + count) % self.replaySize
+        self.replayCount = min(self.replayCount + count, self.replaySize)
+        self.environmentSteps += count
+
+    def getUpdatesDue(self):
+        """Returns the number of updates needed to bring the learner up to the target ratio"""
+        return int(self.targetRatio * self.environmentSteps) - self.updates
+
+    def sample(self):
+        """Samples the minibatches of the next learner cycle from the replay
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        data
+            A dictionary of arrays in the form DeepQAgent.trainNetwork takes holding a whole number of minibatches of batchSize transitions,
+            or None if no update is due or the replay does not hold a full minibatch yet
+        """
+        updates = min(self.getUpdatesDue(), ReplayRatioController.MAX_UPDATES_PER_CYCLE)
+        if updates < 1 or self.replayCount < self.batchSize: return None
+        indices = numpy.random.randint(0, self.replayCount, size= updates * self.batchSize)
+        data = {key : values[indices] for key, values in self.replay.items()}
+        data['bootstrapIndices'] = numpy.arange(len(indices))
+        return data
+
+    def recordTraining(self, updates, seconds):
+        """Records a finished learner cycle and adapts the minibatch size to the measured throughput
+
+        Parameters
+        ----------
+        updates
+            The number of updates the cycle ran at the current minibatch size
+
+        seconds
+            The time the cycle took
+
+        Returns
+        -------
+        None
+        """
+        self.updates += updates
+        self.trainSeconds += seconds
+        previous = self.secondsPerUpdate.get(self.batchSize, seconds / updates)
+        self.secondsPerUpdate[self.batchSize] = (1 - ReplayRatioController.SMOOTHING) * previous + ReplayRatioController.SMOOTHING * seconds / updates
+        self.adaptBatchSize()
+
+    def recordIdle(self, seconds):
+        """Records time the learner spent waiting for transitions"""
+        self.idleSeconds += seconds
+
+    def recordActorWait(self, seconds):
+        """Records time an actor spent waiting for the learner to take its batch"""
+        self.actorWaitSeconds += seconds
+
+    def estimateSecondsPerUpdate(self, batchSize):
+        """Returns the measured seconds per update at a minibatch size, or an estimate scaled from the closest measured size"""
+        if batchSize in self.secondsPerUpdate: return self.secondsPerUpdate[batchSize]
+        measured = min(self.secondsPerUpdate, key= lambda size: abs(numpy.log2(size / batchSize)))
+        return self.secondsPerUpdate[measured] * batchSize / measured                              # Assumes the cost is all per transition, pessimistic for larger sizes
+
+    def adaptBatchSize(self):
+        """Picks the largest minibatch size whose updates the learner can run at the target ratio of the actors' current rate"""
+        stepsPerSecond = self.environmentSteps / max(time.time() - self.startTime, 1e-6)
+        affordable = [size for size in self.batchSizes
+                      if stepsPerSecond * self.targetRatio * self.estimateSecondsPerUpdate(size) <= ReplayRatioController.TARGET_LEARNER_UTILIZATION]
+        self.batchSize = max(affordable) if len(affordable) > 0 else self.batchSizes[0]
+
+    def getStats(self, actors= 1):
+        """Returns the achieved ratio and how busy each side has been
+
+        Parameters
+        ----------
+        actors
+            The number of actors delivering transitions, their waits are spread over them
+
+        Returns
+        -------
+        stats
+            A dictionary with the target and achieved ratio of updates to environment steps, the environment steps and updates so far,
+            their rates per second, the current minibatch size, the share of the time the learner spent training and waiting for data
+            and the share of the actors' time not spent waiting for the learner
+        """
+        elapsed = max(time.time() - self.startTime, 1e-6)
+        return {'targetRatio' : self.targetRatio,
+                'achievedRatio' : self.updates / max(self.environmentSteps, 1),
+                'environmentSteps' : self.environmentSteps,
+                'updates' : self.updates,
+                'stepsPerSecond' : self.environmentSteps / elapsed,
+                'updatesPerSecond' : self.updates / elapsed,
+                'batchSize' : self.batchSize,
+                'learnerUtilization' : self.trainSeconds / elapsed,
+                'learnerIdle' : self.idleSeconds / elapsed,
+                'actorUtilization' : max(0.0, 1 - self.actorWaitSeconds / (elapsed * max(actors, 1)))}
@@ -0,0 +1,247 @@
+import argparse, queue, subprocess, sys, threading, time, numpy
+import RolloutProtocol
+from MetricsStore import MetricsStore
+from NumpyPolicy import NumpyPolicy
+from ReplayRatioController import ReplayRatioController
+
+class RolloutLearner():
+    """Trains a DeepQAgent on transitions streamed in by RolloutWorkers and sends the updated weights back to them.
+       Workers connect over TCP or a Unix socket, see RolloutProtocol for the message format. Each connection is served
+       by its own thread which puts incoming batches on a bounded queue and only acknowledges a batch once it is queued,
+       so when training falls behind the workers wait instead of piling transitions up in memory.
+
+       With a ReplayRatioController the learner stops training on each group of batches once and instead samples minibatches
+       from a replay of the latest transitions, running as many updates as the controller's target ratio of updates to
+       environment steps calls for at the minibatch size it picked from the measured throughput of both sides.
+    """
+
+    ### Static Variables
+
+    DEFAULT_ADDRESS = '127.0.0.1:7370'                                                             # Default address the learner listens on
+    DEFAULT_QUEUE_SIZE = 8                                                                         # Number of batches held before workers are made to wait
+    DEFAULT_BATCHES_PER_UPDATE = 4                                                                 # Number of batches trained on together in each update
+    CHECKPOINT_FREQUENCY = 10                                                                      # Number of updates between checkpoints of the model
+
+    ### End of static variables
+
+    def __init__(self, agent, address= DEFAULT_ADDRESS, queueSize= DEFAULT_QUEUE_SIZE, batchesPerUpdate= DEFAULT_BATCHES_PER_UPDATE, controller= None):
+        """Initializes the learner
+
+        Parameters
+        ----------
+        agent
+            The DeepQAgent to train
+
+        address
+            The address to listen on, host:port for TCP or unix:/path for a Unix socket
+
+        queueSize
+            The number of batches that can wait to be trained on before workers are made to wait
+
+        batchesPerUpdate
+            The number of batches concatenated into the training data of each update, unused with a controller
+
+        controller
+            An optional ReplayRatioController that decides how many updates to run and at which minibatch size
+
+        Returns
+        -------
+        None
+        """
+        self.agent = agent
+        self.address = address
+        self.batches = queue.Queue(maxsize= queueSize)
+        self.batchesPerUpdate = batchesPerUpdate
+        self.controller = controller
+        self.activeWorkers = 0
+        self.workersLock = threading.Lock()
+        self.metrics = MetricsStore(agent.name)
+        self.weightsLock = threading.Lock()
+        self.version = 0
+        self.weights = None
+        self.listener = None
+        self.publishWeights()
+
+    def publishWeights(self):
+        """Takes a NumPy copy of the agent's current network for the workers and bumps the weights version"""
+        weights = NumpyPolicy.fromModel(self.agent.model).toArrays()
+        with self.weightsLock:
+            self.version += 1
+            self.weights = weights
+
+    def getWeights(self):
+        """Returns the current weights version, the header to send with them and the weight arrays"""
+        with self.weightsLock:
+            return self.version, {'version' : self.version, 'epsilon' : self.agent.epsilon}, self.weights
+
+    def start(self):
+        """Starts listening for workers in a background thread"""
+        self.listener = RolloutProtocol.listen(self.address)
+        threading.Thread(target= self.acceptWorkers, daemon= True).start()
+        print('Listening for rollout workers on', self.address)
+
+    def acceptWorkers(self):
+        """Accepts worker connections and serves each one on its own thread"""
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return                                                                             # The listener was closed
+            threading.Thread(target= self.serveWorker, args= (connection,), daemon= True).start()
+
+    def serveWorker(self, connection):
+        """Answers the messages of one worker until it disconnects
+
+        Parameters
+        ----------
+        connection
+            The connected socket of the worker
+
+        Returns
+        -------
+        None
+        """
+        with self.workersLock: self.activeWorkers += 1
+        try:
+            while True:
+                kind, header, arrays = RolloutProtocol.receiveMessage(connection)
+                version, weightsHeader, weights = self.getWeights()
+                if kind == 'hello':
+                    RolloutProtocol.sendMessage(connection, 'weights', weightsHeader, weights)
+                elif kind == 'transitions':
+                    waitTime = time.time()
+                    self.batches.put((header, arrays))                                             # Blocks while the queue is full, holding back the worker's ack
+                    if self.controller is not None: self.controller.recordActorWait(time.time() - waitTime)
+                    version, weightsHeader, weights = self.getWeights()
+                    if header['version'] < version: RolloutProtocol.sendMessage(connection, 'ack', weightsHeader, weights)
+                    else: RolloutProtocol.sendMessage(connection, 'ack')
+                else:
+                    raise ValueError("Unknown message kind " + kind)
+        except (OSError, ValueError) as error:
+            print('Worker disconnected:', error)
+        finally:
+            with self.workersLock: self.activeWorkers -= 1
+            connection.close()
+
+    def run(self, updates= None):
+        """Trains on the incoming batches until the given number of updates has been run
+
+        Parameters
+        ----------
+        updates
+            The number of updates to run, runs until the process is stopped if None
+
+        Returns
+        -------
+        None
+        """
+        if self.controller is not None: return self.runControlled(updates)
+        update = 0
+        while updates is None or update < updates:
+            received = [self.batches.get() for _ in range(self.batchesPerUpdate)]
+            data = {key : numpy.concatenate([arrays[key] for _, arrays in received]) for key in received[0][1]}
+            self.agent.model = self.agent.trainNetwork(self.agent.addNStepReturns(data), self.agent.model)
+            self.publishWeights()
+            update += 1
+
+            summaries = [summary for header, _ in received for summary in header['summaries']]
+            staleness = [self.version - 1 - header['version'] for header, _ in received]
+            self.metrics.record('rolloutUpdate', update= update, transitions= len(data['actions']), fights= len(summaries),
+                                wins= sum(summary['won'] for summary in summaries), maxStaleness= max(staleness),
+                                loss= self.agent.lossHistory.getMean(), epsilon= self.agent.epsilon)
+            if update % RolloutLearner.CHECKPOINT_FREQUENCY == 0: self.agent.saveModel()
+        self.agent.saveModel()
+
+    def runControlled(self, updates= None):
+        """Trains on minibatches sampled from the controller's replay, keeping the updates at its target ratio of the steps received
+
+        Parameters
+        ----------
+        updates
+            The number of learner cycles to run, runs until the process is stopped if None
+
+        Returns
+        -------
+        None
+        """
+        update, received = 0, []                                                                   # The batches added to the replay since the last update
+        while updates is None or update < updates:
+            # Every waiting batch goes into the replay without blocking
+            while True:
+                try:
+                    received.append(self.addBatch(self.batches.get_nowait()))
+                except queue.Empty:
+                    break
+
+            data = self.controller.sample()
+            if data is None:
+                # Caught up with the target ratio or still short of a full minibatch, so wait for the workers instead of spinning
+                idleTime = time.time()
+                batch = self.batches.get()
+                self.controller.recordIdle(time.time() - idleTime)
+                received.append(self.addBatch(batch))
+                continue
+            batchSize = self.controller.batchSize
+            self.agent.batchSize = batchSize
+            trainTime = time.time()
+            self.agent.model = self.agent.trainNetwork(data, self.agent.model, decayEpsilon= False)
+            self.controller.recordTraining(len(data['actions']) // batchSize, time.time() - trainTime)
+            self.publishWeights()
+            update += 1
+
+            summaries = [summary for header, _ in received for summary in header['summaries']]
+            with self.workersLock: activeWorkers = self.activeWorkers
+            self.metrics.record('replayRatio', update= update, fights= len(summaries), wins= sum(summary['won'] for summary in summaries),
+                                loss= self.agent.lossHistory.getMean(), epsilon= self.agent.epsilon, workers= activeWorkers,
+                                **self.controller.getStats(activeWorkers))
+            received = []
+            if update % RolloutLearner.CHECKPOINT_FREQUENCY == 0: self.agent.saveModel()
+        self.agent.saveModel()
+
+    def addBatch(self, batch):
+        """Adds a received batch to the controller's replay and decays epsilon once for it, so exploration falls with the data
+           collected rather than with the number of updates the ratio and minibatch size lead to
+
+        Parameters
+        ----------
+        batch
+            The (header, arrays) pair a worker sent
+
+        Returns
+        -------
+        batch
+            The same pair
+        """
+        self.controller.addTransitions(self.agent.addNStepReturns(dict(batch[1])))
+        self.agent.decayEpsilon()
+        return batch
+
+    def stop(self):
+        """Stops accepting new workers"""
+        if self.listener is not None: self.listener.close()
+        self.listener = None
+
+
+"""Trains an agent on transitions sent by rollout workers, optionally launching local workers for testing"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes rollout learner parameters.')
+    parser.add_argument('-a', '--address', type= str, default= RolloutLearner.DEFAULT_ADDRESS, help= 'Address to listen on, host:port or unix:/path')
+    parser.add_argument('-l', '--load', action= 'store_true', help= 'Boolean flag for if the user wants to load pre-existing weights')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the instance that will be used when saving the model or it\'s training logs')
+    parser.add_argument('-u', '--updates', type= int, default= None, help= 'Number of updates to train for, runs forever by default')
+    parser.add_argument('-b', '--batches', type= int, default= RolloutLearner.DEFAULT_BATCHES_PER_UPDATE, help= 'Number of worker batches trained on in each update')
+    parser.add_argument('-r', '--ratio', type= float, default= None, help= 'Target ratio of updates to environment steps, enables replay sampling at an adaptive minibatch size')
+    parser.add_argument('-w', '--workers', type= int, default= 0, help= 'Number of local worker processes to launch against this learner')
+    args = parser.parse_args()
+
+    from DeepQAgent import DeepQAgent
+    agent = DeepQAgent(load= args.load, name= args.name)
+    controller = ReplayRatioController(targetRatio= args.ratio, batchSize= agent.batchSize) if args.ratio is not None else None
+    learner = RolloutLearner(agent, address= args.address, batchesPerUpdate= args.batches, controller= controller)
+    learner.start()
+    workers = [subprocess.Popen([sys.executable, 'RolloutWorker.py', '-a', args.address, '-i', 'local' + str(i)]) for i in range(args.workers)]
+    try:
+        learner.run(updates= args.updates)
+    finally:
+        learner.stop()
+        for worker in workers: worker.terminate()
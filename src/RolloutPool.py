@@ -0,0 +1,220 @@
+import multiprocessing, os
+
+# Each worker process keeps one lobby and every agent it has loaded so checkpoints are only read again once they change on disk
+_workerLobby = None
+_workerAgents = {}
+_workerCheckpoints = {}
+
+def _initializeWorker():
+    """Limits every worker to a single math thread so that the pool scales with the number of processes instead of oversubscribing cores"""
+    for variable in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS']:
+        os.environ[variable] = '1'
+
+def _loadAgent(name, precision= None):
+    """Returns the evaluation copy of the named DeepQAgent checkpoint held by this worker, loading it on first use
+
+    Parameters
+    ----------
+    name
+        The name of the saved model as used by the DeepQAgent CLI
+
+    precision
+        None for the float32 weights of the saved model, or the precision of a policy exported with exportPolicy
+
+    Returns
+    -------
+    agent
+        A DeepQAgent with exploration disabled that infers through its NumPy policy, TensorFlow is never imported.
+        The policy is loaded again whenever the checkpoint file has been rewritten since it was last read
+    """
+    if (name, precision) not in _workerAgents:
+        from DeepQAgent import DeepQAgent
+        _workerAgents[(name, precision)] = DeepQAgent(epsilon= 0, name= name)
+    agent = _workerAgents[(name, precision)]
+    status = os.stat(_getCheckpointPath(agent, precision))
+    checkpoint = (status.st_mtime_ns, status.st_size)
+    if _workerCheckpoints.get((name, precision)) != checkpoint:
+        agent.loadPolicy(precision= precision)
+        _workerCheckpoints[(name, precision)] = checkpoint
+    return agent
+
+def _getCheckpointPath(agent, precision= None):
+    """Returns the path of the saved model, or of the policy exported at the given precision, an agent loads its policy from"""
+    return os.path.join(agent.modelsDir, agent.getModelName()) if precision is None else agent.getPolicyPath(precision)
+
+def _playFight(task):
+    """Plays a single fight inside a worker process
+
+    Parameters
+    ----------
+    task
+        A dictionary with the name of the agent to play as, the save state to play and optionally a startDelay for Lobby.play,
+        the precision of the exported policy to play with, a TerminationPolicy spec to cut the fight short with
+        and the directory of an EvaluationCache to store the fight in
+
+    Returns
+    -------
+    summary
+        The fight summary from Lobby.play with the task entries added, and whether it came from the cache if one is given
+    """
+    agent = _loadAgent(task['name'], task.get('precision'))
+    lobby = _getWorkerLobby(task.get('termination'))
+    lobby.clearLobby()
+    lobby.addPlayer(agent)
+    cache, summary = None, None
+    if task.get('cache') is not None:
+        from EvaluationCache import EvaluationCache
+        cache = EvaluationCache(task['cache'])
+        key = _getFightKey(cache, task)
+        fight = cache.get(key)                                                                     # Another worker may have played the same fight since the caller looked
+        if fight is not None: summary = fight['summary']
+    if summary is None:
+        summary = lobby.play(state= task['state'], startDelay= task.get('startDelay', 0))
+        if cache is not None: cache.put(key, summary, lobby.inputLog)
+    if cache is not None: summary['cached'] = fight is not None
+    agent.prepareForNextFight()                                                                    # Evaluation fights are not trained on
+    summary.update(task)
+    return summary
+
+def _getFightKey(cache, task):
+    """Returns the EvaluationCache key of a task's fight, built from the checkpoint file on disk and the same agent and lobby a worker plays it with"""
+    agent = _loadAgent(task['name'], task.get('precision'))
+    lobby = _getWorkerLobby(task.get('termination'))
+    return cache.makeKey(_getCheckpointPath(agent, task.get('precision')), agent.moveList, task['state'], task.get('startDelay', 0), lobby.getSettings())
+
+def _getWorkerLobby(termination= None):
+    """Returns the lobby of this worker process, creating it on first use, with the termination policies of the given spec"""
+    global _workerLobby
+    from Lobby import Lobby
+    from TerminationPolicy import TerminationPolicy
+    if _workerLobby is None: _workerLobby = Lobby(skipScreens= True)                                # Workers never render, screens are only captured for agents that look at them
+    _workerLobby.terminationPolicies = TerminationPolicy.fromSpec(termination)
+    return _workerLobby
+
+def _collectFight(task):
+    """Plays a single training fight inside a worker process with the policy weights sent in the task
+
+    Parameters
+    ----------
+    task
+        A dictionary with the 'weights' of a NumpyPolicy as returned by toArrays, the 'epsilon' to explore with,
+        the save 'state' to play, optionally a 'termination' spec for TerminationPolicy.fromSpec
+        and any other entries the caller wants back in the summary
+
+    Returns
+    -------
+    summary
+        The fight summary from Lobby.play with the task entries other than the weights added
+
+    transitions
+        The recorded fight as the dictionary of arrays returned by DeepQAgent.prepareTransitions
+    """
+    from DeepQAgent import DeepQAgent
+    from NumpyPolicy import NumpyPolicy
+    if None not in _workerAgents: _workerAgents[None] = DeepQAgent()                               # One unnamed agent plays for every population member
+    agent = _workerAgents[None]
+    agent.policy = NumpyPolicy.fromArrays(task['weights'])
+    agent.epsilon = task['epsilon']
+    lobby = _getWorkerLobby(task.get('termination'))
+    lobby.clearLobby()
+    lobby.addPlayer(agent)
+    summary = lobby.play(state= task['state'], startDelay= task.get('startDelay', 0))
+    transitions = agent.prepareTransitions(agent.memory)
+    agent.prepareForNextFight()
+    summary.update({key : value for key, value in task.items() if key != 'weights'})
+    return summary, transitions
+
+class RolloutPool():
+    """Plays fights for saved agents across a pool of worker processes.
+       Gym retro only allows one emulator per process, so each worker owns its own emulator and fights run fully in parallel.
+       The workers are started on first use and kept until close is called, so they only import the emulator once and
+       keep their lobby and loaded agents between calls. The pool can be used as a context manager to close it.
+    """
+
+    def __init__(self, processes= None):
+        """Initializes the pool settings
+
+        Parameters
+        ----------
+        processes
+            The number of worker processes to launch, defaults to the number of cores on the machine
+
+        Returns
+        -------
+        None
+        """
+        if processes is None: processes = os.cpu_count()
+        self.processes = processes
+        self.pool = None
+
+    def run(self, tasks, cache= None):
+        """Plays every task and returns the fight summaries
+
+        Parameters
+        ----------
+        tasks
+            A list of dictionaries each holding the 'name' of an agent, the 'state' it should play
+            and optionally the 'startDelay' to play it with
+
+        cache
+            An optional EvaluationCache, fights it holds are returned without playing them and the rest are stored in it.
+            Only pass one for agents that do not explore, which is how _loadAgent loads them
+
+        Returns
+        -------
+        summaries
+            A list of fight summaries in the same order as the tasks, with 'cached' added if a cache is used
+        """
+        if cache is None: return self.map(_playFight, tasks)
+        summaries, missed = [None] * len(tasks), []
+        for index, task in enumerate(tasks):
+            fight = cache.get(_getFightKey(cache, task))                                           # Loads the policy with NumPy only, the emulator is never started here
+            if fight is None: missed.append(index)
+            else: summaries[index] = dict(fight['summary'], cached= True, **task)
+        played = self.map(_playFight, [dict(tasks[index], cache= cache.cacheDir) for index in missed])
+        for index, summary in zip(missed, played):
+            summaries[index] = summary
+        return summaries
+
+    def collect(self, tasks):
+        """Plays training fights with policies sent from the calling process and returns what they recorded.
+           The caller keeps training its networks while the workers only ever run NumPy copies of them.
+
+        Parameters
+        ----------
+        tasks
+            A list of dictionaries each holding the policy 'weights' as returned by NumpyPolicy.toArrays,
+            the 'epsilon' to explore with, the 'state' to play and optionally the 'startDelay' to play it with
+
+        Returns
+        -------
+        results
+            A list of (summary, transitions) pairs in the same order as the tasks, where transitions is the
+            dictionary of arrays returned by DeepQAgent.prepareTransitions
+        """
+        return self.map(_collectFight, tasks)
+
+    def map(self, function, tasks):
+        """Runs a module level function over the tasks across the worker processes and returns the results in order"""
+        if len(tasks) == 0: return []
+        return self.start().map(function, tasks, chunksize= 1)
+
+    def start(self):
+        """Starts the worker processes if they are not running yet and returns the multiprocessing pool"""
+        if self.pool is None:
+            context = multiprocessing.get_context('spawn')                                        # Forking a process that already holds an emulator or TensorFlow is unsafe
+            self.pool = context.Pool(processes= self.processes, initializer= _initializeWorker)
+        return self.pool
+
+    def close(self):
+        """Stops the worker processes once they have finished their fights, the next call starts new ones"""
+        if self.pool is None: return
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
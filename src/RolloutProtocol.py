@@ -0,0 +1,128 @@
+"""
+    The message format spoken between rollout workers and the learner.
+    Every message is a JSON header followed by an optional payload of NumPy arrays:
+
+        4 byte big endian header length | JSON header | 8 byte big endian payload length | zlib compressed .npz payload
+
+    The header always holds the 'kind' of the message. Arrays travel as an .npz archive that is loaded with
+    allow_pickle off, so a peer can never make the other side unpickle arbitrary objects.
+
+    Messages sent by a worker:
+        hello         announces the worker, answered with weights
+        transitions   a batch of transitions from whole fights, answered with ack once the learner has room for it
+
+    Messages sent by the learner:
+        weights       the latest policy arrays along with their version and the exploration rate to play with
+        ack           the batch was queued, carries the latest weights when the worker's version is out of date
+"""
+
+import io, json, socket, struct, zlib, numpy
+
+COMPRESSION_LEVEL = 1                                                                              # Fast compression, the transitions are mostly small integers and compress well even at the lowest level
+
+def parseAddress(address):
+    """Parses an address of the form host:port for TCP or unix:/path for a Unix socket
+
+    Parameters
+    ----------
+    address
+        The address string
+
+    Returns
+    -------
+    family
+        The socket family of the address
+
+    socketAddress
+        The address in the form the socket functions expect
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host, int(port))
+
+def connect(address, timeout= None):
+    """Opens a connection to the learner at the given address"""
+    family, socketAddress = parseAddress(address)
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    connection.connect(socketAddress)
+    return connection
+
+def listen(address, backlog= 64):
+    """Opens a listening socket at the given address for workers to connect to"""
+    family, socketAddress = parseAddress(address)
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_INET: listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(socketAddress)
+    listener.listen(backlog)
+    return listener
+
+def sendMessage(connection, kind, header= None, arrays= None):
+    """Sends a message over a connected socket
+
+    Parameters
+    ----------
+    connection
+        The connected socket
+
+    kind
+        The kind of the message
+
+    header
+        An optional dictionary of JSON serializable values to send with the message
+
+    arrays
+        An optional dictionary of named NumPy arrays to send as the compressed payload
+
+    Returns
+    -------
+    None
+    """
+    header = dict(header or {}, kind= kind)
+    headerBytes = json.dumps(header).encode('utf-8')
+    payload = b''
+    if arrays:
+        buffer = io.BytesIO()
+        numpy.savez(buffer, **arrays)
+        payload = zlib.compress(buffer.getvalue(), COMPRESSION_LEVEL)
+    connection.sendall(struct.pack('>I', len(headerBytes)) + headerBytes + struct.pack('>Q', len(payload)) + payload)
+
+def receiveMessage(connection):
+    """Receives a message sent with sendMessage
+
+    Parameters
+    ----------
+    connection
+        The connected socket
+
+    Returns
+    -------
+    kind
+        The kind of the message
+
+    header
+        The dictionary of values sent with the message
+
+    arrays
+        The dictionary of named arrays sent with the message, empty when there was no payload
+    """
+    headerLength, = struct.unpack('>I', receiveExactly(connection, 4))
+    header = json.loads(receiveExactly(connection, headerLength).decode('utf-8'))
+    payloadLength, = struct.unpack('>Q', receiveExactly(connection, 8))
+    arrays = {}
+    if payloadLength > 0:
+        payload = zlib.decompress(receiveExactly(connection, payloadLength))
+        with numpy.load(io.BytesIO(payload), allow_pickle= False) as archive:
+            arrays = {name : archive[name] for name in archive.files}
+    return header.pop('kind'), header, arrays
+
+def receiveExactly(connection, length):
+    """Reads exactly length bytes from the socket, raising ConnectionError if the peer closes the connection first"""
+    chunks, remaining = [], length
+    while remaining > 0:
+        chunk = connection.recv(min(remaining, 1 << 20))
+        if not chunk: raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
@@ -0,0 +1,129 @@
+import argparse, itertools, time, numpy
+import RolloutProtocol
+from NumpyPolicy import NumpyPolicy
+
+class RolloutWorker():
+    """Plays fights with the latest policy from a central RolloutLearner and streams the recorded transitions back to it.
+       The worker infers through a NumpyPolicy so it never imports TensorFlow, and it can run on the learner's machine
+       or any other host that can reach the learner's address.
+
+       Each batch is sent and then held until the learner acknowledges it, and the learner only acknowledges once it has room,
+       so a worker can never run ahead of a busy learner. If the connection drops the worker reconnects with exponential
+       backoff and resends the batch it was holding, so a batch may occasionally be delivered twice but is never lost.
+    """
+
+    ### Static Variables
+
+    DEFAULT_FIGHTS_PER_BATCH = 1                                                                   # Number of fights recorded before their transitions are sent together
+    MIN_RECONNECT_DELAY = 0.5                                                                      # Seconds to wait before the first reconnection attempt
+    MAX_RECONNECT_DELAY = 30                                                                       # Upper bound on the wait between reconnection attempts
+
+    ### End of static variables
+
+    def __init__(self, address, states= None, fightsPerBatch= DEFAULT_FIGHTS_PER_BATCH, workerId= None):
+        """Initializes the worker
+
+        Parameters
+        ----------
+        address
+            The address of the learner, host:port for TCP or unix:/path for a Unix socket
+
+        states
+            A list of the save states to cycle through, defaults to every save state returned by Lobby.getStates
+
+        fightsPerBatch
+            The number of fights recorded before their transitions are sent to the learner as one batch
+
+        workerId
+            A name identifying the worker in the learner's logs
+
+        Returns
+        -------
+        None
+        """
+        from DeepQAgent import DeepQAgent
+        from Lobby import Lobby
+        if states is None: states = Lobby.getStates()
+        self.address = address
+        self.states = itertools.cycle(states)
+        self.fightsPerBatch = fightsPerBatch
+        self.workerId = workerId
+        self.lobby = Lobby(skipScreens= True)                                                      # The DeepQAgent only reads the RAM info
+        self.agent = DeepQAgent()
+        self.lobby.addPlayer(self.agent)
+        self.connection = None
+        self.version = -1                                                                          # Version of the weights the agent is playing with
+
+    def connect(self):
+        """Connects to the learner, retrying with exponential backoff until it succeeds, and fetches the latest weights"""
+        delay = RolloutWorker.MIN_RECONNECT_DELAY
+        while self.connection is None:
+            try:
+                self.connection = RolloutProtocol.connect(self.address)
+                RolloutProtocol.sendMessage(self.connection, 'hello', {'workerId' : self.workerId})
+                self.applyWeights(*RolloutProtocol.receiveMessage(self.connection)[1:])
+            except OSError:
+                self.disconnect()
+                time.sleep(delay)
+                delay = min(delay * 2, RolloutWorker.MAX_RECONNECT_DELAY)
+
+    def disconnect(self):
+        """Closes the connection to the learner if there is one"""
+        if self.connection is not None: self.connection.close()
+        self.connection = None
+
+    def applyWeights(self, header, arrays):
+        """Switches the agent to the weights and exploration rate sent by the learner, if the message carried any"""
+        if not arrays: return
+        self.agent.policy = NumpyPolicy.fromArrays(arrays)
+        self.agent.epsilon = header['epsilon']
+        self.version = header['version']
+
+    def collectBatch(self):
+        """Plays fightsPerBatch fights and returns their transitions concatenated into one dictionary of arrays along with the fight summaries"""
+        transitions, summaries = [], []
+        for _ in range(self.fightsPerBatch):
+            summaries.append(self.lobby.play(state= next(self.states)))
+            transitions.append(self.agent.prepareTransitions(self.agent.memory))
+            self.agent.prepareForNextFight()
+        batch = {key : numpy.concatenate([fight[key] for fight in transitions]) for key in transitions[0]}
+        return batch, summaries
+
+    def run(self, batches= None):
+        """Plays fights and sends their transitions to the learner until the given number of batches has been delivered
+
+        Parameters
+        ----------
+        batches
+            The number of batches to deliver, runs until the process is stopped if None
+
+        Returns
+        -------
+        None
+        """
+        for _ in itertools.count() if batches is None else range(batches):
+            self.connect()                                                                         # The weights to play with arrive on connection
+            pending = self.collectBatch()
+            while pending is not None:
+                self.connect()
+                try:
+                    batch, summaries = pending
+                    RolloutProtocol.sendMessage(self.connection, 'transitions', {'workerId' : self.workerId, 'version' : self.version, 'summaries' : summaries}, batch)
+                    kind, header, arrays = RolloutProtocol.receiveMessage(self.connection)                  # Blocks until the learner has room for the batch
+                    self.applyWeights(header, arrays)
+                    pending = None
+                except OSError:
+                    self.disconnect()
+        self.disconnect()
+
+
+"""Runs a rollout worker that plays for the learner at the given address"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes rollout worker parameters.')
+    parser.add_argument('-a', '--address', type= str, required= True, help= 'Address of the learner, host:port or unix:/path')
+    parser.add_argument('-f', '--fights', type= int, default= RolloutWorker.DEFAULT_FIGHTS_PER_BATCH, help= 'Number of fights sent to the learner in each batch')
+    parser.add_argument('-b', '--batches', type= int, default= None, help= 'Number of batches to deliver before exiting, runs forever by default')
+    parser.add_argument('-i', '--id', type= str, default= None, help= 'Name identifying the worker in the learner logs')
+    args = parser.parse_args()
+    worker = RolloutWorker(args.address, fightsPerBatch= args.fights, workerId= args.id)
+    worker.run(batches= args.batches)
@@ -0,0 +1,305 @@
+import argparse, json, multiprocessing, pickle, time, traceback, numpy
+from multiprocessing.shared_memory import SharedMemory
+
+# Commands are single bytes sent over each worker's pipe, a step is followed by the action and a reset by the optional save state name
+STEP_COMMAND, RESET_COMMAND, CLOSE_COMMAND = 1, 2, 3
+READY, ERROR = b'\x01', b'\x02'                                                                    # Replies, an error is followed by the worker's traceback
+
+def _runEnvironment(index, game, state, connection, infoNames):
+    """Runs one StreetFighter2Discretizer environment inside a worker process and answers the parent's commands until told to close.
+       The worker first sends the shape of its screens, which gym retro reports after the scenario crop, and then receives the names
+       of the shared memory blocks the parent allocated from it along with the number of environments sharing them, or None
+       to send each result back through the pipe instead.
+       Any error is sent back to the parent before the worker exits so the parent never waits on a worker that is gone
+
+    Parameters
+    ----------
+    index
+        The slot of this environment in the shared arrays
+
+    game
+        The name of the game to make the environment of
+
+    state
+        The name of the save state the environment starts in
+
+    connection
+        This worker's end of the command pipe
+
+    infoNames
+        The names of the RAM info entries in the order they are packed
+
+    Returns
+    -------
+    None
+    """
+    blocks, views = [], []                                                                         # The shared blocks and the NumPy views of them, views have to go before the blocks can be closed
+    try:
+        import retro
+        from Discretizer import StreetFighter2Discretizer
+        environment = StreetFighter2Discretizer(retro.make(game= game, state= state))
+        screenShape = tuple(environment.observation_space.shape)
+        connection.send(screenShape)
+        layout = connection.recv()
+        shared = layout is not None
+        if shared:
+            blockNames, count = layout
+            blocks = [SharedMemory(name= name) for name in blockNames]
+            views = list(SharedMemoryVecEnv.viewSlots(blocks, count, screenShape, len(infoNames)))
+
+        def publish(observation, reward, done, info):
+            if shared:
+                screens, rewardSlots, doneSlots, infoSlots = views
+                screens[index] = observation
+                rewardSlots[index], doneSlots[index] = reward, done
+                infoSlots[index] = [info[name] for name in infoNames]
+                connection.send_bytes(READY)
+            else:
+                connection.send((observation, reward, done, [info[name] for name in infoNames]))
+
+        while True:
+            message = connection.recv_bytes()
+            if message[0] == STEP_COMMAND:
+                publish(*environment.step(message[1]))
+            elif message[0] == RESET_COMMAND:
+                if len(message) > 1: environment.unwrapped.load_state(message[1:].decode('utf-8'))
+                environment.reset()
+                publish(*environment.step(0))                                                      # Like the Lobby the info of a fresh fight comes from its first idle frame
+            else:
+                environment.close()
+                connection.send_bytes(READY)
+                return
+    except Exception:
+        connection.send_bytes(ERROR + traceback.format_exc().encode('utf-8'))
+    finally:
+        views.clear()
+        for block in blocks: block.close()
+
+class SharedMemoryVecEnv():
+    """Steps a number of StreetFighter2Discretizer environments in worker processes, one emulator per process as gym retro requires.
+       Every worker writes its latest screen, reward, done flag and RAM info into its own slot of arrays preallocated in shared memory
+       and the parent reads them as NumPy views, so a screen crosses between processes without being pickled or copied through a pipe.
+       The pipes only carry a couple of bytes per command and a one byte reply once the slot has been written.
+       The info entries of data.json are packed into one integer row per environment, see getInfo for the dictionary the Lobby uses.
+       The screens are sized from the observation space the workers report when they start, gym retro crops them to the play area
+       declared in scenario.json. A worker that raises or dies makes the call waiting on it raise a RuntimeError instead of hanging.
+
+       The pipe transport sends every result back through the pipe instead, it is kept to compare the two.
+    """
+
+    ### Static Variables
+
+    DEFAULT_GAME = 'StreetFighterIISpecialChampionEdition-Genesis'
+    DEFAULT_DATA_PATH = '../StreetFighterIISpecialChampionEdition-Genesis/data.json'                # Declares the RAM info entries every step reports
+    TRANSPORTS = ['shared', 'pipe']
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def getSlotSizes(environments, screenShape, infoCount):
+        """Static method that returns the bytes of the shared screen, reward, done and info blocks of the given number of environments"""
+        return [environments * int(numpy.prod(screenShape)), environments * 4, environments, environments * infoCount * 8]
+
+    def viewSlots(blocks, environments, screenShape, infoCount):
+        """Static method that returns NumPy views of the shared blocks as the screens, rewards, done flags and packed infos of every environment"""
+        sizes = SharedMemoryVecEnv.getSlotSizes(environments, screenShape, infoCount)
+        return (numpy.frombuffer(blocks[0].buf, dtype= numpy.uint8, count= sizes[0]).reshape((environments,) + tuple(screenShape)),
+                numpy.frombuffer(blocks[1].buf, dtype= numpy.float32, count= environments),
+                numpy.frombuffer(blocks[2].buf, dtype= numpy.uint8, count= environments).view(bool),
+                numpy.frombuffer(blocks[3].buf, dtype= numpy.int64, count= environments * infoCount).reshape(environments, infoCount))
+
+    ### End of static methods
+
+    def __init__(self, environments, states= None, game= DEFAULT_GAME, transport= 'shared', dataPath= DEFAULT_DATA_PATH):
+        """Starts a worker process per environment and allocates the shared slots from the screen shape they report
+
+        Parameters
+        ----------
+        environments
+            The number of environments to run
+
+        states
+            A list of the save state each environment starts in, defaults to the first save state returned by Lobby.getStates for all of them
+
+        game
+            The name of the game to make the environments of
+
+        transport
+            'shared' to return the results through shared memory or 'pipe' to send them through the command pipes
+
+        dataPath
+            The data.json declaring the RAM info entries
+
+        Returns
+        -------
+        None
+        """
+        if states is None:
+            from Lobby import Lobby
+            states = [Lobby.getStates()[0]] * environments
+        with open(dataPath) as file:
+            self.infoNames = list(json.load(file)['info'])
+        self.transport = transport
+        self.blocks = []
+        context = multiprocessing.get_context('spawn')                                            # Forking a process that already holds an emulator is unsafe
+
+        self.connections, self.processes = [], []
+        for index, state in enumerate(states):
+            parentConnection, childConnection = context.Pipe()
+            process = context.Process(target= _runEnvironment, args= (index, game, state, childConnection, self.infoNames), daemon= True)
+            process.start()
+            childConnection.close()                                                                # Only the worker holds its end, so its exit shows up as the pipe closing
+            self.connections.append(parentConnection)
+            self.processes.append(process)
+
+        try:
+            screenShapes = [pickle.loads(self.receiveFrom(index)) for index in range(len(self.connections))]
+            if len(set(screenShapes)) > 1: raise ValueError("The environments report different screen shapes " + str(screenShapes))
+            self.screenShape = screenShapes[0]
+
+            count = len(self.connections)
+            if transport == 'shared':
+                self.blocks = [SharedMemory(create= True, size= max(size, 1)) for size in SharedMemoryVecEnv.getSlotSizes(count, self.screenShape, len(self.infoNames))]
+                self.observations, self.rewards, self.dones, self.infos = SharedMemoryVecEnv.viewSlots(self.blocks, count, self.screenShape, len(self.infoNames))
+                layout = ([block.name for block in self.blocks], count)
+            else:
+                self.observations = numpy.zeros((count,) + self.screenShape, dtype= numpy.uint8)
+                self.rewards = numpy.zeros(count, dtype= numpy.float32)
+                self.dones = numpy.zeros(count, dtype= bool)
+                self.infos = numpy.zeros((count, len(self.infoNames)), dtype= numpy.int64)
+                layout = None
+            for connection in self.connections:
+                connection.send(layout)
+        except BaseException:
+            self.close()
+            raise
+
+    def receiveFrom(self, index):
+        """Waits for the next reply of one worker and returns it, raising a RuntimeError if the worker failed or exited instead
+
+        Parameters
+        ----------
+        index
+            The index of the environment to wait on
+
+        Returns
+        -------
+        message
+            The bytes the worker sent
+        """
+        try:
+            message = self.connections[index].recv_bytes()
+        except (EOFError, OSError):
+            self.processes[index].join(timeout= 1)
+            raise RuntimeError("Environment {0} exited with code {1}".format(index, self.processes[index].exitcode))
+        if message[:1] == ERROR:
+            raise RuntimeError("Environment {0} failed:\n{1}".format(index, message[1:].decode('utf-8')))
+        return message
+
+    def receive(self):
+        """Waits for every worker to answer its last command and gathers the results sent through the pipes"""
+        for index in range(len(self.connections)):
+            message = self.receiveFrom(index)
+            if self.transport == 'shared': continue
+            self.observations[index], self.rewards[index], self.dones[index], self.infos[index] = pickle.loads(message)
+
+    def reset(self, states= None):
+        """Resets every environment, optionally loading new save states first
+
+        Parameters
+        ----------
+        states
+            An optional list with the name of the save state to load into each environment, None entries keep their current state
+
+        Returns
+        -------
+        observations, infos
+            See step
+        """
+        for index, connection in enumerate(self.connections):
+            state = None if states is None else states[index]
+            connection.send_bytes(bytes([RESET_COMMAND]) + (state.encode('utf-8') if state is not None else b''))
+        self.receive()
+        return self.observations, self.infos
+
+    def step(self, actions):
+        """Emulates one frame in every environment at once
+
+        Parameters
+        ----------
+        actions
+            One index into the discretized action space per environment
+
+        Returns
+        -------
+        observations
+            A uint8 array of shape (environments,) + screenShape with every environment's screen. It is a view of the shared slots
+            that the next step overwrites, copy a screen to keep it
+
+        rewards
+            A float32 array of the reward of each environment's frame
+
+        dones
+            A boolean array flagging the environments whose fight is over, they have to be reset before stepping them again
+
+        infos
+            An int64 array of shape (environments, len(infoNames)) with each environment's RAM info entries in infoNames order
+        """
+        for connection, action in zip(self.connections, actions):
+            connection.send_bytes(bytes([STEP_COMMAND, int(action)]))
+        self.receive()
+        return self.observations, self.rewards, self.dones, self.infos
+
+    def getInfo(self, index):
+        """Returns the latest RAM info of one environment as the dictionary the emulator reports and the Lobby uses"""
+        return dict(zip(self.infoNames, self.infos[index].tolist()))
+
+    def close(self):
+        """Closes every environment, waits for the workers to exit and frees the shared slots, the arrays step returned are no longer valid"""
+        for connection in self.connections:
+            try:
+                connection.send_bytes(bytes([CLOSE_COMMAND]))
+            except OSError:
+                pass                                                                               # The worker already exited
+        for connection, process in zip(self.connections, self.processes):
+            try:
+                connection.recv_bytes()
+            except (EOFError, OSError):
+                pass
+            connection.close()
+            process.join(timeout= 5)
+            if process.is_alive(): process.terminate()
+        self.connections, self.processes = [], []
+        self.observations = self.rewards = self.dones = self.infos = None                          # Views into the blocks have to be released before the blocks can be closed
+        for block in self.blocks:
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                pass                                                                               # The caller still holds a view, the memory is freed once it lets go
+        self.blocks = []
+
+
+"""Compares the latency and throughput of stepping environments with shared memory against sending the results through pipes"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes vectorized environment benchmark parameters.')
+    parser.add_argument('-e', '--environments', type= int, default= 4, help= 'Number of environments stepped at once')
+    parser.add_argument('-s', '--steps', type= int, default= 2000, help= 'Number of steps to time for each transport')
+    args = parser.parse_args()
+
+    for transport in SharedMemoryVecEnv.TRANSPORTS:
+        environments = SharedMemoryVecEnv(args.environments, transport= transport)
+        environments.reset()
+        actionCount = 38                                                                           # Size of the StreetFighter2Discretizer action space
+        latencies = numpy.zeros(args.steps)
+        startTime = time.perf_counter()
+        for step in range(args.steps):
+            stepTime = time.perf_counter()
+            done = environments.step(numpy.random.randint(0, actionCount, size= args.environments))[2].any()        # No views are kept past close
+            latencies[step] = time.perf_counter() - stepTime
+            if done: environments.reset()
+        seconds = time.perf_counter() - startTime
+        environments.close()
+        print('{0:6}  {1:9.0f} frames/s  step latency p50 {2:6.3f} ms  p99 {3:6.3f} ms'.format(
+            transport, args.steps * args.environments / seconds, *(numpy.quantile(latencies, [0.5, 0.99]) * 1e3)))
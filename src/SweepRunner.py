@@ -0,0 +1,252 @@
+import argparse, itertools, json, math, multiprocessing, os, random, traceback
+
+# Every file a trial writes lives under its own directory so trials running side by side never share a model or a log
+TRIAL_FILE_NAME = 'trial.json'
+
+def _initializeTrialWorker(threads):
+    """Gives every trial process an equal share of the cores so that concurrent trials do not oversubscribe them"""
+    for variable in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS']:
+        os.environ[variable] = str(threads)
+
+def _writeJson(path, values):
+    """Writes the values to a JSON file through a temporary file so an interrupted write never leaves a corrupt file behind"""
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'w') as file:
+        json.dump(values, file, indent= 4)
+    os.replace(temporaryPath, path)
+
+def _readJson(path):
+    """Reads a JSON file written by _writeJson"""
+    with open(path) as file:
+        return json.load(file)
+
+def _runTrial(trialDir):
+    """Trains the DeepQAgent of one trial inside a worker process, resuming from its last finished episode.
+       A trial that raises is marked as failed in its trial.json instead of ending the sweep and the trials running beside it
+
+    Parameters
+    ----------
+    trialDir
+        The directory of the trial, holding its trial.json along with its models and logs directories
+
+    Returns
+    -------
+    trial
+        The final contents of the trial's trial.json
+    """
+    try:
+        return _trainTrial(trialDir)
+    except Exception as error:
+        traceback.print_exc()
+        trialPath = os.path.join(trialDir, TRIAL_FILE_NAME)
+        trial = _readJson(trialPath)
+        trial['status'], trial['error'] = 'failed', repr(error)
+        _writeJson(trialPath, trial)
+        return trial
+
+def _trainTrial(trialDir):
+    """Trains the DeepQAgent of one trial, see _runTrial"""
+    from DeepQAgent import DeepQAgent
+    from Lobby import Lobby
+    from MetricsStore import MetricsStore
+    trialPath = os.path.join(trialDir, TRIAL_FILE_NAME)
+    trial = _readJson(trialPath)
+    modelsDir, logsDir = os.path.join(trialDir, 'models'), os.path.join(trialDir, 'logs')
+    os.makedirs(modelsDir, exist_ok= True)
+    os.makedirs(logsDir, exist_ok= True)
+
+    resume = trial['episodesCompleted'] > 0
+    agent = DeepQAgent(load= resume, modelsDir= modelsDir, logsDir= logsDir, **trial['parameters'])
+    if resume:
+        agent.epsilon, agent.updateCount = trial['epsilon'], trial['updateCount']                   # Loading a model would otherwise reset the exploration rate to its minimum
+    lobby = Lobby()
+    lobby.addPlayer(agent)
+    metrics = MetricsStore(agent.name, logsDir= logsDir)
+
+    trial['status'] = 'running'
+    trial.pop('error', None)                                                                       # Left by an earlier attempt that failed
+    _writeJson(trialPath, trial)
+    while trial['episodesCompleted'] < trial['episodes']:
+        summaries = lobby.executeTrainingRun(episodes= 1)
+        trial['episodesCompleted'] += 1
+        trial['epsilon'], trial['updateCount'] = agent.epsilon, agent.updateCount
+        trial['winRate'] = sum(summary['won'] for summary in summaries) / len(summaries)
+        trial['loss'] = agent.lossHistory.getMean()
+        metrics.record('sweepEpisode', trial= trial['id'], episode= trial['episodesCompleted'], winRate= trial['winRate'], loss= trial['loss'], epsilon= agent.epsilon)
+        _writeJson(trialPath, trial)                                                               # The model was saved by the review so the trial can resume from here
+
+    trial['status'] = 'complete'
+    _writeJson(trialPath, trial)
+    return trial
+
+class SweepRunner():
+    """Trains many DeepQAgents with different constructor arguments and network architectures in parallel.
+       The search space maps each DeepQAgent constructor argument to the values it can take. A grid sweep trains every combination,
+       a random sweep draws a fixed number of trials from the space, where a value may also be a {"uniform": [low, high]}
+       or {"logUniform": [low, high]} distribution for the random search to sample from.
+
+       Every trial gets its own directory under ../sweeps/{name} with its models, logs and a trial.json recording its parameters and progress.
+       The list of trials is written once when the sweep is created, so rerunning an interrupted sweep skips the completed trials
+       and resumes the others from their last saved episode.
+    """
+
+    ### Static Variables
+
+    DEFAULT_SWEEPS_DIR_PATH = '../sweeps'                                                          # Default path to the dir the sweeps keep their trials in
+    SWEEP_FILE_NAME = 'sweep.json'
+    DEFAULT_EPISODES = 10                                                                          # Number of training episodes per trial
+    DEFAULT_RANDOM_TRIALS = 8                                                                      # Number of trials drawn by a random sweep
+
+    # A small search space over the settings that were previously tuned by hand, used when no space is given
+    DEFAULT_SPACE = {'learningRate' : [0.0001, 0.0003, 0.001],
+                     'discountRate' : [0.95, 0.98],
+                     'hiddenLayerSizes' : [[48, 96, 192, 96, 48], [128, 128]]}
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def gridTrials(space):
+        """Static method that returns every combination of the values in the search space
+
+        Parameters
+        ----------
+        space
+            A dictionary mapping each constructor argument to a list of values
+
+        Returns
+        -------
+        trials
+            A list of dictionaries of constructor arguments
+        """
+        names = sorted(space)
+        return [dict(zip(names, values)) for values in itertools.product(*[space[name] for name in names])]
+
+    def randomTrials(space, trials, seed= None):
+        """Static method that draws random combinations from the search space
+
+        Parameters
+        ----------
+        space
+            A dictionary mapping each constructor argument to a list of values to choose from
+            or a {"uniform": [low, high]} or {"logUniform": [low, high]} distribution to sample from
+
+        trials
+            The number of combinations to draw
+
+        seed
+            An optional seed for the random draws
+
+        Returns
+        -------
+        trials
+            A list of dictionaries of constructor arguments
+        """
+        generator = random.Random(seed)
+        def sample(values):
+            if isinstance(values, list): return generator.choice(values)
+            if 'uniform' in values: return generator.uniform(*values['uniform'])
+            low, high = values['logUniform']
+            return math.exp(generator.uniform(math.log(low), math.log(high)))
+        return [{name : sample(space[name]) for name in sorted(space)} for _ in range(trials)]
+
+    ### End of static methods
+
+    def __init__(self, name, space= None, search= 'grid', trials= DEFAULT_RANDOM_TRIALS, episodes= DEFAULT_EPISODES, seed= None,
+                 sweepsDir= DEFAULT_SWEEPS_DIR_PATH):
+        """Creates the sweep, or reopens it if a sweep with this name already exists
+
+        Parameters
+        ----------
+        name
+            The name of the sweep, its trials are kept in {sweepsDir}/{name}
+
+        space
+            The search space, see the class description. Defaults to DEFAULT_SPACE. Ignored when reopening a sweep
+
+        search
+            Either 'grid' to train every combination or 'random' to draw a number of random combinations. Ignored when reopening a sweep
+
+        trials
+            The number of combinations a random search draws
+
+        episodes
+            The number of training episodes each trial runs, once through the roster is one episode
+
+        seed
+            An optional seed for the random search
+
+        sweepsDir
+            The directory the sweeps are kept in
+
+        Returns
+        -------
+        None
+        """
+        self.directory = os.path.join(sweepsDir, name)
+        sweepPath = os.path.join(self.directory, SweepRunner.SWEEP_FILE_NAME)
+        if os.path.exists(sweepPath):
+            self.trialIds = _readJson(sweepPath)['trials']
+            return
+
+        if space is None: space = SweepRunner.DEFAULT_SPACE
+        if search == 'grid': parameterSets = SweepRunner.gridTrials(space)
+        else: parameterSets = SweepRunner.randomTrials(space, trials, seed= seed)
+        self.trialIds = ['trial{0:03d}'.format(index) for index in range(len(parameterSets))]
+        for trialId, parameters in zip(self.trialIds, parameterSets):
+            os.makedirs(os.path.join(self.directory, trialId), exist_ok= True)
+            _writeJson(os.path.join(self.directory, trialId, TRIAL_FILE_NAME),
+                       {'id' : trialId, 'parameters' : parameters, 'episodes' : episodes, 'episodesCompleted' : 0, 'status' : 'pending'})
+        _writeJson(sweepPath, {'space' : space, 'search' : search, 'episodes' : episodes, 'trials' : self.trialIds})
+
+    def getTrials(self):
+        """Returns the current contents of every trial.json in the sweep"""
+        return [_readJson(os.path.join(self.directory, trialId, TRIAL_FILE_NAME)) for trialId in self.trialIds]
+
+    def run(self, processes= None):
+        """Runs every trial that has not completed yet, resuming the ones that were interrupted and retrying the ones that failed
+
+        Parameters
+        ----------
+        processes
+            The number of trials trained at once, defaults to the number of cores on the machine.
+            The cores are split evenly between the trials for their math libraries
+
+        Returns
+        -------
+        trials
+            The contents of every trial.json once the sweep has finished
+        """
+        pending = [trial['id'] for trial in self.getTrials() if trial['status'] != 'complete']
+        if len(pending) > 0:
+            cores = os.cpu_count()
+            processes = min(processes or cores, len(pending))
+            context = multiprocessing.get_context('spawn')                                        # Forking a process that already holds an emulator or TensorFlow is unsafe
+            # Each trial gets a fresh process as gym retro only allows one emulator per process and TensorFlow does not release its memory
+            with context.Pool(processes= processes, initializer= _initializeTrialWorker, initargs= (max(1, cores // processes),), maxtasksperchild= 1) as pool:
+                for trial in pool.imap_unordered(_runTrial, [os.path.join(self.directory, trialId) for trialId in pending]):
+                    if trial['status'] == 'failed': print('Failed', trial['id'], trial['parameters'], trial['error'])
+                    else: print('Finished', trial['id'], trial['parameters'], 'win rate {0:.2f}'.format(trial['winRate']))
+        return self.getTrials()
+
+    def formatTable(self, trials):
+        """Returns the trials as plain text lines, best last episode win rate first"""
+        ranked = sorted(trials, key= lambda trial: trial.get('winRate', -1), reverse= True)
+        return '\n'.join('{0}  {1:9}  {2:>5}  {3}'.format(trial['id'], trial['status'], '{0:.2f}'.format(trial['winRate']) if 'winRate' in trial else '-',
+                                                         json.dumps(trial['parameters'])) for trial in ranked)
+
+
+"""Runs or resumes a hyperparameter sweep over DeepQAgent constructor arguments"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes sweep parameters.')
+    parser.add_argument('-n', '--name', type= str, required= True, help= 'Name of the sweep, rerunning a sweep with the same name resumes it')
+    parser.add_argument('-c', '--config', type= str, default= None, help= 'Path to a JSON file with the search space, defaults to SweepRunner.DEFAULT_SPACE')
+    parser.add_argument('-s', '--search', type= str, default= 'grid', choices= ['grid', 'random'], help= 'Whether to train every combination or random draws from the space')
+    parser.add_argument('-t', '--trials', type= int, default= SweepRunner.DEFAULT_RANDOM_TRIALS, help= 'Number of trials a random search draws')
+    parser.add_argument('-e', '--episodes', type= int, default= SweepRunner.DEFAULT_EPISODES, help= 'Number of training episodes per trial')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of trials trained at once, defaults to the number of cores')
+    args = parser.parse_args()
+    space = None
+    if args.config is not None: space = _readJson(args.config)
+    sweep = SweepRunner(args.name, space= space, search= args.search, trials= args.trials, episodes= args.episodes)
+    print(sweep.formatTable(sweep.run(processes= args.processes)))
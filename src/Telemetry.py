@@ -0,0 +1,171 @@
+import argparse, threading, time, numpy
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Telemetry():
+    """Live metrics of a running training run, kept in fixed size buffers so a run of any length uses constant memory.
+       Counters only ever go up, like emulated frames or gradient updates, and their recent rate per second is derived from
+       snapshots taken whenever the metrics are read. Histograms keep the latest samples of a value, like the inference latency
+       or the loss, in a ring buffer and report their percentiles. Gauges hold the last value set, like epsilon.
+
+       Recording is a dictionary update or an array write, cheap enough for the Lobby's per decision loop, and all the work
+       of computing rates and percentiles happens when the metrics are read. Only the first recording of a name takes the lock,
+       as adding a name resizes a dictionary the reading thread may be iterating over. serve starts a local HTTP endpoint that returns
+       the metrics in the Prometheus text exposition format at /metrics.
+    """
+
+    ### Static Variables
+
+    DEFAULT_PORT = 9108                                                                            # Default port of the local metrics endpoint
+    HISTOGRAM_SIZE = 1024                                                                          # Number of latest samples each histogram keeps
+    RATE_WINDOW = 60                                                                               # Seconds of counter snapshots the rates are averaged over
+    QUANTILES = [0.5, 0.9, 0.99]
+    PREFIX = 'sf2_'                                                                                # Prefix of every exported metric name
+
+    ### End of static variables
+
+    def __init__(self):
+        """Initializes an empty set of metrics"""
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}                                                                       # Maps a name to its sample buffer and the number of samples written so far
+        self.snapshots = deque([(time.time(), {})])                                                # Timestamped copies of the counters, the rates are computed from these
+        self.lock = threading.Lock()                                                               # Taken when reading and when recording adds a new name, updates of existing names rely on the GIL
+        self.server = None
+
+    def increment(self, name, amount= 1):
+        """Adds to a counter"""
+        if name not in self.counters:
+            with self.lock: self.counters.setdefault(name, 0)
+        self.counters[name] += amount
+
+    def setGauge(self, name, value):
+        """Sets a gauge to its latest value"""
+        if name not in self.gauges:
+            with self.lock: self.gauges[name] = value
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        """Adds a sample to a histogram, overwriting its oldest sample once the ring buffer is full"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock: histogram = self.histograms.setdefault(name, [numpy.zeros(Telemetry.HISTOGRAM_SIZE), 0])
+        histogram[0][histogram[1] % Telemetry.HISTOGRAM_SIZE] = value
+        histogram[1] += 1
+
+    def getRates(self):
+        """Takes a snapshot of the counters and returns each counter's mean rate per second over the rate window"""
+        now = time.time()
+        self.snapshots.append((now, dict(self.counters)))
+        while len(self.snapshots) > 2 and now - self.snapshots[1][0] >= Telemetry.RATE_WINDOW:
+            self.snapshots.popleft()
+        startTime, startCounters = self.snapshots[0]
+        elapsed = now - startTime
+        if elapsed <= 0: return {name : 0.0 for name in self.counters}
+        return {name : (value - startCounters.get(name, 0)) / elapsed for name, value in self.counters.items()}
+
+    def getQuantiles(self, name):
+        """Returns the quantiles of a histogram's samples in its ring buffer and the total number of samples it has seen"""
+        samples, count = self.histograms[name]
+        return numpy.quantile(samples[:min(count, Telemetry.HISTOGRAM_SIZE)], Telemetry.QUANTILES), count
+
+    def formatExposition(self):
+        """Returns every metric in the Prometheus text exposition format
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        text
+            Counters as {name}_total, their rates as {name}_per_second gauges, gauges as they are
+            and histograms as summaries with a quantile label and a _count
+        """
+        with self.lock:
+            lines = []
+            rates = self.getRates()
+            for name in sorted(self.counters):
+                metric = Telemetry.PREFIX + name
+                lines += ['# TYPE {0}_total counter'.format(metric), '{0}_total {1}'.format(metric, self.counters[name])]
+                lines += ['# TYPE {0}_per_second gauge'.format(metric), '{0}_per_second {1:.6g}'.format(metric, rates[name])]
+            for name in sorted(self.gauges):
+                metric = Telemetry.PREFIX + name
+                lines += ['# TYPE {0} gauge'.format(metric), '{0} {1:.6g}'.format(metric, self.gauges[name])]
+            for name in sorted(self.histograms):
+                metric = Telemetry.PREFIX + name
+                quantiles, count = self.getQuantiles(name)
+                lines.append('# TYPE {0} summary'.format(metric))
+                lines += ['{0}{{quantile="{1}"}} {2:.6g}'.format(metric, quantile, value) for quantile, value in zip(Telemetry.QUANTILES, quantiles)]
+                lines.append('{0}_count {1}'.format(metric, count))
+            return '\n'.join(lines) + '\n'
+
+    def serve(self, port= DEFAULT_PORT, host= '127.0.0.1'):
+        """Starts serving the metrics at http://{host}:{port}/metrics from a background thread
+
+        Parameters
+        ----------
+        port
+            The port to listen on
+
+        host
+            The address to listen on, the local machine only by default
+
+        Returns
+        -------
+        None
+        """
+        telemetry = self
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = telemetry.formatExposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass                                                                               # Keep scrapes out of the training output
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target= self.server.serve_forever, daemon= True).start()
+        print('Serving telemetry at http://{0}:{1}/metrics'.format(host, port))
+
+    def close(self):
+        """Stops the metrics endpoint if it is running"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+"""Measures the cost of recording metrics from the Lobby's decision loop"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes telemetry benchmark parameters.')
+    parser.add_argument('-d', '--decisions', type= int, default= 200000, help= 'Number of simulated decisions to record')
+    args = parser.parse_args()
+
+    telemetry = Telemetry()
+    startTime = time.perf_counter()
+    for decision in range(args.decisions):
+        pass
+    loopTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    for decision in range(args.decisions):                                                         # The same calls the Lobby makes for every decision
+        telemetry.increment('frames', 12)
+        telemetry.increment('decisions')
+        telemetry.observe('inference_seconds', 0.0001)
+        telemetry.observe('reward', 1.0)
+        telemetry.setGauge('memory_size', decision)
+        telemetry.setGauge('epsilon', 0.1)
+    recordTime = time.perf_counter() - startTime - loopTime
+
+    startTime = time.perf_counter()
+    telemetry.formatExposition()
+    print('recording overhead per decision: {0:.2f} us'.format(recordTime / args.decisions * 1e6))
+    print('formatting the exposition:       {0:.2f} ms'.format((time.perf_counter() - startTime) * 1e3))
@@ -0,0 +1,102 @@
+class TerminationPolicy():
+    """Decides when the Lobby should cut a fight short before the game itself ends it.
+       A fight normally runs until the continue timer or two won matches fire the done condition of the scenario,
+       so evaluation and exploration runs spend full emulator time on fights whose outcome is already clear.
+       After every decision the Lobby asks each of its policies whether to stop, and a fight stopped this way is
+       recorded as truncated rather than done, the value of the state it stopped in is still bootstrapped when training.
+
+       Policies can be built from a comma separated spec like "frames=6000,decisions=400,deficit=80,firstRound", see fromSpec.
+    """
+
+    ### Static Variables
+
+    SPEC_NAMES = ['frames', 'decisions', 'deficit', 'firstRound']                                  # The names fromSpec understands, in the order of the classes below
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def fromSpec(spec):
+        """Static method that builds the policies described by a spec string
+
+        Parameters
+        ----------
+        spec
+            A comma separated list of name=value entries, frames=N for a FrameBudget, decisions=N for a DecisionBudget,
+            deficit=N for a HealthDeficitCutoff and firstRound for a FirstRoundOnly. None or an empty string gives no policies
+
+        Returns
+        -------
+        policies
+            A list of TerminationPolicy objects in the order they appear in the spec
+        """
+        policies = []
+        for entry in (spec or '').split(','):
+            name, _, value = entry.strip().partition('=')
+            if name == 'frames': policies.append(FrameBudget(int(value)))
+            elif name == 'decisions': policies.append(DecisionBudget(int(value)))
+            elif name == 'deficit': policies.append(HealthDeficitCutoff(int(value)))
+            elif name == 'firstRound': policies.append(FirstRoundOnly())
+            elif name != '': raise ValueError("Unknown termination policy " + name + ", expected one of " + ', '.join(TerminationPolicy.SPEC_NAMES))
+        return policies
+
+    ### End of static methods
+
+    def reset(self):
+        """Called by the Lobby at the start of every fight, policies that keep state between decisions clear it here"""
+        pass
+
+    def shouldTruncate(self, lobby, info):
+        """To be implemented in child class, decides whether the fight should stop after the decision that was just played
+
+        Parameters
+        ----------
+        lobby
+            The Lobby playing the fight, its frameCount and decisionCount already include the decision
+
+        info
+            The RAM info of the game state the decision led to
+
+        Returns
+        -------
+        truncate
+            True if the Lobby should end the fight here
+        """
+        raise NotImplementedError("Implement this is in the inherited policy")
+
+class FrameBudget(TerminationPolicy):
+    """Stops a fight once it has used up a budget of emulated frames"""
+
+    def __init__(self, maxFrames):
+        """Initializes the policy with the most frames a fight may emulate, the decision that crosses the budget is still played out"""
+        self.maxFrames = maxFrames
+
+    def shouldTruncate(self, lobby, info):
+        return lobby.frameCount >= self.maxFrames
+
+class DecisionBudget(TerminationPolicy):
+    """Stops a fight once the player has made a number of decisions"""
+
+    def __init__(self, maxDecisions):
+        """Initializes the policy with the most decisions a fight may take"""
+        self.maxDecisions = maxDecisions
+
+    def shouldTruncate(self, lobby, info):
+        return lobby.decisionCount >= self.maxDecisions
+
+class HealthDeficitCutoff(TerminationPolicy):
+    """Stops a fight once one fighter is ahead on health by a margin, either the player is too far behind to come back or has the round in hand"""
+
+    def __init__(self, deficit):
+        """Initializes the policy with the health gap between the fighters that ends the fight, a full health bar is 176"""
+        self.deficit = deficit
+
+    def shouldTruncate(self, lobby, info):
+        # KO'd fighters can read below zero so both are clamped like the Lobby's damage totals
+        return abs(max(info['health'], 0) - max(info['enemy_health'], 0)) >= self.deficit
+
+class FirstRoundOnly(TerminationPolicy):
+    """Stops a fight as soon as its first round has been decided"""
+
+    def shouldTruncate(self, lobby, info):
+        return info['matches_won'] + info['enemy_matches_won'] > 0
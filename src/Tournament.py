@@ -0,0 +1,178 @@
+import argparse, csv, itertools
+from RolloutPool import RolloutPool
+
+class Tournament():
+    """Compares saved agents by playing every agent against every save state and scoring the agents against each other round-robin style.
+       The save states pit the agent against the game's CPU, so a match between two agents is decided by how each of them
+       did on the same save state: winning the fight beats losing it, and equal outcomes are decided by the damage difference.
+       Elo ratings are computed from those matches.
+    """
+
+    ### Static Variables
+
+    DEFAULT_ELO = 1500                                                                             # The rating every agent starts the tournament with
+    ELO_K_FACTOR = 32                                                                              # The largest rating change a single match can cause
+
+    TABLE_COLUMNS = ['name', 'elo', 'matchWins', 'matchDraws', 'matchLosses', 'fightsWon', 'fightsLost', 'damageDealt', 'damageTaken']
+
+    ### End of static variables
+
+    ### Static Methods
+
+    def scoreMatch(resultA, resultB):
+        """Static method that scores a match between two agents from their fights on the same save state
+
+        Parameters
+        ----------
+        resultA
+            The fight summary of the first agent
+
+        resultB
+            The fight summary of the second agent
+
+        Returns
+        -------
+        score
+            1 if the first agent won the match, 0 if it lost and 0.5 for a draw
+        """
+        if resultA['won'] != resultB['won']:
+            return 1.0 if resultA['won'] else 0.0
+        marginA = resultA['damageDealt'] - resultA['damageTaken']
+        marginB = resultB['damageDealt'] - resultB['damageTaken']
+        if marginA == marginB: return 0.5
+        return 1.0 if marginA > marginB else 0.0
+
+    def expectedScore(ratingA, ratingB):
+        """Static method that returns the Elo expected score of a player rated ratingA against a player rated ratingB"""
+        return 1 / (1 + 10 ** ((ratingB - ratingA) / 400))
+
+    ### End of static methods
+
+    def __init__(self, names, states= None, processes= None):
+        """Initializes the tournament
+
+        Parameters
+        ----------
+        names
+            A list of the names of the saved DeepQAgent models that will compete
+
+        states
+            A list of the save states to play, defaults to every save state returned by Lobby.getStates
+
+        processes
+            The number of worker processes to play fights in, defaults to the number of cores on the machine
+
+        Returns
+        -------
+        None
+        """
+        if states is None:
+            from Lobby import Lobby
+            states = Lobby.getStates()
+        self.names = names
+        self.states = states
+        self.pool = RolloutPool(processes= processes)
+        self.results = []
+
+    def run(self):
+        """Plays every agent on every save state in parallel and returns the results table
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        table
+            A list of dictionaries, one per agent sorted by Elo, with the columns in TABLE_COLUMNS
+        """
+        tasks = [{'name' : name, 'state' : state} for state in self.states for name in self.names]
+        self.results = self.pool.run(tasks)
+        return self.buildTable()
+
+    def buildTable(self):
+        """Aggregates the fight results of the tournament into the results table
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        table
+            A list of dictionaries, one per agent sorted by Elo, with the columns in TABLE_COLUMNS
+        """
+        rows = {name : {'name' : name, 'elo' : Tournament.DEFAULT_ELO, 'matchWins' : 0, 'matchDraws' : 0, 'matchLosses' : 0,
+                        'fightsWon' : 0, 'fightsLost' : 0, 'damageDealt' : 0, 'damageTaken' : 0} for name in self.names}
+        resultsByState = {state : {} for state in self.states}
+        for result in self.results:
+            row = rows[result['name']]
+            if result['won']: row['fightsWon'] += 1
+            else: row['fightsLost'] += 1
+            row['damageDealt'] += result['damageDealt']
+            row['damageTaken'] += result['damageTaken']
+            resultsByState[result['state']][result['name']] = result
+
+        # Matches are rated in a fixed order so that the same results always give the same ratings
+        for state in self.states:
+            for nameA, nameB in itertools.combinations(self.names, 2):
+                score = Tournament.scoreMatch(resultsByState[state][nameA], resultsByState[state][nameB])
+                self.updateRatings(rows[nameA], rows[nameB], score)
+
+        for row in rows.values(): row['elo'] = round(row['elo'], 1)
+        return sorted(rows.values(), key= lambda row: row['elo'], reverse= True)
+
+    def updateRatings(self, rowA, rowB, score):
+        """Updates the Elo ratings and match records of two agents after a match
+
+        Parameters
+        ----------
+        rowA
+            The results table row of the first agent
+
+        rowB
+            The results table row of the second agent
+
+        score
+            The score of the first agent in the match as returned by scoreMatch
+
+        Returns
+        -------
+        None
+        """
+        expected = Tournament.expectedScore(rowA['elo'], rowB['elo'])
+        rowA['elo'] += Tournament.ELO_K_FACTOR * (score - expected)
+        rowB['elo'] -= Tournament.ELO_K_FACTOR * (score - expected)
+        if score == 1: rowA['matchWins'], rowB['matchLosses'] = rowA['matchWins'] + 1, rowB['matchLosses'] + 1
+        elif score == 0: rowA['matchLosses'], rowB['matchWins'] = rowA['matchLosses'] + 1, rowB['matchWins'] + 1
+        else: rowA['matchDraws'], rowB['matchDraws'] = rowA['matchDraws'] + 1, rowB['matchDraws'] + 1
+
+    def formatTable(self, table):
+        """Returns the results table as aligned plain text for printing"""
+        widths = [max([len(column)] + [len(str(row[column])) for row in table]) for column in Tournament.TABLE_COLUMNS]
+        lines = ['  '.join(column.ljust(width) for column, width in zip(Tournament.TABLE_COLUMNS, widths))]
+        for row in table:
+            lines.append('  '.join(str(row[column]).ljust(width) for column, width in zip(Tournament.TABLE_COLUMNS, widths)))
+        return '\n'.join(lines)
+
+    def saveTable(self, table, path):
+        """Writes the results table to a csv file at path"""
+        with open(path, 'w', newline= '') as file:
+            writer = csv.DictWriter(file, fieldnames= Tournament.TABLE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(table)
+
+
+"""Runs a round-robin tournament between saved DeepQAgent models and prints the results table"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes tournament parameters.')
+    parser.add_argument('-n', '--names', type= str, nargs= '+', required= True, help= 'Names of the saved models that will compete')
+    parser.add_argument('-s', '--states', type= str, nargs= '+', default= None, help= 'Save states to play, defaults to every save state in the game directory')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of worker processes, defaults to the number of cores')
+    parser.add_argument('-o', '--output', type= str, default= None, help= 'Optional path of a csv file to write the results table to')
+    args = parser.parse_args()
+    tournament = Tournament(args.names, states= args.states, processes= args.processes)
+    with tournament.pool:
+        table = tournament.run()
+    print(tournament.formatTable(table))
+    if args.output is not None: tournament.saveTable(table, args.output)
@@ -0,0 +1,39 @@
+import argparse, random, numpy
+from DeepQAgent import DeepQAgent
+from Lobby import Lobby
+
+"""Measures how holding moves for more frames or deciding at fewer actionable states changes the frames per second,
+   the decisions made and the training samples recorded per fight"""
+
+DEFAULT_SETTINGS = ['0x1', '4x1', '8x1', '0x2', '0x4', '8x2']
+
+def timeFights(agent, states, holdFrames, decisionInterval, seed):
+    """Plays every save state under one decision setting and returns the frames, decisions, recorded samples and seconds"""
+    lobby = Lobby(skipScreens= True, holdFrames= holdFrames, decisionInterval= decisionInterval)
+    lobby.addPlayer(agent)
+    frames, decisions, samples, seconds = 0, 0, 0, 0.0
+    for state in states:
+        random.seed(seed)                                                                          # Picks the random moves
+        numpy.random.seed(seed)                                                                    # Decides when to explore, see DeepQAgent.getMove
+        summary = lobby.play(state)
+        samples += len(agent.memory)
+        agent.prepareForNextFight()
+        frames, decisions, seconds = frames + summary['frames'], decisions + summary['decisions'], seconds + summary['seconds']
+    return frames, decisions, samples, seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes decision interval benchmark parameters.')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of a saved model to play with, an untrained network by default')
+    parser.add_argument('-s', '--states', type= int, default= 2, help= 'Number of save states to play under every setting')
+    parser.add_argument('-r', '--seed', type= int, default= 0, help= 'Seed of the agent\'s exploration')
+    parser.add_argument('-x', '--settings', type= str, nargs= '+', default= DEFAULT_SETTINGS, help= 'Settings to compare given as holdFrames x decisionInterval')
+    args = parser.parse_args()
+
+    agent = DeepQAgent(load= args.name is not None, epsilon= DeepQAgent.EPSILON_MIN, name= args.name)
+    agent.compilePolicy()                                                                          # Decide with the NumPy policy rollout workers use
+    states = Lobby.getStates()[:args.states]
+    print('{0:10}  {1:>9}  {2:>9}  {3:>10}  {4:>14}'.format('hold x int', 'frames/s', 'decisions', 'samples', 'frames/sample'))
+    for setting in args.settings:
+        holdFrames, decisionInterval = [int(value) for value in setting.split('x')]
+        frames, decisions, samples, seconds = timeFights(agent, states, holdFrames, decisionInterval, args.seed)
+        print('{0:10}  {1:9.0f}  {2:9d}  {3:10d}  {4:14.1f}'.format(setting, frames / seconds, decisions, samples, frames / max(samples, 1)))
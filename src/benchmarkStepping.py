@@ -0,0 +1,36 @@
+import argparse, random
+from Agent import Agent
+from Lobby import Lobby
+
+"""Compares the frames per second the Lobby emulates when it captures the screen of every frame, only at decisions,
+   or never. A random agent plays the same fights in every mode so the emulated frames are identical"""
+
+MODES = [('every frame', False, True), ('decisions only', True, True), ('never', True, False)]
+
+def timeFights(skipScreens, usesObservations, states, seed):
+    """Plays every save state with a seeded random agent and returns the frames emulated and the seconds it took"""
+    agent = Agent()
+    agent.USES_OBSERVATIONS = usesObservations
+    lobby = Lobby(skipScreens= skipScreens)
+    lobby.addPlayer(agent)
+    frames, seconds = 0, 0.0
+    for state in states:
+        random.seed(seed)
+        summary = lobby.play(state)
+        agent.prepareForNextFight()
+        frames += summary['frames']
+        seconds += summary['seconds']
+    return frames, seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes stepping benchmark parameters.')
+    parser.add_argument('-s', '--states', type= int, default= 2, help= 'Number of save states to play in every mode')
+    parser.add_argument('-r', '--seed', type= int, default= 0, help= 'Seed of the random agent')
+    args = parser.parse_args()
+
+    states = Lobby.getStates()[:args.states]
+    baseline = None
+    for label, skipScreens, usesObservations in MODES:
+        frames, seconds = timeFights(skipScreens, usesObservations, states, args.seed)
+        if baseline is None: baseline = frames / seconds
+        print('screens captured {0:14}  {1:7d} frames  {2:8.0f} frames/s  {3:5.2f}x'.format(label, frames, frames / seconds, frames / seconds / baseline))
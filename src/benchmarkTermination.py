@@ -0,0 +1,45 @@
+import argparse, time
+from Evaluation import Evaluation
+from RolloutPool import RolloutPool
+
+"""Measures how much faster evaluation fights run under each termination policy and how often a truncated fight
+   is still judged the same as the full fight played from the same save state and start delay"""
+
+DEFAULT_POLICIES = ['frames=6000', 'decisions=400', 'deficit=80', 'firstRound', 'deficit=80,firstRound']
+
+def playFights(pool, name, states, seeds, termination):
+    """Plays every save state once per seed under the given termination spec, returns the summaries in task order and the wall time.
+       The workers are started before any fight is timed and keep the agent loaded between policies"""
+    tasks = [{'name' : name, 'state' : state, 'seed' : seed, 'startDelay' : Evaluation.getStartDelay(seed), 'termination' : termination}
+             for seed in range(seeds) for state in states]
+    startTime = time.time()
+    results = pool.run(tasks)
+    return results, time.time() - startTime
+
+def formatRow(label, results, seconds, baseline):
+    """Returns one line of the report comparing a policy's fights with the full fights in baseline"""
+    frames = sum(result['frames'] for result in results)
+    baselineFrames = sum(result['frames'] for result in baseline[0])
+    agreement = sum(result['won'] == full['won'] for result, full in zip(results, baseline[0])) / len(results)
+    return '{0:24}  {1:8.0f}  {2:8.1f}  {3:7.2f}x  {4:7.2f}x  {5:9.2f}  {6:9.2f}'.format(
+        label, frames / len(results), len(results) / seconds * 3600, baseline[1] / seconds, baselineFrames / max(frames, 1),
+        sum(result['truncated'] for result in results) / len(results), agreement)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes termination benchmark parameters.')
+    parser.add_argument('-n', '--name', type= str, default= 'DeepQAgent', help= 'Name of the saved model to play the fights with')
+    parser.add_argument('-s', '--seeds', type= int, default= 2, help= 'Number of fights to play against each character under every policy')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of worker processes, defaults to the number of cores')
+    parser.add_argument('-x', '--policies', type= str, nargs= '+', default= DEFAULT_POLICIES, help= 'Termination policy specs to compare with the full fights')
+    args = parser.parse_args()
+
+    from Lobby import Lobby
+    states = Lobby.getStates()
+    with RolloutPool(processes= args.processes) as pool:
+        pool.start()
+        baseline = playFights(pool, args.name, states, args.seeds, None)
+
+        print('{0:24}  {1:>8}  {2:>8}  {3:>8}  {4:>8}  {5:>9}  {6:>9}'.format('policy', 'frames', 'fights/h', 'speedup', 'frameCut', 'truncated', 'agreement'))
+        print(formatRow('none', *baseline, baseline))
+        for policy in args.policies:
+            print(formatRow(policy, *playFights(pool, args.name, states, args.seeds, policy), baseline))
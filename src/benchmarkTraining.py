@@ -0,0 +1,51 @@
+import argparse, time, numpy
+from DeepQAgent import DeepQAgent
+
+"""Compares the training throughput of the compiled DeepQAgent training step against the per transition
+   model.predict and model.fit loop the agent used to train with"""
+
+def makeSyntheticData(agent, transitions):
+    """Returns randomly generated training data with the shapes prepareMemoryForTraining produces"""
+    return agent.addNStepReturns({'states' : numpy.random.rand(transitions, agent.stateSize).astype(numpy.float32),
+                                  'actions' : numpy.random.randint(0, agent.actionSize, size= transitions).astype(numpy.int32),
+                                  'rewards' : numpy.random.rand(transitions).astype(numpy.float32),
+                                  'dones' : (numpy.random.rand(transitions) < 0.01).astype(numpy.float32),
+                                  'nextStates' : numpy.random.rand(transitions, agent.stateSize).astype(numpy.float32)})
+
+def trainWithFit(agent, data, model):
+    """The original training loop, one predict call per state and next state and one fit call per transition"""
+    agent.lossHistory.losses_clear()
+    for index in numpy.random.permutation(len(data['actions'])):
+        state, nextState = data['states'][index : index + 1], data['nextStates'][index : index + 1]
+        modelOutput = model.predict(state)[0]
+        reward = data['rewards'][index]
+        if not data['dones'][index]:
+            reward = reward + agent.gamma * numpy.amax(model.predict(nextState)[0])
+        modelOutput[data['actions'][index]] = reward
+        history = model.fit(state, numpy.reshape(modelOutput, [1, agent.actionSize]), epochs= 1, verbose= 0)
+        agent.lossHistory.record(history.history['loss'][0])
+    return model
+
+def timeTraining(trainFunction, agent, data):
+    """Runs one warm up pass to trigger any tracing and then times a second pass, returns the time in seconds"""
+    trainFunction(data, agent.model)
+    startTime = time.time()
+    trainFunction(data, agent.model)
+    return time.time() - startTime
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes benchmark parameters.')
+    parser.add_argument('-t', '--transitions', type= int, default= 2000, help= 'Number of synthetic transitions to train on in each pass')
+    parser.add_argument('-b', '--batchSize', type= int, default= DeepQAgent.DEFAULT_BATCH_SIZE, help= 'Minibatch size of the compiled training step')
+    parser.add_argument('-x', '--xla', action= 'store_true', help= 'Boolean flag for if the compiled training step should also use XLA')
+    args = parser.parse_args()
+
+    agent = DeepQAgent(batchSize= args.batchSize, useXla= args.xla)
+    data = makeSyntheticData(agent, args.transitions)
+
+    fitTime = timeTraining(lambda data, model: trainWithFit(agent, data, model), agent, data)
+    print('model.fit loop:      {0:8.1f} updates/s  {1:10.1f} transitions/s'.format(args.transitions / fitTime, args.transitions / fitTime))
+
+    compiledTime = timeTraining(agent.trainNetwork, agent, data)
+    updates = int(numpy.ceil(args.transitions / args.batchSize))
+    print('compiled train step: {0:8.1f} updates/s  {1:10.1f} transitions/s'.format(updates / compiledTime, args.transitions / compiledTime))
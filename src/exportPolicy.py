@@ -0,0 +1,66 @@
+import argparse, time, numpy
+from DeepQAgent import DeepQAgent
+from NumpyPolicy import NumpyPolicy
+from QuantizedPolicy import QuantizedPolicy
+
+"""Exports a trained DeepQAgent model as float16 or int8 QuantizedPolicy files for rollout workers to load with
+   DeepQAgent.loadPolicy(precision= ...), and checks how often the quantized policy picks the same move as the float32 Keras model"""
+
+def collectStates(agent, fights):
+    """Plays fights with the agent and returns the feature vector of every state it decided in"""
+    from Lobby import Lobby
+    lobby = Lobby()
+    lobby.addPlayer(agent)
+    states = []
+    for state in Lobby.getStates()[:fights]:
+        lobby.play(state= state)
+        states += [agent.prepareNetworkInputs(step[DeepQAgent.STATE_INDEX]) for step in agent.memory]
+        agent.prepareForNextFight()
+    return numpy.concatenate(states).astype(numpy.float32)
+
+def timeDecisions(policy, states, decisions):
+    """Returns the mean time in seconds of predicting the Q values of a single state, as getMove does"""
+    startTime = time.perf_counter()
+    for index in range(decisions):
+        policy.predict(states[index % len(states)][numpy.newaxis])
+    return (time.perf_counter() - startTime) / decisions
+
+def getWeightBytes(policy):
+    """Returns the number of bytes of the weight arrays a NumpyPolicy or QuantizedPolicy holds in memory to make its decisions"""
+    arrays = policy.kernels + policy.biases + [scale for scale in getattr(policy, 'scales', []) if scale is not None]
+    return sum(array.nbytes for array in arrays)
+
+def getSavedBytes(policy):
+    """Returns the number of bytes of the weight arrays a NumpyPolicy or QuantizedPolicy saves and sends to workers"""
+    return sum(array.nbytes for array in policy.toArrays().values())
+
+def compare(name, referenceQValues, policy, states, decisions):
+    """Prints the argmax agreement, the largest Q value error, the weight memory, the saved size and the decision latency of a policy"""
+    qValues = policy.predict(states)
+    agreement = numpy.mean(numpy.argmax(qValues, axis= 1) == numpy.argmax(referenceQValues, axis= 1))
+    print('{0:8}  agreement {1:7.2%}  max error {2:9.5f}  memory {3:8d} bytes  saved {4:8d} bytes  {5:7.1f} us/decision'.format(
+          name, agreement, numpy.abs(qValues - referenceQValues).max(), getWeightBytes(policy), getSavedBytes(policy),
+          timeDecisions(policy, states, decisions) * 1e6))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes export parameters.')
+    parser.add_argument('-n', '--name', type= str, default= 'DeepQAgent', help= 'Name of the saved model to export')
+    parser.add_argument('-p', '--precisions', type= str, nargs= '+', default= QuantizedPolicy.PRECISIONS, help= 'Precisions to export, float16 and or int8')
+    parser.add_argument('-f', '--fights', type= int, default= 2, help= 'Number of fights played to record the states the policies are compared on')
+    parser.add_argument('-s', '--states', type= str, default= None, help= 'Path to a .npy file of recorded feature vectors to compare on instead of playing fights')
+    parser.add_argument('-d', '--decisions', type= int, default= 2000, help= 'Number of single state predictions timed per policy')
+    args = parser.parse_args()
+
+    agent = DeepQAgent(load= True, name= args.name)
+    agent.epsilon = 0
+    if args.states is not None: states = numpy.load(args.states).astype(numpy.float32)
+    else: states = collectStates(agent, args.fights)
+    referenceQValues = numpy.asarray(agent.model.predict(states))
+    print('Comparing on', len(states), 'recorded states against the float32 Keras model')
+
+    policy = NumpyPolicy.fromModel(agent.model)
+    compare('float32', referenceQValues, policy, states, args.decisions)
+    for precision in args.precisions:
+        quantized = QuantizedPolicy.fromPolicy(policy, precision)
+        quantized.save(agent.getPolicyPath(precision))
+        compare(precision, referenceQValues, quantized, states, args.decisions)
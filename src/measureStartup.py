@@ -0,0 +1,30 @@
+import argparse, subprocess, sys, time
+
+"""Measures the cold start time of each entry point by importing it in a fresh interpreter, and reports which heavy libraries each one loads"""
+
+ENTRY_POINTS = ['Agent', 'Lobby', 'DeepQAgent', 'watchAgent', 'RolloutPool', 'Tournament', 'Evaluation']
+HEAVY_MODULES = ['tensorflow', 'keras', 'retro', 'gym']
+
+# Run in the child interpreter, prints the heavy modules that ended up imported
+CHECK_SCRIPT = "import sys, {0}; print(','.join(module for module in {1} if module in sys.modules))"
+
+def measureEntryPoint(entryPoint, repeats):
+    """Returns the mean wall time in seconds of a fresh interpreter importing the entry point and the heavy modules it loaded"""
+    times = []
+    for _ in range(repeats):
+        startTime = time.time()
+        result = subprocess.run([sys.executable, '-c', CHECK_SCRIPT.format(entryPoint, HEAVY_MODULES)], stdout= subprocess.PIPE, universal_newlines= True, check= True)
+        times.append(time.time() - startTime)
+    return sum(times) / len(times), result.stdout.strip()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Processes startup measurement parameters.')
+    parser.add_argument('-r', '--repeats', type= int, default= 3, help= 'Number of fresh interpreters to time for each entry point')
+    args = parser.parse_args()
+
+    baseline, _ = measureEntryPoint('os', args.repeats)
+    print('{0:12} {1:>8}  {2}'.format('entry point', 'seconds', 'heavy imports'))
+    print('{0:12} {1:8.3f}  {2}'.format('(python)', baseline, ''))
+    for entryPoint in ENTRY_POINTS:
+        seconds, heavyModules = measureEntryPoint(entryPoint, args.repeats)
+        print('{0:12} {1:8.3f}  {2}'.format(entryPoint, seconds, heavyModules))
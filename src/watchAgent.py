@@ -1,4 +1,5 @@
-from DeepQAgent import *
+import argparse
+from DeepQAgent import DeepQAgent
 
 """Makes a DeepQ Agent and runs it through one fight for each character in the roster so the user can view it"""
 if __name__ == "__main__":